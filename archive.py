@@ -0,0 +1,50 @@
+"""Moves the monthly Mood partitions older than the retention window to Parquet files.
+
+Needs the partitioned table from `prisma/mood_partitions.sql`. Run it once a month, it also
+creates the partitions of the coming months:
+
+    dotenv -f .env.local run -- python archive.py
+
+`MOOD_RETENTION_DAYS` sets the window (180 days by default) and `MOOD_ARCHIVE_DIR` where the
+files are written (`archive/mood` by default).
+"""
+
+import dotenv
+
+dotenv.load_dotenv(".env.local")
+
+import argparse
+import time
+
+from prisma import Prisma
+
+from models.archive import archive_dir, archive_partition, expired_partitions
+
+MONTHS_AHEAD = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive the Mood partitions older than the retention window")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the partitions to archive")
+    args = parser.parse_args()
+
+    db = Prisma()
+    db.connect()
+    try:
+        db.execute_raw(
+            "SELECT mood_ensure_partitions(now()::date, (now() + make_interval(months => $1))::date)", MONTHS_AHEAD
+        )
+        for partition, month in expired_partitions(db):
+            if args.dry_run:
+                print(f"{partition} would be archived")
+                continue
+            start = time.perf_counter()
+            rows = archive_partition(db, partition, month)
+            print(f"{partition}: {rows} rows archived to {archive_dir() / month.strftime('%Y-%m')} "
+                  f"in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.disconnect()
+
+
+if __name__ == "__main__":
+    main()
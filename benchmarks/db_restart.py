@@ -0,0 +1,56 @@
+"""Checks that the app's database client survives a Postgres restart.
+
+Restarts the `db` service of the local Docker setup from the README while a reader keeps
+querying, then reports how many queries failed and how long the outage lasted for the client.
+Run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.db_restart
+"""
+import subprocess
+import sys
+import threading
+import time
+
+from models.database import User, init_database_connection
+
+QUERY_INTERVAL = 0.1
+
+
+def main():
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    stop = threading.Event()
+    results = []
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                User.prisma().count()
+                results.append((start, time.perf_counter() - start, None))
+            except Exception as e:
+                results.append((start, time.perf_counter() - start, e))
+            time.sleep(QUERY_INTERVAL)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    time.sleep(1)
+    subprocess.run(["docker", "compose", "restart", "db"], check=True)
+    # Give the reader time to reconnect after the server is back
+    time.sleep(5)
+    stop.set()
+    thread.join()
+
+    failed = [e for _, _, e in results if e is not None]
+    slowest = max(elapsed for _, elapsed, _ in results)
+    print(f"queries {len(results)}, failed {len(failed)}, slowest {slowest * 1000:.0f} ms")
+    for e in failed:
+        print(f"  {type(e).__name__}: {e}")
+
+    if results[-1][2] is not None:
+        sys.exit("Client did not recover after the restart")
+
+
+if __name__ == "__main__":
+    main()
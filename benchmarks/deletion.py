@@ -0,0 +1,129 @@
+"""Checks that an account deletion killed mid-job is taken over and finishes.
+
+Seeds a user with years of daily moods and weekly summaries linked to resources, runs the deletion
+in a separate process and kills it once it has deleted some rows. The job must stay claimed while
+its lease runs, be taken over after it expires, and leave none of the user's rows behind. Run from
+the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.deletion --years 3
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import signal
+import sys
+import time
+from datetime import datetime, timedelta
+
+from models.database import (
+    AccountDeletion,
+    Mood,
+    Resource,
+    ResourceOnSummary,
+    Summary,
+    User,
+    init_database_connection,
+)
+from models.deletion import delete_account_data, request_deletion
+
+LEASE_SECONDS = 2
+# Small batches keep the job running long enough to be killed halfway
+BATCH_SIZE = 5
+POLL_INTERVAL = 0.02
+
+
+def seed(years: float) -> str:
+    user_id = f"deletion-check-{secrets.token_hex(4)}"
+    User.prisma().create(data={"id": user_id, "email": f"{user_id}@example.com", "username": user_id})
+
+    end = datetime.combine(datetime.now().date(), datetime.min.time())
+    days = [end - timedelta(days=day) for day in range(round(years * 365))]
+    moods = ["Happy", "Calm", "Sad", "Stressed"]
+    Mood.prisma().create_many(data=[
+        {"user_id": user_id, "date": day, "name": moods[i // 3 % len(moods)], "description": "Deletion check"}
+        for i, day in enumerate(days)
+    ])
+
+    resource_ids = [resource.id for resource in Resource.prisma().find_many(take=3)]
+    summaries = [
+        {"id": f"{user_id}-{week}", "user_id": user_id, "start": day - timedelta(days=6), "end": day,
+         "keywords": "check", "content": "Deletion check summary"}
+        for week, day in enumerate(days[::7])
+    ]
+    Summary.prisma().create_many(data=summaries)
+    ResourceOnSummary.prisma().create_many(data=[
+        {"summary_id": summary["id"], "resource_id": resource_id}
+        for summary in summaries for resource_id in resource_ids
+    ])
+    print(f"Seeded {user_id}: {len(days)} moods, {len(summaries)} summaries, "
+          f"{len(summaries) * len(resource_ids)} resource links")
+    return user_id
+
+
+def run_deletion(user_id: str):
+    # Own process group, so killing the worker also kills its query engine like a crash would
+    os.setpgrp()
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+    delete_account_data(user_id, batch_size=BATCH_SIZE)
+
+
+def remaining(user_id: str) -> dict[str, int]:
+    return {
+        "User": User.prisma().count(where={"id": user_id}),
+        "Mood": Mood.prisma().count(where={"user_id": user_id}),
+        "Summary": Summary.prisma().count(where={"user_id": user_id}),
+        "ResourceOnSummary": ResourceOnSummary.prisma().count(where={"summary": {"is": {"user_id": user_id}}}),
+    }
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        sys.exit(f"FAILED: {message}")
+    print(f"ok: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kill an account deletion halfway and check it is taken over")
+    parser.add_argument("--years", type=float, default=3, help="Years of daily moods of the user")
+    parser.add_argument("--kill-after", type=int, default=200, help="Deleted rows before the worker is killed")
+    args = parser.parse_args()
+
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    user_id = seed(args.years)
+    request_deletion(user_id)
+
+    worker = multiprocessing.get_context("spawn").Process(target=run_deletion, args=(user_id,))
+    worker.start()
+    while worker.is_alive():
+        job = AccountDeletion.prisma().find_unique(where={"user_id": user_id})
+        if job.deleted_rows >= args.kill_after:
+            break
+        time.sleep(POLL_INTERVAL)
+    if not worker.is_alive():
+        sys.exit("The deletion finished before it could be killed, seed more --years")
+    os.killpg(worker.pid, signal.SIGKILL)
+    worker.join()
+
+    job = AccountDeletion.prisma().find_unique(where={"user_id": user_id})
+    check(job.status == "running", f"the killed job is left running after {job.deleted_rows} rows")
+    left = remaining(user_id)
+    check(left["Mood"] > 0, f"the killed job left rows to delete ({left})")
+
+    check(not delete_account_data(user_id, lease_seconds=LEASE_SECONDS), "the job is not taken over during its lease")
+    time.sleep(LEASE_SECONDS + 1)
+    started = time.perf_counter()
+    check(delete_account_data(user_id, lease_seconds=LEASE_SECONDS), "the job is taken over after its lease")
+    print(f"Finished in {time.perf_counter() - started:.2f}s")
+
+    job = AccountDeletion.prisma().find_unique(where={"user_id": user_id})
+    check(job.status == "done", "the job is done")
+    left = remaining(user_id)
+    check(not any(left.values()), f"no rows of the user are left ({left})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Checks that importing events links their types and skips duplicates on a second import, and
+that summaries shortlist the imported events.
+
+Imports an iCalendar file and a CSV file naming the same events in UTC and in naive times, then
+imports them again. The events and the types the check created are deleted afterwards. Run from
+the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.events
+"""
+import secrets
+import sys
+from datetime import datetime, timedelta, timezone
+
+from models.database import Event, EventOnType, Type, init_database_connection
+from models.events import get_upcoming_events, import_events, parse_csv, parse_ics, shortlist_events
+
+TYPES = ["wellness", "mindfulness", "social"]
+
+
+def sample_files(prefix: str) -> tuple[str, str]:
+    # Tomorrow at 10:00 UTC, written with `Z` in the calendar and naive in the CSV
+    start = (datetime.now(tz=timezone.utc) + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    end = start + timedelta(hours=1)
+    ics = "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT",
+        f"SUMMARY:{prefix} Yoga",
+        f"DTSTART:{start:%Y%m%dT%H%M%SZ}",
+        f"DTEND:{end:%Y%m%dT%H%M%SZ}",
+        "CATEGORIES:wellness,mindfulness",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        f"SUMMARY:{prefix} Fair",
+        f"DTSTART;VALUE=DATE:{start:%Y%m%d}",
+        "CATEGORIES:social",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ])
+    naive = start.replace(tzinfo=None)
+    csv = "\n".join([
+        "name,start,end,description,types",
+        f"{prefix} Yoga,{naive.isoformat()},{(naive + timedelta(hours=1)).isoformat()},Duplicate,wellness",
+        f"{prefix} Walk,{naive.isoformat()},{(naive + timedelta(hours=2)).isoformat()},,wellness;social",
+    ])
+    return ics, csv
+
+
+def check(condition: bool, message: str):
+    if not condition:
+        sys.exit(f"FAILED: {message}")
+    print(f"ok: {message}")
+
+
+def main():
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    prefix = f"check-{secrets.token_hex(3)}"
+    existing_types = {t.name for t in Type.prisma().find_many(where={"name": {"in": TYPES}})}
+    ics, csv = sample_files(prefix)
+    rows = parse_ics(ics) + parse_csv(csv)
+
+    try:
+        created, skipped = import_events(rows)
+        check((created, skipped) == (3, 1), f"first import creates 3 events and skips 1 ({created}, {skipped})")
+
+        events = Event.prisma().find_many(
+            where={"name": {"startswith": prefix}},
+            include={"types": {"include": {"type": True}}},
+        )
+        linked = {event.name.removeprefix(f"{prefix} "): sorted(link.type.name for link in event.types) for event in events}
+        check(
+            linked == {"Yoga": ["mindfulness", "wellness"], "Fair": ["social"], "Walk": ["social", "wellness"]},
+            f"every event is linked to its types ({linked})",
+        )
+
+        # Starts are read back from the client as aware datetimes
+        get_upcoming_events.clear()
+        shortlisted = [event["name"].removeprefix(f"{prefix} ") for event in shortlist_events(["Calm", "Stressed"], limit=1000)
+                       if event["name"].startswith(prefix)]
+        check(sorted(shortlisted) == ["Walk", "Yoga"], f"upcoming events suiting the moods are shortlisted ({shortlisted})")
+
+        created, skipped = import_events(rows)
+        check((created, skipped) == (0, len(rows)), f"second import only skips duplicates ({created}, {skipped})")
+        links = EventOnType.prisma().count(where={"event": {"is": {"name": {"startswith": prefix}}}})
+        check(links == 5, f"second import adds no links ({links})")
+    finally:
+        Event.prisma().delete_many(where={"name": {"startswith": prefix}})
+        Type.prisma().delete_many(where={"name": {"in": [t for t in TYPES if t not in existing_types]}})
+        get_upcoming_events.clear()
+
+
+if __name__ == "__main__":
+    main()
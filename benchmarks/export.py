@@ -0,0 +1,39 @@
+"""Measures the time and peak Python memory of a personal data export.
+
+Needs a seeded database, run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.export <username>
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from models.database import User, init_database_connection
+from models.export import build_export
+
+
+def main(username: str):
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    user = User.prisma().find_unique(where={"username": username})
+    if not user:
+        sys.exit(f"Unknown user: {username}")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    path = build_export(user.id)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path)
+    os.remove(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"archive {size / 1024:10.1f} KiB")
+    print(f"time    {elapsed * 1000:10.1f} ms")
+    print(f"peak    {peak / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
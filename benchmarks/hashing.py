@@ -0,0 +1,44 @@
+"""Measures password checks per second against the number of hasher worker processes.
+
+Run from the project root:
+
+    python -m benchmarks.hashing [rounds] [checks per worker]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models.hashing import PasswordHasher, _hash
+
+PASSWORD = "Benchmark-Passw0rd!"
+
+
+def logins_per_second(workers: int, rounds: int, checks_per_worker: int) -> float:
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=workers * 4)
+    hashed = _hash(PASSWORD, rounds)
+    # Warm up the worker processes before timing
+    list(ThreadPoolExecutor(workers).map(lambda _: hasher.check(PASSWORD, hashed), range(workers)))
+
+    checks = workers * checks_per_worker
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+        assert all(pool.map(lambda _: hasher.check(PASSWORD, hashed), range(checks)))
+    elapsed = time.perf_counter() - start
+
+    hasher.shutdown()
+    return checks / elapsed
+
+
+def main(rounds: int = 12, checks_per_worker: int = 8):
+    print(f"bcrypt cost {rounds}")
+    print(f"{'workers':>8} {'logins/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        rate = logins_per_second(workers, rounds, checks_per_worker)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,122 @@
+"""Checks that the hot queries use an index and reports their timings without and with it.
+
+Everything runs in one transaction that is rolled back: a large synthetic dataset is inserted
+and analyzed, each hot query is explained with its indexes, then the audited indexes are
+dropped and the queries explained again. The data is left untouched, but the tables stay locked
+until the end, so use a development database. Run from the project root after `prisma db push`:
+
+    dotenv -f .env.local run -- python -m benchmarks.indexes [users]
+"""
+import json
+import sys
+from datetime import timedelta
+
+from models.database import init_database_connection, prisma
+
+SUMMARIES_PER_USER = 5
+EVENTS_PER_USER = 1
+RESOURCES = 20_000
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+SEED = [
+    """INSERT INTO "User" (id, email, username, logged_in, created_at, updated_at)
+    SELECT 'idx-u' || i, 'user' || i || '@example.com', 'idx' || i, i % 100 = 0,
+           (now() AT TIME ZONE 'UTC') - (i % 730) * interval '1 day', now() AT TIME ZONE 'UTC'
+    FROM generate_series(1, $1) i""",
+    f"""INSERT INTO "Summary" (id, user_id, start, "end", keywords, content, created_at, updated_at)
+    SELECT 'idx-s' || i, 'idx-u' || (i % $1 + 1), now(), now(), '', '',
+           (now() AT TIME ZONE 'UTC') - (i % 730) * interval '1 day', now() AT TIME ZONE 'UTC'
+    FROM generate_series(1, $1 * {SUMMARIES_PER_USER}) i""",
+    f"""INSERT INTO "Event" (id, name, start, "end", created_at, updated_at)
+    SELECT 'idx-e' || i, 'idx' || i, start, start + interval '2 hours',
+           (now() AT TIME ZONE 'UTC') - (i % 730) * interval '1 day', now() AT TIME ZONE 'UTC'
+    FROM generate_series(1, $1 * {EVENTS_PER_USER}) i,
+         LATERAL (SELECT (now() AT TIME ZONE 'UTC') - (i % 1460 - 30) * interval '1 day' AS start) s""",
+    f"""INSERT INTO "Resource" (id, name, created_at, updated_at)
+    SELECT 'idx-r' || i, 'idx' || i,
+           (now() AT TIME ZONE 'UTC') - (i % 730) * interval '1 day', now() AT TIME ZONE 'UTC'
+    FROM generate_series(1, {RESOURCES}) i""",
+]
+
+RECENT = "(now() AT TIME ZONE 'UTC') - interval '7 days'"
+
+# Query, index it should use
+HOT_QUERIES = {
+    "latest summary by user": (
+        """SELECT id FROM "Summary" WHERE user_id = 'idx-u42' ORDER BY created_at DESC LIMIT 1""",
+        "Summary_user_id_created_at_idx",
+    ),
+    "logged in users": ("""SELECT count(*) FROM "User" WHERE logged_in""", "User_logged_in_idx"),
+    "new users (7 days)": (f"""SELECT count(*) FROM "User" WHERE created_at > {RECENT}""", "User_created_at_idx"),
+    "new events (7 days)": (f"""SELECT count(*) FROM "Event" WHERE created_at > {RECENT}""", "Event_created_at_idx"),
+    "new summaries (7 days)": (
+        f"""SELECT count(*) FROM "Summary" WHERE created_at > {RECENT}""", "Summary_created_at_idx",
+    ),
+    "new resources (7 days)": (
+        f"""SELECT count(*) FROM "Resource" WHERE created_at > {RECENT}""", "Resource_created_at_idx",
+    ),
+    "upcoming events overlap": (
+        """SELECT id FROM "Event" WHERE start <= (now() AT TIME ZONE 'UTC') + interval '14 days'
+        AND "end" >= now() AT TIME ZONE 'UTC'""",
+        "Event_end_start_idx",
+    ),
+    "email search": ("""SELECT id FROM "User" WHERE email LIKE '%user4242%' LIMIT 20""", "User_email_trgm_idx"),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(tx, query: str) -> tuple[float, set[str]]:
+    result = tx.query_first(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")["QUERY PLAN"]
+    explained = (json.loads(result) if isinstance(result, str) else result)[0]
+    indexes = {node["Index Name"] for node in plan_nodes(explained["Plan"])
+               if node["Node Type"] in INDEX_SCANS}
+    return explained["Execution Time"], indexes
+
+
+def main(users: int):
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    after, before = {}, {}
+    try:
+        with prisma.get_client().tx(timeout=timedelta(minutes=10)) as tx:
+            print(f"Seeding {users} users...")
+            for query in SEED:
+                tx.execute_raw(query, *([users] if "$1" in query else []))
+            tx.execute_raw('ANALYZE "User", "Summary", "Event", "Resource"')
+
+            for label, (query, _) in HOT_QUERIES.items():
+                after[label] = explain(tx, query)
+            for _, index in HOT_QUERIES.values():
+                tx.execute_raw(f'DROP INDEX IF EXISTS "{index}"')
+            for label, (query, _) in HOT_QUERIES.items():
+                before[label] = explain(tx, query)
+            raise Rollback()
+    except Rollback:
+        pass
+
+    missing = []
+    print(f"| {'Query':<26} | {'Before (ms)':>11} | {'After (ms)':>10} | Index |")
+    print(f"|{'-' * 28}|{'-' * 13}|{'-' * 12}|-------|")
+    for label, (_, index) in HOT_QUERIES.items():
+        used = index in after[label][1]
+        print(f"| {label:<26} | {before[label][0]:>11.2f} | {after[label][0]:>10.2f} | {'yes' if used else 'NO'} |")
+        if not used:
+            missing.append(f"{label} ({index})")
+
+    if missing:
+        sys.exit(f"Hot queries without their index: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
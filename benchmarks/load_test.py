@@ -0,0 +1,193 @@
+"""Simulates concurrent users running scripted journeys through main.py with Streamlit's AppTest.
+
+Each simulated user runs in its own process, with its own AppTest session, and repeats the
+journey: open the login page, log in, open the calendar, record a mood, browse back and forth a
+month, open the summary. The OpenAI client is replaced by a stub answering after `--llm-latency`
+seconds, and the calendar component, which AppTest cannot click, by a stub reporting a click on
+a recent day when the journey records a mood.
+
+Every journey logs in its own user, so the login throttle, which allows 5 logins per username a
+minute, never kicks in. Needs `--users` times `--iterations` users generated by `generate.py`
+(`load0`, `load1`, ...), run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.load_test --users 20 --iterations 5
+
+Reports per page the p50/p95/p99 latency and the database queries per run, counted by the query
+tracer, and the resident memory each session adds to its process. Sessions stay open until the
+user's journeys end, like the sessions of a server.
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+TIMEOUT = 60
+
+
+class StubOpenAI:
+    """
+    Answers completions with the first resources and events of the prompt, after a delay.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: list[dict], **kwargs):
+        time.sleep(self.latency)
+        data = json.loads(messages[-1]["content"])
+        content = "\n".join([
+            "summary: You kept tracking your mood this week, small routines are paying off.",
+            "keyword: steady progress",
+            f"suggestion: {json.dumps([r['id'] for r in data['resources'][:2]])}",
+            f"event_suggestion: {json.dumps([e['id'] for e in data['events'][:1]])}",
+            "crisis_intervention: false",
+        ])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class StubCalendar:
+    """
+    Stands in for the streamlit_calendar component, reporting a date click when one is queued.
+    """
+
+    def __init__(self):
+        self.clicked = None
+
+    def __call__(self, *args, **kwargs):
+        clicked, self.clicked = self.clicked, None
+        if clicked is None:
+            return {}
+        return {"callback": "dateClick", "dateClick": {"date": clicked}}
+
+
+def resident_mb() -> float:
+    # Current resident size rather than the peak, the second field of statm counts pages
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def query_count() -> int:
+    from models.tracing import snapshot
+
+    return sum(histogram.count for histogram in snapshot().values())
+
+
+def run_user(index: int, password: str, iterations: int, llm_latency: float) -> tuple[list, list]:
+    import streamlit_calendar
+    from streamlit.testing.v1 import AppTest
+
+    import models.llm
+
+    stub_openai = StubOpenAI(llm_latency)
+    models.llm.get_openai = lambda: stub_openai
+    calendar = streamlit_calendar.calendar = StubCalendar()
+
+    rng = random.Random(index)
+    samples = []
+    sessions = []
+    added = []
+    resident = None
+
+    def step(page: str, action):
+        queries = query_count()
+        start = time.perf_counter()
+        action()
+        elapsed = (time.perf_counter() - start) * 1000
+        if app.exception:
+            raise RuntimeError(f"{page}: {app.exception[0].message}")
+        samples.append((page, elapsed, query_count() - queries))
+
+    def widget(widgets, label: str):
+        return next(w for w in widgets if w.label == label)
+
+    for journey in range(iterations):
+        app = AppTest.from_file("main.py", default_timeout=TIMEOUT)
+        step("login page", app.run)
+        widget(app.text_input, "Username").input(f"load{index * iterations + journey}")
+        widget(app.text_input, "Password").input(password)
+        step("login", widget(app.button, "Login").click().run)
+
+        app.switch_page("views/calendar.py")
+        step("calendar", app.run)
+
+        day = datetime.now() - timedelta(days=rng.randrange(1, 28))
+        calendar.clicked = day.strftime("%Y-%m-%dT00:00:00Z")
+        step("calendar date click", app.run)
+        widget(app.selectbox, "Mood").select(rng.choice(["Happy", "Calm", "Sad", "Stressed"]))
+        widget(app.text_area, "Description").input("Load test")
+        step("record mood", widget(app.button, "Record mood").click().run)
+
+        step("calendar prev", widget(app.button, "Prev").click().run)
+        step("calendar next", widget(app.button, "Next").click().run)
+
+        app.switch_page("views/summary.py")
+        step("summary", app.run)
+
+        sessions.append(app)
+        gc.collect()
+        current = resident_mb()
+        # The first journey also pays for importing the app, it only sets the baseline
+        if resident is not None:
+            added.append(current - resident)
+        resident = current
+
+    return samples, added
+
+
+def worker(args: tuple) -> tuple[list, list]:
+    # Shows exceptions instead of the generic error handler of main.py
+    os.environ["APP_DEBUG"] = "true"
+    return run_user(*args)
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent user journeys with AppTest")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent users, one process each")
+    parser.add_argument("--iterations", type=int, default=3, help="Journeys per user")
+    parser.add_argument("--password", default="LoadTest123!", help="Password of the generated users")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the LLM stub takes to answer")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.users) as pool:
+        results = pool.map(worker, [(index, args.password, args.iterations, args.llm_latency)
+                                    for index in range(args.users)])
+    elapsed = time.perf_counter() - started
+
+    pages = {}
+    for samples, _ in results:
+        for page, ms, queries in samples:
+            pages.setdefault(page, []).append((ms, queries))
+
+    print(f"{args.users} users x {args.iterations} journeys in {elapsed:.1f}s")
+    print(f"{'Page':<22} {'Runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Queries':>8}")
+    for page, runs in pages.items():
+        latencies = [ms for ms, _ in runs]
+        queries = statistics.mean(queries for _, queries in runs)
+        print(f"{page:<22} {len(runs):>5} {percentile(latencies, 50):>9.1f} {percentile(latencies, 95):>9.1f} "
+              f"{percentile(latencies, 99):>9.1f} {queries:>8.1f}")
+
+    memory = [mb for _, added in results for mb in added]
+    if memory:
+        print(f"Memory per session: mean {statistics.mean(memory):.1f} MB, max {max(memory):.1f} MB")
+    else:
+        print("Memory per session: needs at least 2 --iterations")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
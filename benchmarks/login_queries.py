@@ -0,0 +1,52 @@
+"""Counts the database round trips of a password login and a cookie re-authentication.
+
+Needs a seeded database, run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.login_queries <username> <password>
+"""
+import sys
+import time
+
+import prisma
+
+from models.authentication_models import AuthenticationModel
+from models.database import init_database_connection
+
+MAX_ROUND_TRIPS = 2
+
+
+def query_count() -> int:
+    metrics = prisma.get_client().get_metrics()
+    return sum(c.value for c in metrics.counters if c.key == "prisma_client_queries_total")
+
+
+def measure(label: str, fn) -> int:
+    before = query_count()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    queries = query_count() - before
+    print(f"{label:<24} {queries} queries  {elapsed * 1000:8.1f} ms")
+    return queries
+
+
+def main(username: str, password: str):
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    model = AuthenticationModel()
+    results = {
+        "login (success)": measure("login (success)", lambda: model.login(username, password)),
+        "login (failure)": measure("login (failure)", lambda: model.login(username, password + "-wrong")),
+        "cookie re-auth": measure("cookie re-auth", lambda: model.login(None, None, token={"username": username})),
+    }
+    # Undo the failed attempt recorded above
+    model.login(username, password)
+
+    over = [label for label, queries in results.items() if queries > MAX_ROUND_TRIPS]
+    if over:
+        sys.exit(f"More than {MAX_ROUND_TRIPS} round trips: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:3])
@@ -0,0 +1,63 @@
+"""Shows that database writes for failed logins stay flat while the attempt rate grows.
+
+Simulates a credential stuffing burst against the login throttle with a virtual clock,
+no database needed. Run from the project root:
+
+    python -m benchmarks.login_throttle [seconds]
+"""
+import random
+import sys
+
+from models.throttle import (
+    ADDRESS_LIMIT,
+    FLUSH_INTERVAL,
+    USERNAME_LIMIT,
+    WINDOW,
+    FailedLoginBuffer,
+    SlidingWindowLimiter,
+)
+
+USERNAMES = 1000
+ADDRESSES = 200
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def simulate(rate: int, seconds: int) -> tuple[int, int, int]:
+    clock = Clock()
+    usernames = SlidingWindowLimiter(USERNAME_LIMIT, WINDOW, clock)
+    addresses = SlidingWindowLimiter(ADDRESS_LIMIT, WINDOW, clock)
+    writes = []
+    failures = FailedLoginBuffer(write=lambda names, counts: writes.append(len(names)))
+    rng = random.Random(0)
+
+    allowed = 0
+    next_flush = FLUSH_INTERVAL
+    for i in range(rate * seconds):
+        clock.now = i / rate
+        if clock.now >= next_flush:
+            failures.flush()
+            next_flush += FLUSH_INTERVAL
+        username = f"user{rng.randrange(USERNAMES)}"
+        if addresses.hit(f"10.0.0.{rng.randrange(ADDRESSES)}") and usernames.hit(username):
+            allowed += 1
+            failures.record(username)
+    failures.flush()
+    return allowed, len(writes), sum(writes)
+
+
+def main(seconds: int = 300):
+    print(f"{seconds}s burst, {USERNAMES} usernames from {ADDRESSES} addresses")
+    print(f"{'attempts/s':>10} {'attempts':>9} {'allowed':>8} {'db writes':>10} {'rows':>7}")
+    for rate in (10, 100, 1000):
+        allowed, writes, rows = simulate(rate, seconds)
+        print(f"{rate:>10} {rate * seconds:>9} {allowed:>8} {writes:>10} {rows:>7}")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,240 @@
+"""Times the pure functions that run on every rerun and compares them with saved baselines.
+
+Covers the calendar span coalescing, the summary input shaping and response parsing, the
+resource diff of the admin editor and the registration validator. Database results are replaced
+by generated rows, so no database or API key is needed. Run from the project root:
+
+    python -m benchmarks.micro                  # Compare with the baselines
+    python -m benchmarks.micro --save           # Compare, then record this run as a baseline
+    python -m benchmarks.micro -k summary       # Only benchmarks whose name contains "summary"
+
+Each round times a fixed pure Python workload right before the benchmark, and a benchmark is
+scored by the median over `REPEAT` rounds of its time relative to that workload. The score does
+not depend on how fast the machine is or how busy it was during the run, so runs are kept in
+`benchmarks/baselines.json` per processor architecture and Python version, which CI runners
+match. A benchmark regresses when its score is above the median of the last `HISTORY` saved
+scores by more than `--threshold`, and the command then exits with status 1. Benchmarks without
+a baseline for this architecture and Python version are only reported.
+
+To regenerate the baselines, after an intended slowdown or for a new architecture or Python
+version, remove that machine's runs from `baselines.json` (their `machine` key, such as
+`x86_64 Python 3.11`). Then run `--save` `HISTORY` times on the machine or CI image the
+comparisons run on, and commit the file. A run saves even when it reports a regression.
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import timeit
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+import polars as pl
+
+from models.authentication_validator import Validator
+from models.moods import mood_spans
+from models.resources import SCHEMA, diff_resources
+from models.summary import encode_summary_input, parse_summary_response, shape_moods
+
+BASELINES = Path(__file__).with_name("baselines.json")
+HISTORY = 5
+THRESHOLD = 0.25
+REPEAT = 31
+# Rounds last about a tenth of what `Timer.autorange` aims for, 20 ms
+ROUND_FRACTION = 10
+
+MOODS = ["Happy", "Calm", "Sad", "Stressed"]
+MAIL_WHITELIST = ["bentley.edu", "*.bentley.edu", "!*.guest.bentley.edu", "gmail.com"]
+EMAILS = [f"student{i}@{domain}" for i, domain in enumerate(
+    ["bentley.edu", "mail.bentley.edu", "guest.bentley.edu", "gmail.com", "example.com"] * 20)]
+
+
+@dataclass
+class StubMood:
+    """
+    Stands in for a `Mood` row returned by the client.
+    """
+    user_id: str
+    date: datetime
+    name: str
+    description: Optional[str]
+    user: None = None
+
+
+def stub_moods(rng: random.Random, days: int) -> list[StubMood]:
+    # Moods last a few days, with gaps, like a regular user's calendar
+    start = datetime(2024, 1, 1)
+    moods, mood = [], rng.choice(MOODS)
+    for day in range(days):
+        if rng.random() < 0.3:
+            mood = rng.choice(MOODS)
+        if rng.random() < 0.8:
+            moods.append(StubMood("user", start + timedelta(days=day), mood,
+                                  rng.choice(["Exams next week\n", "Quiet  study\tsession", "", None])))
+    return moods
+
+
+def stub_resources(count: int) -> pl.DataFrame:
+    return pl.DataFrame(
+        [{"id": f"r{i}", "name": f"Resource {i}", "description": "Counseling and wellness support " * 4,
+          "location": None if i % 3 else "Callahan Hall", "link": f"https://example.com/{i}"}
+         for i in range(count)],
+        schema=SCHEMA,
+    )
+
+
+def stub_events(count: int) -> list[dict]:
+    return [{"id": f"e{i}", "name": f"Event {i}", "date": "2024-01-20", "types": ["wellness", "social"],
+             "description": "Come and meet other students"} for i in range(count)]
+
+
+def edited(resources_df: pl.DataFrame, rng: random.Random) -> pl.DataFrame:
+    # About 2% of rows updated, 1% deleted and 1% added
+    rows = []
+    for row in resources_df.iter_rows(named=True):
+        roll = rng.random()
+        if roll < 0.01:
+            continue
+        if roll < 0.03:
+            row = {**row, "description": row["description"] + " Updated."}
+        rows.append(row)
+    rows += [{"id": None, "name": f"New {i}", "description": "New resource", "location": None, "link": None}
+             for i in range(max(1, len(resources_df) // 100))]
+    return pl.DataFrame(rows, schema=SCHEMA)
+
+
+RESPONSE = """```yaml
+summary: You had a calm week with a few stressful days around exams, and kept a steady routine.
+keyword: steady routine
+suggestion: ["r3", "r7", "missing", "r12"]
+event_suggestion: ["e1", "e1", "e9"]
+crisis_intervention: false
+```"""
+
+
+CALIBRATION_WORDS = [f"Word{i % 97}" for i in range(2_000)]
+
+
+def calibration() -> list:
+    # Dictionary, string and sorting work of a fixed size, the staples of the benchmarked helpers
+    counts = {}
+    for word in CALIBRATION_WORDS:
+        counts[word] = counts.get(word, 0) + len(word.lower())
+    return sorted(counts.items())
+
+
+def validate_all(validate: Callable[[str], bool], values: list[str]) -> list[bool]:
+    return [validate(value) for value in values]
+
+
+def benchmarks() -> dict[str, Callable[[], object]]:
+    rng = random.Random(0)
+    validator = Validator(MAIL_WHITELIST)
+    resources_df = stub_resources(30).select(["id", "name", "description"])
+    events = stub_events(5)
+    week = stub_moods(rng, 9)[:7]
+    week_df, _, _ = shape_moods(week)
+
+    cases = {
+        # The calendar reads the month with a week on either side
+        "calendar spans (38 days)": (mood_spans, stub_moods(rng, 38)),
+        "calendar spans (365 days)": (mood_spans, stub_moods(rng, 365)),
+        "summary shape moods": (shape_moods, week),
+        "summary encode input": (encode_summary_input, week_df, resources_df, events),
+        "summary parse response": (parse_summary_response, RESPONSE, resources_df, events),
+        # Single checks take about a microsecond, they are timed over a form's worth of inputs
+        "validator emails (100)": (validate_all, validator.validate_email, EMAILS),
+        "validator batch emails (100)": (validator.validate_emails, EMAILS),
+        "validator names (100)": (validate_all, validator.validate_name, [f"Jane Doe{'e' * (i % 10)}" for i in range(100)]),
+        "validator usernames (100)": (validate_all, validator.validate_username, [f"jane_doe{i}" for i in range(100)]),
+        "validator passwords (100)": (validate_all, validator.validate_password, [f"Str0ng-Passw0rd{i}!" for i in range(100)]),
+        "validator lengths (100)": (validate_all, lambda value: validator.validate_length(value, 1, 100),
+                                    [f"Counseling and wellness support {i}" for i in range(100)]),
+    }
+    for size in (100, 1_000, 10_000):
+        resources = stub_resources(size)
+        cases[f"resource diff ({size} rows)"] = (diff_resources, resources, edited(resources, rng))
+
+    return {name: (lambda function=function, args=args: function(*args)) for name, (function, *args) in cases.items()}
+
+
+def measure(function: Callable[[], object]) -> tuple[float, float]:
+    """
+    Returns the median time of one call in microseconds, and the median of its time relative to
+    the calibration workload timed right before it in each round.
+    """
+    timer, reference = timeit.Timer(function), timeit.Timer(calibration)
+    number = max(1, timer.autorange()[0] // ROUND_FRACTION)
+    reference_number = max(1, reference.autorange()[0] // ROUND_FRACTION)
+    times, scores = [], []
+    for _ in range(REPEAT):
+        calibrated = reference.timeit(reference_number) / reference_number
+        elapsed = timer.timeit(number) / number
+        times.append(elapsed * 1e6)
+        scores.append(elapsed / calibrated)
+    return statistics.median(times), statistics.median(scores)
+
+
+def machine() -> str:
+    major, minor, _ = platform.python_version_tuple()
+    return f"{platform.machine()} Python {major}.{minor}"
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def baseline(runs: list[dict], name: str) -> Optional[float]:
+    history = [run["scores"][name] for run in runs if name in run["scores"]][-HISTORY:]
+    return statistics.median(history) if history else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks against saved baselines")
+    parser.add_argument("-k", dest="keyword", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--save", action="store_true", help="Record this run as a baseline")
+    args = parser.parse_args()
+
+    saved = json.loads(BASELINES.read_text()) if BASELINES.exists() else []
+    runs = [run for run in saved if run["machine"] == machine()]
+
+    results, scores, regressions = {}, {}, []
+    print(f"{'Benchmark':<28} {'us/call':>10} {'score':>10} {'baseline':>10} {'change':>8}")
+    for name, function in benchmarks().items():
+        if args.keyword not in name:
+            continue
+        results[name], scores[name] = measure(function)
+        reference = baseline(runs, name)
+        if reference is None:
+            print(f"{name:<28} {results[name]:>10.2f} {scores[name]:>10.3f} {'-':>10} {'-':>8}")
+            continue
+        change = scores[name] / reference - 1
+        flag = ""
+        if change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {results[name]:>10.2f} {scores[name]:>10.3f} {reference:>10.3f} {change:>+7.1%}{flag}")
+
+    if args.save:
+        saved.append({"machine": machine(), "commit": commit(), "date": datetime.now().isoformat(timespec="seconds"),
+                      "results": {name: round(us, 3) for name, us in results.items()},
+                      "scores": {name: round(score, 4) for name, score in scores.items()}})
+        BASELINES.write_text(json.dumps(saved, indent=2) + "\n")
+        print(f"Saved to {BASELINES}")
+
+    if regressions:
+        sys.exit(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
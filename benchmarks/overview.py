@@ -0,0 +1,44 @@
+"""Compares the admin overview counts run one after another and through `gather`.
+
+Needs a seeded database, run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.overview [rounds]
+"""
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from models.database import Event, Resource, Summary, User, init_database_connection
+from models.parallel import gather
+
+
+def overview_queries():
+    recent_week_filter = {"created_at": {"gt": datetime.now() - timedelta(days=7)}}
+    return [
+        lambda model=model, where=where: model.prisma().count(where=where)
+        for model in (User, Event, Summary, Resource)
+        for where in (None, recent_week_filter)
+    ]
+
+
+def measure(label: str, fn, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<12} median {statistics.median(timings):8.1f} ms  max {max(timings):8.1f} ms")
+
+
+def main(rounds: int):
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    queries = overview_queries()
+    measure("sequential", lambda: [query() for query in queries], rounds)
+    measure("gather", lambda: gather(*queries), rounds)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
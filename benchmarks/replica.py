@@ -0,0 +1,70 @@
+"""Checks the read replica routing against two local Postgres instances.
+
+Add a second service to the `docker-compose.yml` from the README, mapped to another port:
+
+    db-replica:
+      image: postgres:16
+      environment:
+        POSTGRES_PASSWORD: ${POSTGRES_PASSWORD}
+      ports:
+        - 5433:5432
+
+Set `DATABASE_REPLICA_URL` to it and push the schema to both, then run from the project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.replica
+
+The two instances do not need to replicate, the check only looks at which one answers. It then
+stops the replica service to check the fallback to the primary, and starts it again.
+"""
+import subprocess
+import sys
+import time
+
+from models.database import init_database_connection, prisma
+from models.replica import LAG_CHECK_INTERVAL, replica_reads
+
+SERVER_QUERY = "SELECT inet_server_addr()::text AS addr, pg_is_in_recovery() AS recovery"
+
+
+def server() -> dict:
+    return prisma.get_client().query_first(SERVER_QUERY)
+
+
+def check(label: str, expected: dict):
+    with replica_reads():
+        served = server()
+    result = "ok" if served == expected else "FAILED"
+    print(f"{label:<32} {served['addr']:<16} {result}")
+    if served != expected:
+        sys.exit(f"{label}: expected {expected['addr']}")
+
+
+def main():
+    if not init_database_connection():
+        sys.exit("Failed to connect to database")
+
+    primary = server()
+    with replica_reads():
+        # The first lag check connects the replica
+        server()
+        replica = server()
+    if replica == primary:
+        sys.exit("Replica reads are served by the primary, is DATABASE_REPLICA_URL set?")
+    print(f"{'primary':<32} {primary['addr']}")
+    check("replica reads", replica)
+
+    prisma.get_client().execute_raw("SELECT 1")
+    check("replica reads after a write", primary)
+    time.sleep(2 * LAG_CHECK_INTERVAL)
+    check("replica reads after the lag", replica)
+
+    subprocess.run(["docker", "compose", "stop", "db-replica"], check=True)
+    try:
+        time.sleep(LAG_CHECK_INTERVAL)
+        check("replica reads, replica stopped", primary)
+    finally:
+        subprocess.run(["docker", "compose", "start", "db-replica"], check=True)
+
+
+if __name__ == "__main__":
+    main()
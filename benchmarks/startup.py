@@ -0,0 +1,99 @@
+"""Reports where the app spends its cold start and holds it to a budget.
+
+Each entry point is imported in a fresh interpreter with `-X importtime`, so nothing is cached
+between measurements: `main.py` and every page file, whose imports only run once the page is
+opened. Then the login page is rendered once with Streamlit's AppTest, which includes the
+database connection and warmup. Needs the generated client and a database, run from the
+project root:
+
+    dotenv -f .env.local run -- python -m benchmarks.startup
+"""
+import ast
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Milliseconds, for a fresh interpreter on a development machine
+IMPORT_BUDGET = 1500
+PAGE_IMPORT_BUDGET = 1000
+FIRST_PAGE_BUDGET = 3000
+TOP_PACKAGES = 5
+
+ENTRY_POINTS = ["main.py", *sorted(str(path) for path in Path("views").rglob("*.py"))]
+
+
+def module_imports(path: str) -> list[str]:
+    """
+    Returns the modules imported at the top level of a script.
+    """
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return modules
+
+
+def import_times(modules: list[str]) -> tuple[float, dict[str, float]]:
+    """
+    Imports the modules in a fresh interpreter.
+
+    Returns
+    -------
+    tuple[float, dict[str, float]]
+        Total time and self time per top level package, in milliseconds.
+    """
+    code = "\n".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total = 0.0
+    packages = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        # Top level imports are not indented
+        if not name.startswith("  "):
+            total += int(cumulative_us) / 1000
+    return total, packages
+
+
+def first_page() -> float:
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    app = AppTest.from_file("main.py", default_timeout=60).run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return elapsed
+
+
+def main():
+    over = []
+    for path in ENTRY_POINTS:
+        total, packages = import_times(module_imports(path))
+        budget = IMPORT_BUDGET if path == "main.py" else PAGE_IMPORT_BUDGET
+        top = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP_PACKAGES]
+        print(f"{path:<32} {total:8.1f} ms  " + ", ".join(f"{name} {ms:.0f}" for name, ms in top))
+        if total > budget:
+            over.append(f"{path} imports ({total:.0f} > {budget} ms)")
+
+    elapsed = first_page()
+    print(f"{'first page':<32} {elapsed:8.1f} ms")
+    if elapsed > FIRST_PAGE_BUDGET:
+        over.append(f"first page ({elapsed:.0f} > {FIRST_PAGE_BUDGET} ms)")
+
+    if over:
+        sys.exit("Over budget: " + ", ".join(over))
+
+
+if __name__ == "__main__":
+    main()
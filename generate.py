@@ -0,0 +1,279 @@
+"""Generates synthetic users, moods, summaries and events for scale testing.
+
+Users log moods with streaks: each user has an engagement level, logging days come in runs, and
+moods follow a sticky Markov chain. Weeks with enough moods get a summary linked to resources
+from `prisma/resources.csv` (run seed.py first). The output only depends on `--seed` and `--end`,
+which defaults to a fixed day rather than today. Rows use `load-` ids and `--reset` removes them.
+
+    dotenv -f .env.local run -- python generate.py --users 10000 --years 2
+
+Rows are written with batched `create_many`, or with Postgres COPY when `--copy` is given. COPY
+needs `pip install psycopg`, and fails on previously generated rows unless `--reset` is given.
+All users share the password given by `--password`. The run prints the time spent writing apart
+from generating: 10,000 users over two years are about 6.8 million rows, generated in under a
+minute on one core.
+"""
+
+import dotenv
+
+dotenv.load_dotenv(".env.local")
+
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import bcrypt
+from prisma import Prisma
+
+from models.events import MOOD_EVENT_TYPES
+
+USER_CHUNK = 200
+BATCH_SIZE = 5000
+ID_PREFIX = "load-"
+# Last day of the history unless `--end` is given, fixed so runs on different days match
+DEFAULT_END = date(2024, 12, 31)
+
+MOODS = ["Happy", "Calm", "Sad", "Stressed"]
+# Probability of tomorrow's mood given today's, moods tend to last a few days
+MOOD_TRANSITIONS = {
+    "Happy": [0.6, 0.25, 0.05, 0.1],
+    "Calm": [0.25, 0.55, 0.1, 0.1],
+    "Sad": [0.1, 0.2, 0.5, 0.2],
+    "Stressed": [0.1, 0.15, 0.2, 0.55],
+}
+DESCRIPTIONS = {
+    "Happy": ["Great day with friends", "Finished my assignment early", "Sunny walk by the river",
+              "Good news from home", "Won our match tonight", ""],
+    "Calm": ["Quiet study session", "Slow morning with coffee", "Read a book in the park",
+             "Yoga before class", "Nothing special, just relaxed", ""],
+    "Sad": ["Missing home", "Didn't sleep well", "Feeling a bit lonely", "Bad grade on a quiz",
+            "Rainy and grey all day", ""],
+    "Stressed": ["Exams next week", "Too many deadlines", "Group project falling apart",
+                 "Running late all day", "Worried about money", ""],
+}
+KEYWORDS = {
+    "Happy": "social, energy, gratitude",
+    "Calm": "balance, rest, routine",
+    "Sad": "support, connection, self-care",
+    "Stressed": "workload, planning, breathing",
+}
+EVENT_NAMES = ["Open Mic", "Study Jam", "Campus Run", "Mindful Hour", "Career Fair", "Craft Night",
+               "Volunteer Day", "Peer Support Circle", "Yoga Session", "Board Games"]
+
+TABLES = {
+    "User": ["id", "email", "username", "password", "first_name", "last_name", "roles", "created_at",
+             "updated_at"],
+    "Mood": ["user_id", "date", "name", "description"],
+    "Summary": ["id", "user_id", "start", "end", "keywords", "content", "created_at", "updated_at"],
+    "ResourceOnSummary": ["summary_id", "resource_id"],
+    "Event": ["id", "name", "start", "end", "description", "created_at", "updated_at"],
+    "EventOnType": ["event_id", "type_id"],
+}
+
+
+class Writer:
+    """
+    Writes rows with batched `create_many`, or with COPY over a separate psycopg connection.
+    """
+
+    def __init__(self, db, copy: bool, batch_size: int = BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.rows = {}
+        # Time spent in the database, apart from generating the rows
+        self.seconds = 0.0
+        self.connection = None
+        if copy:
+            try:
+                import psycopg
+            except ImportError:
+                raise SystemExit("--copy needs psycopg, install it with `pip install psycopg`")
+            self.connection = psycopg.connect(os.environ["DATABASE_URL"].split("?")[0])
+
+    def write(self, table: str, rows: list[dict]):
+        if not rows:
+            return
+        self.rows[table] = self.rows.get(table, 0) + len(rows)
+        began = time.perf_counter()
+        try:
+            self._write(table, rows)
+        finally:
+            self.seconds += time.perf_counter() - began
+
+    def _write(self, table: str, rows: list[dict]):
+        if self.connection is None:
+            actions = getattr(self.db, table.lower())
+            for start in range(0, len(rows), self.batch_size):
+                actions.create_many(data=rows[start:start + self.batch_size], skip_duplicates=True)
+            return
+
+        columns = TABLES[table]
+        quoted = ", ".join(f'"{column}"' for column in columns)
+        with self.connection.cursor() as cursor:
+            with cursor.copy(f'COPY "{table}" ({quoted}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row([row.get(column) for column in columns])
+        self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def generate_user(seed: int, index: int, start: date, end: date, password: str, resource_ids: list[str]):
+    """
+    Generates one user with their moods, summaries and summary links.
+    """
+    rng = random.Random(f"{seed}-{index}")
+    user_id = f"{ID_PREFIX}u{index:07d}"
+    joined = start + timedelta(days=rng.randrange(0, 60))
+    created_at = datetime.combine(joined, datetime.min.time())
+    user = {
+        "id": user_id,
+        "email": f"load{index}@example.com",
+        "username": f"load{index}",
+        "password": password,
+        "first_name": f"Load{index}",
+        "last_name": "User",
+        "roles": ["user"],
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+    moods, summaries, links = [], [], []
+    engagement = rng.betavariate(2, 2)
+    logging = rng.random() < engagement
+    mood = rng.choice(MOODS)
+    week = []
+
+    day = joined
+    while day <= end:
+        # Logging days come in runs, engaged users start runs more often and stop them less
+        if logging and rng.random() < 0.08 * (1 - engagement) + 0.02:
+            logging = False
+        elif not logging and rng.random() < 0.3 * engagement:
+            logging = True
+
+        mood = rng.choices(MOODS, MOOD_TRANSITIONS[mood])[0]
+        if logging:
+            date_time = datetime.combine(day, datetime.min.time())
+            moods.append({"user_id": user_id, "date": date_time, "name": mood,
+                          "description": rng.choice(DESCRIPTIONS[mood]) or None})
+            week.append(mood)
+
+        if day.weekday() == 6:
+            if len(week) >= 4:
+                dominant = max(set(week), key=week.count)
+                summary_id = f"{ID_PREFIX}s{index:07d}-{day.isoformat()}"
+                summary_end = datetime.combine(day, datetime.min.time())
+                summaries.append({
+                    "id": summary_id,
+                    "user_id": user_id,
+                    "start": summary_end - timedelta(days=6),
+                    "end": summary_end,
+                    "keywords": KEYWORDS[dominant],
+                    "content": f"You felt mostly {dominant.lower()} this week, logging {len(week)} days. "
+                               f"Keep an eye on {KEYWORDS[dominant].split(', ')[0]} and take time for yourself.",
+                    "created_at": summary_end + timedelta(days=1),
+                    "updated_at": summary_end + timedelta(days=1),
+                })
+                for resource_id in rng.sample(resource_ids, min(len(resource_ids), rng.randint(1, 3))):
+                    links.append({"summary_id": summary_id, "resource_id": resource_id})
+            week = []
+        day += timedelta(days=1)
+
+    return user, moods, summaries, links
+
+
+def generate_events(writer: Writer, seed: int, count: int, start: date, end: date):
+    rng = random.Random(f"{seed}-events")
+    type_names = sorted({name for names in MOOD_EVENT_TYPES.values() for name in names})
+    # Types may already exist from imported events, they are never copied
+    writer.db.type.create_many(data=[{"name": name} for name in type_names], skip_duplicates=True)
+    type_ids = {t.name: t.id for t in writer.db.type.find_many(where={"name": {"in": type_names}})}
+
+    events, links = [], []
+    days = (end - start).days + 30
+    for index in range(count):
+        event_start = datetime.combine(start, datetime.min.time()) + timedelta(
+            days=rng.randrange(days), hours=rng.choice([10, 12, 14, 17, 19]))
+        event_id = f"{ID_PREFIX}e{index:07d}"
+        events.append({
+            "id": event_id,
+            "name": f"{rng.choice(EVENT_NAMES)} #{index}"[:32],
+            "start": event_start,
+            "end": event_start + timedelta(hours=rng.choice([1, 2, 3])),
+            "description": None,
+            "created_at": event_start - timedelta(days=14),
+            "updated_at": event_start - timedelta(days=14),
+        })
+        for name in rng.sample(type_names, rng.randint(1, 3)):
+            links.append({"event_id": event_id, "type_id": type_ids[name]})
+
+    writer.write("Event", events)
+    writer.write("EventOnType", links)
+
+
+def reset(db):
+    # Moods, summaries and links are removed by the cascades
+    db.execute_raw('DELETE FROM "User" WHERE id LIKE $1', f"{ID_PREFIX}%")
+    db.execute_raw('DELETE FROM "Event" WHERE id LIKE $1', f"{ID_PREFIX}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic data for scale testing")
+    parser.add_argument("--users", type=int, default=1000, help="Number of users")
+    parser.add_argument("--years", type=float, default=2, help="Years of mood history")
+    parser.add_argument("--events", type=int, help="Number of events, defaults to one per ten users")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed gives the same data")
+    parser.add_argument("--end", type=date.fromisoformat, default=DEFAULT_END,
+                        help=f"Last day of the history, defaults to {DEFAULT_END}")
+    parser.add_argument("--password", default="LoadTest123!", help="Password of every generated user")
+    parser.add_argument("--copy", action="store_true", help="Write with Postgres COPY, needs psycopg")
+    parser.add_argument("--reset", action="store_true", help="Remove previously generated rows first")
+    args = parser.parse_args()
+
+    end = args.end
+    start = end - timedelta(days=round(args.years * 365))
+    # Hashed once, bcrypt would otherwise dominate the run
+    password = bcrypt.hashpw(args.password.encode(), bcrypt.gensalt()).decode()
+
+    db = Prisma()
+    db.connect()
+    writer = Writer(db, args.copy)
+    began = time.perf_counter()
+    try:
+        if args.reset:
+            reset(db)
+        resource_ids = sorted(resource.id for resource in db.resource.find_many())
+
+        for chunk_start in range(0, args.users, USER_CHUNK):
+            users, moods, summaries, links = [], [], [], []
+            for index in range(chunk_start, min(chunk_start + USER_CHUNK, args.users)):
+                user, user_moods, user_summaries, user_links = generate_user(
+                    args.seed, index, start, end, password, resource_ids)
+                users.append(user)
+                moods += user_moods
+                summaries += user_summaries
+                links += user_links
+            writer.write("User", users)
+            writer.write("Mood", moods)
+            writer.write("Summary", summaries)
+            writer.write("ResourceOnSummary", links)
+            print(f"{chunk_start + len(users)}/{args.users} users, {time.perf_counter() - began:.0f}s")
+
+        generate_events(writer, args.seed, args.events if args.events is not None else args.users // 10, start, end)
+    finally:
+        writer.close()
+        db.disconnect()
+
+    counts = ", ".join(f"{rows} {table}" for table, rows in writer.rows.items())
+    total = sum(writer.rows.values())
+    print(f"Generated {counts} in {time.perf_counter() - began:.0f}s")
+    print(f"Writing took {writer.seconds:.0f}s, {total / max(writer.seconds, 1e-9):,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ from views.font import set_font
 from models.auth import pre_login
 from models.rbac import _is_logged_in
 from models.database import init_database_connection
+from models.deletion import start_deletion_worker
+from models.sessions import HEARTBEAT_INTERVAL, heartbeat
 from views.profiles.logout import logout_menu
 from streamlit_theme import st_theme
 
@@ -34,6 +36,7 @@ def init_app():
     if not init_database_connection():
         st.error("Failed to connect to database")
         st.stop()
+    start_deletion_worker()
 
     pages = {}
 
@@ -96,10 +99,16 @@ def init_navigation(pages):
     return pg
 
 
+@st.fragment(run_every=HEARTBEAT_INTERVAL)
+def session_heartbeat():
+    heartbeat()
+
+
 pages = init_app()
 pre_login()
 pg = init_navigation(pages)
 if _is_logged_in():
     logout_menu()
+    session_heartbeat()
 
 pg.run()
@@ -0,0 +1,173 @@
+"""
+Script description: This module archives the monthly `Mood` partitions that fell out of the
+retention window into Parquet files, and reads them back for exports and analytics.
+
+Each archived month is a directory of Parquet parts sorted by user, under `MOOD_ARCHIVE_DIR`.
+A month is written to a temporary directory and renamed into place before its partition is
+dropped, so readers never see a partial month.
+"""
+
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+import polars as pl
+
+PART_SIZE = 100_000
+MOOD_SCHEMA = {"user_id": pl.String, "date": pl.Datetime("us"), "name": pl.String, "description": pl.String}
+PARTITION_NAME = re.compile(r"^Mood_(\d{4})_(\d{2})$")
+
+PARTITIONS_QUERY = """
+SELECT c.relname AS name FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = '"Mood"'::regclass
+ORDER BY c.relname
+"""
+
+PART_QUERY = """
+SELECT user_id, date, name, description FROM "{partition}"
+WHERE (user_id, date) > ($1, $2::timestamp)
+ORDER BY user_id, date
+LIMIT $3
+"""
+
+
+def archive_dir() -> Path:
+    return Path(os.getenv("MOOD_ARCHIVE_DIR", "archive/mood"))
+
+
+def retention() -> timedelta:
+    # Longer than the calendar's browsing window, which is the oldest data the app shows
+    return timedelta(days=int(os.getenv("MOOD_RETENTION_DAYS", "180")))
+
+
+def _parts() -> list[Path]:
+    # Months being written are staged in `YYYY-MM.tmp` and skipped
+    return sorted(archive_dir().glob("[0-9][0-9][0-9][0-9]-[0-9][0-9]/*.parquet"))
+
+
+def scan_archived_moods() -> Optional[pl.LazyFrame]:
+    """
+    Returns the archived moods of all users, or None when nothing is archived yet.
+    """
+    parts = _parts()
+    if not parts:
+        return None
+    return pl.scan_parquet(parts, schema=MOOD_SCHEMA)
+
+
+def archived_moods(user_id: str) -> Iterator[dict]:
+    """
+    Yields the archived moods of the user, oldest first, reading one part at a time.
+    """
+    # Months are in order and parts are sorted by user and date, so no sort across parts is needed
+    for path in _parts():
+        moods = pl.scan_parquet(path, schema=MOOD_SCHEMA).filter(pl.col("user_id") == user_id).collect()
+        yield from moods.iter_rows(named=True)
+
+
+def monthly_mood_counts(client) -> pl.DataFrame:
+    """
+    Counts the moods of all users per month and mood, live and archived months together.
+
+    Returns
+    -------
+    pl.DataFrame
+        `month` as `YYYY-MM`, `name` and `count`, sorted by month.
+    """
+    # The live table only holds the retention window, grouping it by day stays small
+    live = client.mood.group_by(by=["date", "name"], count=True)
+    counts = [pl.DataFrame(
+        {
+            "month": [row["date"][:7] for row in live],
+            "name": [row["name"] for row in live],
+            "count": [row["_count"]["_all"] for row in live],
+        },
+        schema={"month": pl.String, "name": pl.String, "count": pl.UInt32},
+    )]
+    if (archived := scan_archived_moods()) is not None:
+        counts.append(
+            archived
+            .group_by(pl.col("date").dt.strftime("%Y-%m").alias("month"), "name")
+            .agg(pl.len().alias("count"))
+            .collect()
+        )
+    return pl.concat(counts).group_by("month", "name").agg(pl.col("count").sum()).sort("month", "name")
+
+
+def expired_partitions(client) -> list[tuple[str, datetime]]:
+    """
+    Returns the monthly partitions whose whole month is older than the retention window.
+    """
+    cutoff = datetime.now(tz=timezone.utc).replace(tzinfo=None) - retention()
+    expired = []
+    for row in client.query_raw(PARTITIONS_QUERY):
+        if match := PARTITION_NAME.match(row["name"]):
+            month = datetime(int(match[1]), int(match[2]), 1)
+            month_end = (month + timedelta(days=32)).replace(day=1)
+            if month_end <= cutoff:
+                expired.append((row["name"], month))
+    return expired
+
+
+def archive_partition(client, partition: str, month: datetime, part_size: int = PART_SIZE) -> int:
+    """
+    Copies the partition to Parquet parts, then detaches and drops it.
+
+    Returns
+    -------
+    int
+        Number of archived rows.
+    """
+    target = archive_dir() / month.strftime("%Y-%m")
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    rows = 0
+    cursor = ("", datetime.min)
+    while True:
+        page = client.query_raw(PART_QUERY.format(partition=partition), *cursor, part_size)
+        if not page:
+            break
+        part = pl.DataFrame(page, schema=MOOD_SCHEMA)
+        path = staging / f"part-{rows // part_size:05d}.parquet"
+        part.write_parquet(path, compression="zstd")
+        if pl.scan_parquet(path).select(pl.len()).collect().item() != len(part):
+            raise RuntimeError(f"Archive part {path} is incomplete")
+        rows += len(part)
+        cursor = (page[-1]["user_id"], page[-1]["date"])
+
+    # A month archived by an interrupted run is replaced, its partition was not dropped
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+
+    client.execute_raw(f'ALTER TABLE "Mood" DETACH PARTITION "{partition}"')
+    client.execute_raw(f'DROP TABLE "{partition}"')
+    return rows
+
+
+def purge_archived_moods(user_id: str) -> int:
+    """
+    Rewrites the archive parts holding moods of the user without them.
+
+    Returns
+    -------
+    int
+        Number of removed rows.
+    """
+    removed = 0
+    for path in _parts():
+        # Parts are sorted by user, row group statistics skip most of them without reading
+        if not pl.scan_parquet(path).filter(pl.col("user_id") == user_id).select(pl.len()).collect().item():
+            continue
+        part = pl.read_parquet(path)
+        kept = part.filter(pl.col("user_id") != user_id)
+        temporary = path.with_suffix(".tmp")
+        kept.write_parquet(temporary, compression="zstd")
+        os.replace(temporary, path)
+        removed += len(part) - len(kept)
+    return removed
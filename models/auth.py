@@ -7,7 +7,9 @@ from yaml.loader import SafeLoader
 
 from models.authentication_models import AuthenticationModel as _AuthenticationModel
 from models.authentication_models import LoginError
-from models.authentication_validator import Validator
+from models.authentication_validator import DomainPolicy, Validator
+from models.claims import encode_claims
+from models.hashing import DEFAULT_MAX_PENDING, DEFAULT_ROUNDS, get_hasher
 
 
 @st.cache_resource
@@ -20,6 +22,7 @@ def load_config():
         raise ValueError("STREAMLIT_AUTH_KEY is not set")
 
     config["cookie_key"] = STREAMLIT_AUTH_KEY
+    config["mail_policy"] = DomainPolicy.compile(config["mail_whitelist"])
     return config
 
 
@@ -31,14 +34,23 @@ def load_authenticator() -> stauth.Authenticate:
             cookie_name=config["cookie_name"],
             cookie_key=config["cookie_key"],
             cookie_expiry_days=config["cookie_expiry_days"],
-            validator=Validator(config["mail_whitelist"])
+            validator=Validator(config["mail_policy"])
         )
 
         # Patch the AuthenticationModel to use our custom one
         authenticator.authentication_controller.authentication_model = _AuthenticationModel(
             credentials=config["credentials"],
+            hasher=get_hasher(
+                config.get("bcrypt_rounds", DEFAULT_ROUNDS),
+                config.get("hasher_workers"),
+                config.get("hasher_max_pending", DEFAULT_MAX_PENDING),
+            ),
         )
 
+        # Sign the user's claims into the cookie so fresh sessions can skip the database
+        cookie_model = authenticator.cookie_controller.cookie_model
+        cookie_model._token_encode = lambda: encode_claims(cookie_model)
+
         st.session_state["global_authenticator"] = authenticator
 
     return st.session_state["global_authenticator"]
@@ -56,6 +68,8 @@ def pre_login() -> bool:
         if token:
             try:
                 authenticator.authentication_controller.login(token=token)
+                if st.session_state.pop("refresh_cookie", False):
+                    authenticator.cookie_controller.set_cookie()
             except LoginError:
                 wipe_cookie(authenticator)
     return False
@@ -13,7 +13,6 @@ import streamlit as st
 from streamlit_authenticator.models.oauth2 import GoogleModel
 from streamlit_authenticator.models.oauth2 import MicrosoftModel
 from streamlit_authenticator.utilities import (
-    Hasher,
     Helpers,
     CredentialsError,
     ForgotError,
@@ -23,7 +22,24 @@ from streamlit_authenticator.utilities import (
     UpdateError,
 )
 
+from models import identity
+from models.claims import remember_session_epoch, verify_claims
 from models.database import User
+from models.hashing import HasherBusyError, PasswordHasher, get_hasher
+from models.sessions import current_session_id, get_session_registry, heartbeat
+from models.throttle import client_address, get_login_throttle
+
+# Clears failed attempts of a verified user in a single round trip. The row is only updated
+# (and returned) if the attempt limit allows it, a password hash created with an outdated cost
+# is replaced in the same statement.
+LOGIN_QUERY = """
+UPDATE "User"
+SET failed_login_attempts = 0, password = COALESCE($3, password),
+    updated_at = (now() AT TIME ZONE 'UTC')
+WHERE id = $1
+  AND ($2::int IS NULL OR failed_login_attempts < $2::int)
+RETURNING *
+"""
 
 
 class AuthenticationModel:
@@ -33,7 +49,7 @@ class AuthenticationModel:
     """
 
     def __init__(self, credentials: Optional[dict] = None, auto_hash: bool = True,
-                 path: Optional[str] = None):
+                 path: Optional[str] = None, hasher: Optional[PasswordHasher] = None):
         """
         Create a new instance of "AuthenticationModel".
 
@@ -47,10 +63,14 @@ class AuthenticationModel:
             False: plain text passwords will not be automatically hashed.
         path: str
             File path of the config file.
+        hasher: PasswordHasher, optional
+            Process pool used to hash and verify passwords.
         """
 
         self.path = path
         self.credentials = credentials
+        self.hasher = hasher or get_hasher()
+        self.throttle = get_login_throttle()
 
         if "name" not in st.session_state:
             st.session_state["name"] = None
@@ -85,13 +105,13 @@ class AuthenticationModel:
             False: incorrect credentials.
         """
 
-        user = User.prisma().find_first(where={"username": username})
+        user = identity.get_user(username)
 
         if not user:
             return False
 
         try:
-            if Hasher.check_pw(password, user.password):
+            if self.hasher.check(password, user.password):
                 return True
         except (TypeError, ValueError) as e:
             print(f"{e} please hash all plain text passwords")
@@ -106,8 +126,7 @@ class AuthenticationModel:
         int
             Number of users logged in concurrently.
         """
-        concurrent_users = User.prisma().count(where={"logged_in": True})
-        return concurrent_users
+        return get_session_registry().live_users()
 
     def forgot_password(
             self, username: str, callback: Optional[Callable] = None
@@ -134,7 +153,7 @@ class AuthenticationModel:
         if self._is_guest_user(username):
             raise ForgotError("Guest user cannot use forgot password widget")
 
-        user = User.prisma().find_first(where={"username": username})
+        user = identity.get_user(username)
         if not user:
             raise ForgotError("User not found")
 
@@ -287,7 +306,7 @@ class AuthenticationModel:
             False: non-guest user.
         """
 
-        user = User.prisma().find_first(where={"username": username})
+        user = identity.get_user(username)
         if not user:
             raise LoginError("User not found")
 
@@ -339,15 +358,20 @@ class AuthenticationModel:
         """
         if username:
             st.session_state["authentication_need_credentials"] = False
-            user = User.prisma().find_first(where={"username": username})
+            if not self.throttle.allow(username, client_address()):
+                raise LoginError("Too many login attempts, please try again later")
+
+            user = User.prisma().find_first(where={"username": username, "deleted_at": None})
             success = False
 
             if user and user.password:
                 try:
-                    if Hasher.check_pw(password, user.password):
+                    if self.hasher.check(password, user.password):
                         success = True
                     else:
                         self._record_failed_login_attempts(username)
+                except HasherBusyError as e:
+                    raise LoginError(str(e))
                 except (TypeError, ValueError) as e:
                     print(f"{e} Database password is not hashed")
 
@@ -359,27 +383,44 @@ class AuthenticationModel:
                     raise LoginError("Maximum number of concurrent users exceeded")
 
                 if isinstance(max_login_attempts, int):
-                    if user.failed_login_attempts >= max_login_attempts:
+                    failed_login_attempts = user.failed_login_attempts + self.throttle.failures.pending(username)
+                    if failed_login_attempts >= max_login_attempts:
                         raise LoginError("Maximum number of login attempts exceeded")
 
-                if (
-                        single_session
-                        and user.logged_in
-                ):
+                if single_session and get_session_registry().user_sessions(user.id) > 0:
                     raise LoginError("Cannot log in multiple sessions")
+
+                rehashed_password = None
+                if self.hasher.needs_rehash(user.password):
+                    try:
+                        rehashed_password = self.hasher.hash(password)
+                    except HasherBusyError:
+                        pass
+
+                with self.throttle.failures.resetting(username):
+                    logged_in_user = User.prisma().query_first(
+                        LOGIN_QUERY,
+                        user.id,
+                        max_login_attempts if isinstance(max_login_attempts, int) else None,
+                        rehashed_password,
+                    )
+                if not logged_in_user:
+                    raise LoginError("Maximum number of login attempts exceeded")
+                user = logged_in_user
+                identity.remember(user)
+                remember_session_epoch(user.id, user.session_epoch)
+
                 (
                     st.session_state["email"],
                     st.session_state["name"],
                     st.session_state["roles"],
                     st.session_state["user_id"],
-                ) = user.email, f"{user.first_name} {user.last_name}", user.roles, user.id
+                    st.session_state["session_epoch"],
+                ) = user.email, f"{user.first_name} {user.last_name}", user.roles, user.id, user.session_epoch
 
                 st.session_state["authentication_status"] = True
                 st.session_state["username"] = username
-                self._record_failed_login_attempts(username, reset=True)
-
-                user.logged_in = True
-                User.prisma().update(where={"username": username}, data={"logged_in": True})
+                heartbeat()
 
                 if "password_hint" in st.session_state:
                     del st.session_state["password_hint"]
@@ -398,20 +439,31 @@ class AuthenticationModel:
 
         if token:
             st.session_state["authentication_need_credentials"] = False
-            user = User.prisma().find_first(where={"username": token["username"]})
-            if not user:
-                raise LoginError("User not authorized")
-            (
-                st.session_state["email"],
-                st.session_state["name"],
-                st.session_state["roles"],
-                st.session_state["user_id"],
-            ) = user.email, f"{user.first_name} {user.last_name}", user.roles, user.id
+            if verify_claims(token):
+                (
+                    st.session_state["email"],
+                    st.session_state["name"],
+                    st.session_state["roles"],
+                    st.session_state["user_id"],
+                    st.session_state["session_epoch"],
+                ) = token["email"], token["name"], token["roles"], token["user_id"], token["epoch"]
+            else:
+                user = User.prisma().find_unique(where={"username": token["username"]})
+                if not user or user.deleted_at:
+                    raise LoginError("User not authorized")
+                remember_session_epoch(user.id, user.session_epoch)
+                (
+                    st.session_state["email"],
+                    st.session_state["name"],
+                    st.session_state["roles"],
+                    st.session_state["user_id"],
+                    st.session_state["session_epoch"],
+                ) = user.email, f"{user.first_name} {user.last_name}", user.roles, user.id, user.session_epoch
+                # The claims in the cookie are stale, re-issue them
+                st.session_state["refresh_cookie"] = True
             st.session_state["authentication_status"] = True
             st.session_state["username"] = token["username"]
-            user.logged_in = True
-
-            User.prisma().update(where={"username": token["username"]}, data={"logged_in": True})
+            heartbeat()
 
         return None
 
@@ -424,7 +476,9 @@ class AuthenticationModel:
         callback: callable, optional
             Callback function that will be invoked on button press.
         """
-        User.prisma().update(where={"username": st.session_state["username"]}, data={"logged_in": False})
+        session_id = current_session_id()
+        if session_id and st.session_state.get("user_id"):
+            get_session_registry().remove(session_id, st.session_state["user_id"])
 
         st.session_state['logout'] = True
         st.session_state['name'] = None
@@ -433,6 +487,7 @@ class AuthenticationModel:
         st.session_state['email'] = None
         st.session_state['roles'] = None
         st.session_state['user_id'] = None
+        st.session_state['session_epoch'] = None
 
         if callback:
             callback({"widget": "Logout"})
@@ -448,13 +503,15 @@ class AuthenticationModel:
         reset: bool
             Reset failed login attempts option,
             True: number of failed login attempts for the user will be reset to 0,
-            False: number of failed login attempts for the user will be incremented.
+            False: number of failed login attempts for the user will be incremented
+            with the next batched flush.
         """
         if reset:
-            User.prisma().update(where={"username": username}, data={"failed_login_attempts": 0})
+            with self.throttle.failures.resetting(username):
+                User.prisma().update(where={"username": username}, data={"failed_login_attempts": 0})
+            identity.invalidate(username)
         else:
-            User.prisma().update(where={"username": username}, data={"failed_login_attempts": {"increment": 1}})
-            print(username, "failed login attempt")
+            self.throttle.failures.record(username)
 
     def _register_credentials(
             self,
@@ -491,7 +548,7 @@ class AuthenticationModel:
             "email": email,
             "first_name": first_name,
             "last_name": last_name,
-            "password": Hasher.hash(password),
+            "password": self.hasher.hash(password),
             "password_hint": password_hint,
             "roles": roles,
         })
@@ -549,15 +606,18 @@ class AuthenticationModel:
         if existing_user:
             raise RegisterError("Username already taken")
 
-        self._register_credentials(
-            new_username,
-            new_first_name,
-            new_last_name,
-            new_password,
-            new_email,
-            password_hint,
-            roles,
-        )
+        try:
+            self._register_credentials(
+                new_username,
+                new_first_name,
+                new_last_name,
+                new_password,
+                new_email,
+                password_hint,
+                roles,
+            )
+        except HasherBusyError as e:
+            raise RegisterError(str(e))
 
         if callback:
             callback(
@@ -601,10 +661,15 @@ class AuthenticationModel:
         """
         if self._is_guest_user(username):
             raise ResetError("Guest user cannot reset password")
-        if not self.check_credentials(username, password):
-            raise CredentialsError("password")
-
-        User.prisma().update(where={"username": username}, data={"password": Hasher.hash(new_password)})
+        try:
+            if not self.check_credentials(username, password):
+                raise CredentialsError("password")
+            hashed_password = self.hasher.hash(new_password)
+        except HasherBusyError as e:
+            raise ResetError(str(e))
+
+        User.prisma().update(where={"username": username}, data={"password": hashed_password})
+        identity.invalidate(username)
         self._record_failed_login_attempts(username, reset=True)
         if callback:
             callback({"widget": "Reset password", "username": username})
@@ -625,7 +690,8 @@ class AuthenticationModel:
             New plain text password that should be transferred to the user securely.
         """
         random_password = Helpers.generate_random_pw()
-        User.prisma().update(where={"username": username}, data={"password": Hasher.hash(random_password)})
+        User.prisma().update(where={"username": username}, data={"password": self.hasher.hash(random_password)})
+        identity.invalidate(username)
         return random_password
 
     def update_user_details(
@@ -661,7 +727,7 @@ class AuthenticationModel:
             if existing_user and existing_user.username != username:
                 raise UpdateError("Email already taken")
 
-        user = User.prisma().find_first(where={"username": username})
+        user = identity.get_user(username)
 
         if not user:
             raise UpdateError("User not found")
@@ -670,6 +736,7 @@ class AuthenticationModel:
 
         if new_value != user_dict[field]:
             User.prisma().update(where={"username": username}, data={field: new_value})
+            identity.invalidate(username)
             if field in {"first_name", "last_name"}:
                 st.session_state["name"] = f"{user.first_name} {user.last_name}"
             if callback:
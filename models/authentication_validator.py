@@ -3,9 +3,107 @@ Script description: This script provides string validations for various user inp
 
 Libraries imported:
 - re: Module implementing regular expressions.
+- functools: Module implementing caching of compiled patterns.
 """
 
 import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Union
+
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]{1,254}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63}$")
+NAME_PATTERN = re.compile(r"^[A-Za-z. ]{2,100}$")
+USERNAME_PATTERN = re.compile(
+    r"^([a-zA-Z0-9_-]{1,20}|[a-zA-Z0-9._%+-]{1,254}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})$"
+)
+UPPER_PATTERN = re.compile(r"[A-Z]")
+LOWER_PATTERN = re.compile(r"[a-z]")
+DIGIT_PATTERN = re.compile(r"\d")
+
+SPECIAL_CHARS = frozenset(r"!@#$%^&*(),.?\":{}|<>_\-\[\]~`+=/\\")
+VALID_PASSWORD_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+) | SPECIAL_CHARS
+
+
+@lru_cache(maxsize=32)
+def _length_pattern(min_length: int, max_length: int) -> re.Pattern:
+    return re.compile(rf"^.{{{min_length},{max_length}}}$")
+
+
+class _DomainNode:
+    __slots__ = ("children", "exact", "wildcard")
+
+    def __init__(self):
+        self.children = {}
+        # None: no rule, True: allowed, False: denied
+        self.exact: Optional[bool] = None
+        self.wildcard: Optional[bool] = None
+
+
+class DomainPolicy:
+    """
+    This class decides which email domains may register, using a trie of reversed domain
+    labels so a lookup costs one step per label regardless of the number of rules.
+
+    Rules:
+    - `bentley.edu` allows exactly that domain.
+    - `*.bentley.edu` allows every subdomain of bentley.edu.
+    - `!` in front of a rule denies instead, i.e. `!*.guest.bentley.edu`.
+
+    The most specific matching rule wins, a deny wins over an allow of the same rule.
+    """
+
+    def __init__(self):
+        self._root = _DomainNode()
+
+    @classmethod
+    def compile(cls, rules: Iterable[str]) -> "DomainPolicy":
+        """
+        Builds the policy from the configured rules.
+
+        Parameters
+        ----------
+        rules: list
+            Domain rules, see the class description for the syntax.
+
+        Returns
+        -------
+        DomainPolicy
+            The compiled policy.
+        """
+        policy = cls()
+        for rule in rules or []:
+            rule = rule.strip().lower()
+            allow = not rule.startswith("!")
+            rule = rule.lstrip("!")
+            wildcard = rule == "*" or rule.startswith("*.")
+            labels = rule.removeprefix("*").removeprefix(".").split(".") if rule != "*" else []
+
+            node = policy._root
+            for label in reversed([label for label in labels if label]):
+                node = node.children.setdefault(label, _DomainNode())
+            if wildcard:
+                node.wildcard = allow if node.wildcard is not False else False
+            else:
+                node.exact = allow if node.exact is not False else False
+        return policy
+
+    def allows(self, domain: str) -> bool:
+        """
+        Checks if the domain is allowed to register.
+        """
+        decision = False
+        node = self._root
+        for label in reversed(domain.lower().split(".")):
+            # Wildcard rules of a node cover every domain below it
+            if node.wildcard is not None:
+                decision = node.wildcard
+            node = node.children.get(label)
+            if node is None:
+                return decision
+        if node.exact is not None:
+            return node.exact
+        return decision
 
 
 class Validator:
@@ -14,7 +112,9 @@ class Validator:
     newly registered user.
     """
 
-    def __init__(self, mail_whitelist: list[str]):
+    def __init__(self, mail_whitelist: Union[List[str], DomainPolicy]):
+        if not isinstance(mail_whitelist, DomainPolicy):
+            mail_whitelist = DomainPolicy.compile(mail_whitelist)
         self.mail_whitelist = mail_whitelist
 
     def validate_email(self, email: str) -> bool:
@@ -31,12 +131,37 @@ class Validator:
         bool
             Validity of entered email.
         """
-        pattern = r"^[a-zA-Z0-9._%+-]{1,254}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63}$"
-        if bool(re.match(pattern, email)):
+        if EMAIL_PATTERN.match(email):
             domain = email.split("@")[1]
-            return domain in self.mail_whitelist
+            return self.mail_whitelist.allows(domain)
         return False
 
+    def validate_emails(self, emails: Iterable[str]) -> List[bool]:
+        """
+        Checks the validity of many emails, looking each domain up only once.
+
+        Parameters
+        ----------
+        emails: list
+            The emails to be validated.
+
+        Returns
+        -------
+        list
+            Validity of each email, in the same order.
+        """
+        domains = {}
+        results = []
+        for email in emails:
+            if not email or not EMAIL_PATTERN.match(email):
+                results.append(False)
+                continue
+            domain = email.split("@")[1]
+            if domain not in domains:
+                domains[domain] = self.mail_whitelist.allows(domain)
+            results.append(domains[domain])
+        return results
+
     def validate_length(self, variable: str, min_length: int = 0, max_length: int = 254) -> bool:
         """
         Checks the length of a variable.
@@ -55,8 +180,7 @@ class Validator:
         bool
             Validity of entered variable.
         """
-        pattern = rf"^.{{{min_length},{max_length}}}$"
-        return bool(re.match(pattern, variable))
+        return bool(_length_pattern(min_length, max_length).match(variable))
 
     def validate_name(self, name: str) -> bool:
         """
@@ -72,8 +196,7 @@ class Validator:
         bool
             Validity of entered name.
         """
-        pattern = r"^[A-Za-z. ]{2,100}$"
-        return bool(re.match(pattern, name))
+        return bool(NAME_PATTERN.match(name))
 
     def validate_password(self, password: str) -> bool:
         """
@@ -90,19 +213,16 @@ class Validator:
             Validity of entered password.
         """
 
-        special_chars = r"!@#$%^&*(),.?\":{}|<>_\-\[\]~`+=/\\"
-
         if not 8 <= len(password) <= 20:
             return False
 
-        has_upper = bool(re.search(r'[A-Z]', password))
-        has_lower = bool(re.search(r'[a-z]', password))
-        has_digit = bool(re.search(r'\d', password))
+        has_upper = bool(UPPER_PATTERN.search(password))
+        has_lower = bool(LOWER_PATTERN.search(password))
+        has_digit = bool(DIGIT_PATTERN.search(password))
 
-        has_special = any(char in special_chars for char in password)
+        has_special = any(char in SPECIAL_CHARS for char in password)
 
-        valid_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789' + special_chars)
-        has_valid_chars = all(char in valid_chars for char in password)
+        has_valid_chars = all(char in VALID_PASSWORD_CHARS for char in password)
 
         return all([has_upper, has_lower, has_digit, has_special, has_valid_chars])
 
@@ -120,5 +240,4 @@ class Validator:
         bool
             Validity of entered username.
         """
-        pattern = r"^([a-zA-Z0-9_-]{1,20}|[a-zA-Z0-9._%+-]{1,254}@[a-zA-Z0-9.-]{1,253}\.[a-zA-Z]{2,63})$"
-        return bool(re.match(pattern, username))
+        return bool(USERNAME_PATTERN.match(username))
@@ -0,0 +1,163 @@
+"""
+Script description: This module signs the user's identity into the re-authentication cookie,
+so a fresh session can be restored without reading the user from the database.
+
+Libraries imported:
+- jwt: Module implementing JSON Web Tokens for Python.
+- streamlit: Framework used to build pure Python web applications.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import jwt
+import streamlit as st
+
+from models.database import UserEpochView
+
+# Claims older than this are re-validated against the database and re-issued
+CLAIMS_MAX_AGE = 60 * 60
+# Upper bound on how long an epoch bumped by another process can still be accepted
+EPOCH_REFRESH_INTERVAL = 60
+# Users whose epochs are kept, the least recently seen are dropped first
+EPOCH_CACHE_SIZE = 10_000
+
+CLAIM_KEYS = {"user_id", "email", "name", "roles", "epoch", "issued_at"}
+
+
+def encode_claims(cookie_model: Any) -> str:
+    """
+    Encodes the re-authentication cookie, replacing `CookieModel._token_encode`.
+
+    Parameters
+    ----------
+    cookie_model: CookieModel
+        Cookie model holding the signing key and expiry date.
+
+    Returns
+    -------
+    str
+        Signed cookie with the user's claims.
+    """
+    return jwt.encode(
+        {
+            "username": st.session_state["username"],
+            "exp_date": cookie_model.exp_date,
+            "user_id": st.session_state.get("user_id"),
+            "email": st.session_state.get("email"),
+            "name": st.session_state.get("name"),
+            "roles": st.session_state.get("roles"),
+            "epoch": st.session_state.get("session_epoch"),
+            "issued_at": int(time.time()),
+        },
+        cookie_model.cookie_key,
+        algorithm="HS256",
+    )
+
+
+class SessionEpochs:
+    """
+    Session epochs of recently seen users, shared by all sessions of the process.
+
+    Epochs bumped by this process are updated right away. Epochs bumped by other processes are
+    picked up by re-reading every known user in one query per `interval` seconds, so a known
+    user is checked without a round trip however long ago they last opened the app.
+    """
+
+    def __init__(self, size: int = EPOCH_CACHE_SIZE, interval: float = EPOCH_REFRESH_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.size = size
+        self.interval = interval
+        self._clock = clock
+        self._epochs: OrderedDict[str, Optional[int]] = OrderedDict()
+        # Users updated while a refresh was reading, the refresh must not overwrite them
+        self._changed: set[str] = set()
+        # Counts updates, a read that overlapped one is not stored
+        self._version = 0
+        self._refreshed_at = clock()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[int]:
+        self._refresh()
+        with self._lock:
+            if user_id in self._epochs:
+                self._epochs.move_to_end(user_id)
+                return self._epochs[user_id]
+            version = self._version
+        user = UserEpochView.prisma().find_unique(where={"id": user_id})
+        epoch = user.session_epoch if user else None
+        with self._lock:
+            if self._version == version:
+                self._store(user_id, epoch)
+        return epoch
+
+    def set(self, user_id: str, epoch: Optional[int]):
+        with self._lock:
+            self._store(user_id, epoch)
+            self._changed.add(user_id)
+            self._version += 1
+
+    def _store(self, user_id: str, epoch: Optional[int]):
+        self._epochs[user_id] = epoch
+        self._epochs.move_to_end(user_id)
+        while len(self._epochs) > self.size:
+            self._epochs.popitem(last=False)
+
+    def _refresh(self):
+        with self._lock:
+            if self._clock() - self._refreshed_at < self.interval:
+                return
+            # Only one session refreshes, the others keep reading the current epochs
+            self._refreshed_at = self._clock()
+            user_ids = list(self._epochs)
+            self._changed.clear()
+        if not user_ids:
+            return
+        epochs = {user.id: user.session_epoch for user in UserEpochView.prisma().find_many(where={"id": {"in": user_ids}})}
+        with self._lock:
+            for user_id in user_ids:
+                if user_id in self._epochs and user_id not in self._changed:
+                    self._epochs[user_id] = epochs.get(user_id)
+
+
+_epochs = SessionEpochs()
+
+
+def get_session_epoch(user_id: str) -> Optional[int]:
+    """
+    Gets the session epoch of a user, shared by all sessions of the process.
+    Bumping the epoch in the database invalidates previously issued claims.
+    """
+    return _epochs.get(user_id)
+
+
+def remember_session_epoch(user_id: str, epoch: Optional[int]):
+    """
+    Records an epoch just read or bumped by this process.
+    """
+    _epochs.set(user_id, epoch)
+
+def verify_claims(token: dict) -> bool:
+    """
+    Checks that the decoded cookie carries fresh claims of the user's current epoch.
+    The signature itself is verified when the cookie is decoded.
+
+    Parameters
+    ----------
+    token: dict
+        The decoded re-authentication cookie.
+
+    Returns
+    -------
+    bool
+        Validity of the claims,
+        True: the session can be restored from the claims,
+        False: the user must be read from the database.
+    """
+    if not CLAIM_KEYS <= token.keys() or token["epoch"] is None:
+        return False
+    if time.time() - token["issued_at"] > CLAIMS_MAX_AGE:
+        return False
+    return get_session_epoch(token["user_id"]) == token["epoch"]
@@ -1,57 +1,136 @@
-import subprocess
 import streamlit as st
 import os
-import sys
-
-def generate_prisma_client():
-    """Generates the Prisma Client and loads it
-    """
-    print("Generating Prisma client")
-    
-    if sys.platform == "linux":
-        path_var = os.environ["PATH"].split(":")
-        if "/bin" not in path_var:
-            path_var.insert(0, "/bin")
-            os.environ["PATH"] = ":".join(path_var)
-            print(f"/bin added to PATH")
-
-            proc = subprocess.Popen(["sh", "-c", "echo ok"], stdout=subprocess.PIPE)
-            proc.wait()
-            if proc.returncode != 0:
-                print(f"sh -c echo ok returned {proc.returncode}")
-                raise Exception(f"Internal error")
-
-    proc = subprocess.Popen(["prisma", "generate"])
-    proc.wait()
-    if proc.returncode != 0:
-        if os.path.exists("/home/app/.npm/_logs/"):
-            for file in os.listdir("/home/app/.npm/_logs/"):
-                print(f"Contents of {file}:")
-                with open(f"/home/app/.npm/_logs/{file}", "r") as f:
-                    print(f.read())
-        raise Exception(f"Failed to execute command: prisma generate")
-    print("Prisma client generated")
+import random
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+import httpx
 
 try:
-    import prisma
     # noinspection PyUnresolvedReferences
     from prisma import Prisma
-except:
-    from prisma_cleanup import cleanup
+    # noinspection PyUnresolvedReferences
+    from prisma.models import *
+    # noinspection PyUnresolvedReferences
+    from prisma.partials import *
+except (ImportError, RuntimeError) as e:
+    # The client is generated when building the app, never at runtime
+    raise RuntimeError("Prisma client not found, run `prisma generate` before starting the app") from e
 
-    cleanup()
-    import importlib
+import prisma
+from prisma.engine.errors import EngineConnectionError
+from prisma.errors import DataError
 
-    importlib.invalidate_caches()
-    generate_prisma_client()
-    importlib.reload(prisma)
+from models import replica
+from models.replica import ReplicaRoutingMixin
+from models.tracing import TracingMixin
+
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+# Attempts for a query that hit a lost connection mid-session, kept low so pages fail fast
+QUERY_RETRIES = 3
+
+# Prisma errors for a database server that could not be reached, the query never ran
+UNREACHABLE_CODES = {"P1001", "P1002"}
+# Prisma error for a connection closed by the server, the query may have run
+CLOSED_CODE = "P1017"
+READ_METHODS = {
+    "find_unique", "find_unique_or_raise", "find_first", "find_first_or_raise", "find_many", "count", "group_by",
+}
+
+_reconnect_lock = threading.Lock()
 
-import prisma
-# noinspection PyUnresolvedReferences
-from prisma.models import *
-# noinspection PyUnresolvedReferences
-from prisma.partials import *
+
+def database_url(variable: str = "DATABASE_URL") -> str:
+    """
+    Returns the URL in `variable` with the pool settings from the environment, unless the URL sets them.
+    """
+    url = urlsplit(os.environ[variable])
+    params = dict(parse_qsl(url.query))
+    params.setdefault("connection_limit", os.getenv("DATABASE_POOL_SIZE", "10"))
+    params.setdefault("pool_timeout", os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+    params.setdefault("connect_timeout", os.getenv("DATABASE_CONNECT_TIMEOUT", "5"))
+    return urlunsplit(url._replace(query=urlencode(params)))
+
+
+def backoff(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter, so replicas restarting together spread their retries.
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+class ResilientPrisma(prisma.Prisma):
+    """
+    Prisma client that retries queries after the database or the query engine went away.
+
+    The engine's pool reconnects to the database by itself, so a query that could not reach the
+    server is retried after a backoff. A query engine that stopped responding is restarted first.
+    Queries that may have run already are only retried if they are reads, and queries inside a
+    transaction are never retried since the transaction is gone.
+    """
+
+    def _execute(self, method, arguments, model=None, root_selection=None):
+        for attempt in range(QUERY_RETRIES):
+            engine = self._internal_engine
+            try:
+                return super()._execute(method, arguments, model, root_selection)
+            except (httpx.TransportError, EngineConnectionError, DataError) as e:
+                if self._tx_id is not None or attempt == QUERY_RETRIES - 1 or not self._retryable(method, e):
+                    raise
+                print(f"Lost connection to database ({e}), retrying...")
+                time.sleep(backoff(attempt))
+                if not isinstance(e, DataError):
+                    self.reconnect(engine)
+
+    @staticmethod
+    def _retryable(method: str, e: Exception) -> bool:
+        if isinstance(e, DataError):
+            return e.code in UNREACHABLE_CODES or (e.code == CLOSED_CODE and method in READ_METHODS)
+        return isinstance(e, (httpx.ConnectError, EngineConnectionError)) or method in READ_METHODS
+
+    def reconnect(self, engine=None):
+        """
+        Restarts the query engine, unless another thread already replaced `engine`.
+        """
+        with _reconnect_lock:
+            if engine is not None and self._internal_engine is not engine:
+                return
+            try:
+                self.disconnect()
+            except Exception:
+                self._internal_engine = None
+            self.connect()
+
+    def warmup(self):
+        """
+        Opens the connection pool with a trivial query, so the first page does not pay for it.
+        """
+        self.query_raw("SELECT 1")
+
+
+class TracedPrisma(TracingMixin, ReplicaRoutingMixin, ResilientPrisma):
+    """
+    Client registered by the app, queries are traced once including their retries and routing.
+    """
+
+
+def init_replica():
+    """
+    Configures the read replica from `DATABASE_REPLICA_URL`. The replica is optional, it connects
+    on its first lag check and an unreachable replica only means reads stay on the primary.
+    """
+    url = os.getenv("DATABASE_REPLICA_URL")
+    if not url:
+        return
+    # Plain client without retries, a failing replica falls back to the primary right away
+    client = prisma.Prisma(
+        datasource={"url": database_url("DATABASE_REPLICA_URL")},
+        connect_timeout=timedelta(seconds=int(os.getenv("DATABASE_CONNECT_TIMEOUT", "5"))),
+    )
+    replica.configure(client)
 
 
 @st.cache_resource(show_spinner=False, validate=lambda x: x == True)
@@ -62,16 +141,32 @@ def init_database_connection():
     except:
         pass
 
-    retry = 0
-    db = prisma.Prisma(auto_register=True)
+    if os.getenv("DATABASE_BACKEND", "postgres") == "memory":
+        # Only loaded when used, it is not needed to serve from Postgres
+        from models.memory import MemoryPrisma
+        db = MemoryPrisma()
+        db.connect()
+        prisma.register(db)
+        return True
+
+    retries = int(os.getenv("DATABASE_CONNECT_RETRIES", "6"))
+    db = TracedPrisma(
+        datasource={"url": database_url()},
+        connect_timeout=timedelta(seconds=int(os.getenv("DATABASE_CONNECT_TIMEOUT", "5"))),
+    )
 
-    while retry < 3:
+    for attempt in range(retries):
         try:
             db.connect()
+            db.warmup()
+            # Registered only once usable, so a failed start is retried on the next run
+            prisma.register(db)
+            init_replica()
             return True
-        except:
-            retry += 1
-            print(f"Error connecting to database, retrying...")
+        except Exception as e:
+            print(f"Error connecting to database ({e}), retrying...")
             db.disconnect()
+            if attempt < retries - 1:
+                time.sleep(backoff(attempt))
 
     return False
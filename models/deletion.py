@@ -0,0 +1,130 @@
+"""
+Script description: This module deletes accounts in the background. The account is tombstoned
+right away, then a worker deletes its data in bounded batches so no statement holds locks for
+long. Progress is stored in `AccountDeletion`, and unfinished jobs are picked up again after a
+restart.
+"""
+
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+import streamlit as st
+
+from models.archive import purge_archived_moods
+from models.claims import remember_session_epoch
+from models.database import AccountDeletion, prisma
+
+BATCH_SIZE = 1000
+POLL_INTERVAL = 30
+# A running job whose worker has not reported progress for this long is taken over
+LEASE_SECONDS = 5 * 60
+
+# Each step deletes at most $2 rows of the user $1 and records them in the job's progress
+DELETE_STEPS = [
+    """DELETE FROM "ResourceOnSummary" WHERE (summary_id, resource_id) IN (
+        SELECT r.summary_id, r.resource_id FROM "ResourceOnSummary" r
+        JOIN "Summary" s ON s.id = r.summary_id WHERE s.user_id = $1 LIMIT $2)""",
+    """DELETE FROM "EventOnSummary" WHERE (event_id, summary_id) IN (
+        SELECT e.event_id, e.summary_id FROM "EventOnSummary" e
+        JOIN "Summary" s ON s.id = e.summary_id WHERE s.user_id = $1 LIMIT $2)""",
+    """DELETE FROM "Summary" WHERE id IN (
+        SELECT id FROM "Summary" WHERE user_id = $1 LIMIT $2)""",
+    """DELETE FROM "Mood" WHERE (user_id, date) IN (
+        SELECT user_id, date FROM "Mood" WHERE user_id = $1 LIMIT $2)""",
+]
+
+BATCH_QUERY = """
+WITH deleted AS ({step} RETURNING 1),
+progress AS (
+    UPDATE "AccountDeletion"
+    SET deleted_rows = deleted_rows + (SELECT count(*) FROM deleted), updated_at = (now() AT TIME ZONE 'UTC')
+    WHERE user_id = $1
+)
+SELECT count(*)::int AS deleted FROM deleted
+"""
+
+CLAIM_QUERY = """
+UPDATE "AccountDeletion"
+SET status = 'running', updated_at = (now() AT TIME ZONE 'UTC')
+WHERE user_id = $1
+  AND (status = 'pending'
+       OR (status = 'running' AND updated_at < (now() AT TIME ZONE 'UTC') - make_interval(secs => $2)))
+RETURNING user_id
+"""
+
+# Only a tombstoned account is deleted
+DELETE_USER_QUERY = 'DELETE FROM "User" WHERE id = $1 AND deleted_at IS NOT NULL'
+
+_wakeup = threading.Event()
+
+
+def request_deletion(user_id: str):
+    """
+    Tombstones the account and queues the deletion of its data.
+    """
+    with prisma.get_client().tx() as tx:
+        user = tx.user.update(
+            where={"id": user_id},
+            data={"deleted_at": datetime.now(tz=timezone.utc), "session_epoch": {"increment": 1}},
+        )
+        tx.accountdeletion.upsert(
+            where={"user_id": user_id},
+            data={"create": {"user_id": user_id}, "update": {}},
+        )
+    if user:
+        remember_session_epoch(user_id, user.session_epoch)
+    _wakeup.set()
+
+
+def deletion_progress(user_id: str) -> Optional[AccountDeletion]:
+    return AccountDeletion.prisma().find_unique(where={"user_id": user_id})
+
+
+def delete_account_data(user_id: str, batch_size: int = BATCH_SIZE, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """
+    Runs a queued deletion to completion, one batch per statement. A running job is taken over
+    once its worker has not reported progress for `lease_seconds`.
+
+    Returns
+    -------
+    bool
+        True if the job was claimed and finished, False if another worker owns it.
+    """
+    client = prisma.get_client()
+    if not client.query_first(CLAIM_QUERY, user_id, lease_seconds):
+        return False
+
+    # Steps are idempotent, a resumed job simply starts over with whatever is left
+    for step in DELETE_STEPS:
+        query = BATCH_QUERY.format(step=step)
+        while client.query_first(query, user_id, batch_size)["deleted"] == batch_size:
+            pass
+    purge_archived_moods(user_id)
+
+    with client.batch_() as batcher:
+        batcher.execute_raw(DELETE_USER_QUERY, user_id)
+        batcher.accountdeletion.update(where={"user_id": user_id}, data={"status": "done"})
+    return True
+
+
+def _worker():
+    while True:
+        try:
+            jobs = AccountDeletion.prisma().find_many(
+                where={"status": {"in": ["pending", "running"]}},
+                order={"created_at": "asc"},
+            )
+            for job in jobs:
+                delete_account_data(job.user_id)
+        except Exception as e:
+            print(f"Failed to delete accounts: {e}")
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def start_deletion_worker() -> threading.Thread:
+    worker = threading.Thread(target=_worker, name="account-deletion", daemon=True)
+    worker.start()
+    return worker
@@ -0,0 +1,256 @@
+import csv
+import io
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import streamlit as st
+
+from models.database import Event, prisma
+
+IMPORT_TIMEOUT = timedelta(seconds=60)
+
+UPCOMING_WINDOW = timedelta(days=14)
+MAX_SUGGESTED_EVENTS = 5
+MAX_EVENT_DESCRIPTION = 100
+
+# Event types (lowercase names) that suit each mood, used to shortlist events for summaries
+MOOD_EVENT_TYPES = {
+    "Happy": {"social", "club", "volunteering", "sport", "arts"},
+    "Calm": {"wellness", "mindfulness", "workshop", "arts", "career"},
+    "Sad": {"social", "support", "wellness", "arts", "mindfulness"},
+    "Stressed": {"mindfulness", "wellness", "support", "fitness", "sport"},
+}
+MAPPED_EVENT_TYPES = set().union(*MOOD_EVENT_TYPES.values())
+
+
+def _parse_ics_datetime(params: str, value: str) -> datetime:
+    parameters = {}
+    for param in filter(None, params.split(";")):
+        name, _, param_value = param.partition("=")
+        parameters[name.upper()] = param_value.strip('"')
+
+    if parameters.get("VALUE") == "DATE" or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d")
+    if value.endswith("Z"):
+        return datetime.strptime(value, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+    parsed = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    if tzid := parameters.get("TZID"):
+        # Local times are converted to UTC when stored, an unknown zone would shift the event
+        try:
+            return parsed.replace(tzinfo=ZoneInfo(tzid))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone {tzid}, use an IANA name such as America/New_York")
+    return parsed
+
+
+def _stored(value: datetime) -> datetime:
+    """Returns the datetime as the client reads it back, in UTC with millisecond precision.
+    Naive datetimes are sent as UTC
+    """
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _unescape_ics(value: str) -> str:
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def parse_ics(text: str) -> list[dict]:
+    """Reads the VEVENT entries of an iCalendar file into import rows
+    """
+    lines = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        else:
+            lines.append(line)
+
+    rows = []
+    current = None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            current = {"description": None, "types": []}
+        elif line == "END:VEVENT" and current is not None:
+            if "start" in current:
+                # All-day events without DTEND last one day
+                current.setdefault("end", current["start"] + timedelta(days=1))
+                rows.append(current)
+            current = None
+        elif current is not None and ":" in line:
+            key, value = line.split(":", 1)
+            name, _, params = key.partition(";")
+            match name.upper():
+                case "SUMMARY":
+                    current["name"] = _unescape_ics(value)
+                case "DESCRIPTION":
+                    current["description"] = _unescape_ics(value)
+                case "DTSTART":
+                    current["start"] = _parse_ics_datetime(params, value)
+                case "DTEND":
+                    current["end"] = _parse_ics_datetime(params, value)
+                case "CATEGORIES":
+                    current["types"] += [t.strip() for t in value.split(",") if t.strip()]
+    return [row for row in rows if row.get("name")]
+
+
+def parse_csv(text: str) -> list[dict]:
+    """Reads a CSV with `name`, `start`, `end`, `description` and `types` columns,
+    where `types` is a semicolon separated list of type names
+    """
+    rows = []
+    for record in csv.DictReader(io.StringIO(text)):
+        rows.append({
+            "name": record["name"].strip(),
+            "start": datetime.fromisoformat(record["start"].strip()),
+            "end": datetime.fromisoformat(record["end"].strip()),
+            "description": record.get("description") or None,
+            "types": [t.strip() for t in (record.get("types") or "").split(";") if t.strip()],
+        })
+    return rows
+
+
+def import_events(rows: list[dict]) -> tuple[int, int]:
+    """Inserts events and their type links in one transaction, skipping any event
+    whose (name, start) already exists in the file or the database
+
+    Returns
+    -------
+    tuple[int, int]
+        Number of events created and number of duplicates skipped.
+    """
+    unique = {}
+    for row in rows:
+        unique.setdefault((row["name"][:32], _stored(row["start"])), row)
+
+    names = list({name for name, _ in unique})
+    starts = list({start for _, start in unique})
+    type_names = list({t[:32] for row in unique.values() for t in row["types"]})
+
+    with prisma.get_client().tx(timeout=IMPORT_TIMEOUT) as tx:
+        existing = tx.event.find_many(where={"name": {"in": names}, "start": {"in": starts}})
+        for event in existing:
+            unique.pop((event.name, _stored(event.start)), None)
+        if not unique:
+            return 0, len(rows)
+
+        if type_names:
+            tx.type.create_many(data=[{"name": name} for name in type_names], skip_duplicates=True)
+        type_ids = {t.name: t.id for t in tx.type.find_many(where={"name": {"in": type_names}})}
+
+        created = tx.event.create_many(
+            data=[
+                {
+                    "name": name,
+                    "start": start,
+                    "end": row["end"],
+                    "description": row["description"][:255] if row["description"] else None,
+                }
+                for (name, start), row in unique.items()
+            ],
+            skip_duplicates=True,
+        )
+
+        new_events = tx.event.find_many(where={
+            "name": {"in": list({name for name, _ in unique})},
+            "start": {"in": list({start for _, start in unique})},
+        })
+        links = [
+            {"event_id": event.id, "type_id": type_ids[t[:32]]}
+            for event in new_events if (event.name, _stored(event.start)) in unique
+            for t in unique[(event.name, _stored(event.start))]["types"]
+        ]
+        if links:
+            tx.eventontype.create_many(data=links, skip_duplicates=True)
+
+    return created, len(rows) - created
+
+
+def event_filter(range_start: datetime, range_end: datetime, type_ids: list[str] | None = None) -> dict:
+    """Builds the where clause for events overlapping the given range,
+    served by the (start, end) index
+    """
+    where = {
+        "start": {"lte": range_end},
+        "end": {"gte": range_start},
+    }
+    if type_ids:
+        where["types"] = {"some": {"type_id": {"in": type_ids}}}
+    return where
+
+
+def find_events(where: dict, page: int, page_size: int) -> tuple[int, list[Event]]:
+    total = Event.prisma().count(where=where)
+    events = Event.prisma().find_many(
+        where=where,
+        include={"types": {"include": {"type": True}}},
+        order=[{"start": "asc"}, {"id": "asc"}],
+        skip=page * page_size,
+        take=page_size,
+    )
+    return total, events
+
+
+@st.cache_resource(ttl=15 * 60, show_spinner=False)
+def get_upcoming_events() -> list[dict]:
+    """Loads the events of the next two weeks once per process, shared by every session.
+    Call `get_upcoming_events.clear()` after events change.
+    """
+    now = datetime.now(tz=timezone.utc)
+    events = Event.prisma().find_many(
+        where=event_filter(now, now + UPCOMING_WINDOW),
+        include={"types": {"include": {"type": True}}},
+        order={"start": "asc"},
+    )
+    return [
+        {
+            "id": event.id,
+            "name": event.name,
+            "start": event.start,
+            "description": event.description,
+            "types": [link.type.name for link in event.types or [] if link.type],
+        }
+        for event in events
+    ]
+
+
+def shortlist_events(moods: list[str], limit: int = MAX_SUGGESTED_EVENTS) -> list[dict]:
+    """Picks the upcoming events whose types suit the given moods, best match first. Events with
+    none of their types in `MOOD_EVENT_TYPES`, or without types, follow the matches soonest first
+
+    Parameters
+    ----------
+    moods: list[str]
+        Mood names of the user, repeated moods weigh more.
+    limit: int
+        Maximum number of events returned, bounding the prompt size.
+
+    Returns
+    -------
+    list[dict]
+        Compact event entries to be passed to the LLM.
+    """
+    affinity = Counter(t for mood in moods for t in MOOD_EVENT_TYPES.get(mood, ()))
+    now = datetime.now(tz=timezone.utc)
+
+    scored = []
+    for event in get_upcoming_events():
+        if event["start"] < now:
+            continue
+        types = {t.lower() for t in event["types"]}
+        score = sum(affinity[t] for t in types)
+        # Types added since the table was written are not known to suit any mood, nor to not suit it
+        if score > 0 or not types & MAPPED_EVENT_TYPES:
+            scored.append((-score, event["start"], event))
+    scored.sort(key=lambda item: item[:2])
+
+    return [
+        {
+            "id": event["id"],
+            "name": event["name"],
+            "date": event["start"].strftime("%Y-%m-%d"),
+            "types": event["types"],
+            "description": (event["description"] or "")[:MAX_EVENT_DESCRIPTION],
+        }
+        for _, _, event in scored[:limit]
+    ]
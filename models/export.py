@@ -0,0 +1,155 @@
+"""
+Script description: This module exports a user's personal data as a ZIP archive.
+
+Rows are paged from the database with keyset cursors and written into the archive as they
+arrive, so memory use does not grow with the size of the history.
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from typing import IO, Iterator
+
+from models.archive import archived_moods
+from models.database import Mood, Summary, User
+
+PAGE_SIZE = 500
+
+MOOD_COLUMNS = ["date", "name", "description"]
+RESOURCE_COLUMNS = ["id", "name", "description", "location", "link"]
+
+
+def iter_moods(user_id: str, page_size: int = PAGE_SIZE) -> Iterator[Mood]:
+    cursor = None
+    # Archived months come first, the database only holds the months after them
+    for mood in archived_moods(user_id):
+        yield Mood(**mood)
+        cursor = mood["date"]
+
+    while True:
+        where = {"user_id": user_id}
+        if cursor is not None:
+            where["date"] = {"gt": cursor}
+        moods = Mood.prisma().find_many(where=where, order={"date": "asc"}, take=page_size)
+        yield from moods
+        if len(moods) < page_size:
+            return
+        cursor = moods[-1].date
+
+
+def iter_summaries(user_id: str, page_size: int = PAGE_SIZE) -> Iterator[Summary]:
+    cursor = None
+    while True:
+        where = {"user_id": user_id}
+        if cursor is not None:
+            created_at, summary_id = cursor
+            where["OR"] = [
+                {"created_at": {"gt": created_at}},
+                {"created_at": created_at, "id": {"gt": summary_id}},
+            ]
+        summaries = Summary.prisma().find_many(
+            where=where,
+            include={
+                "resources": {"include": {"resource": True}},
+                "recommended_events": {"include": {"event": True}},
+            },
+            order=[{"created_at": "asc"}, {"id": "asc"}],
+            take=page_size,
+        )
+        yield from summaries
+        if len(summaries) < page_size:
+            return
+        cursor = summaries[-1].created_at, summaries[-1].id
+
+
+def _text(archive: zipfile.ZipFile, name: str) -> io.TextIOWrapper:
+    return io.TextIOWrapper(archive.open(name, "w"), encoding="utf-8", newline="")
+
+
+def write_export(user_id: str, fileobj: IO[bytes]) -> dict:
+    """
+    Writes the user's profile, moods, summaries and recommended resources into a ZIP archive.
+
+    Parameters
+    ----------
+    user_id: str
+        Id of the user to export.
+    fileobj: file
+        Binary file to write the archive to.
+
+    Returns
+    -------
+    dict
+        Number of exported rows per file.
+    """
+    counts = {"moods.csv": 0, "summaries.jsonl": 0, "resources.csv": 0}
+    resources = {}
+
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        user = User.prisma().find_unique(where={"id": user_id})
+        with _text(archive, "profile.json") as f:
+            json.dump({
+                "username": user.username,
+                "email": user.email,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "roles": user.roles,
+                "created_at": user.created_at.isoformat(),
+            }, f, ensure_ascii=False, indent=2)
+
+        with _text(archive, "moods.csv") as f:
+            writer = csv.writer(f)
+            writer.writerow(MOOD_COLUMNS)
+            for mood in iter_moods(user_id):
+                writer.writerow([mood.date.date().isoformat(), mood.name, mood.description])
+                counts["moods.csv"] += 1
+
+        with _text(archive, "summaries.jsonl") as f:
+            for summary in iter_summaries(user_id):
+                for link in summary.resources or []:
+                    if link.resource:
+                        resources[link.resource_id] = link.resource
+                f.write(json.dumps({
+                    "start": summary.start.isoformat(),
+                    "end": summary.end.isoformat(),
+                    "keywords": summary.keywords,
+                    "content": summary.content,
+                    "resources": [link.resource_id for link in summary.resources or []],
+                    "events": [
+                        {"name": link.event.name, "start": link.event.start.isoformat()}
+                        for link in summary.recommended_events or [] if link.event
+                    ],
+                    "created_at": summary.created_at.isoformat(),
+                }, ensure_ascii=False) + "\n")
+                counts["summaries.jsonl"] += 1
+
+        with _text(archive, "resources.csv") as f:
+            writer = csv.writer(f)
+            writer.writerow(RESOURCE_COLUMNS)
+            for resource in resources.values():
+                writer.writerow([getattr(resource, column) for column in RESOURCE_COLUMNS])
+                counts["resources.csv"] += 1
+
+    return counts
+
+
+def build_export(user_id: str) -> str:
+    """
+    Builds the export into a temporary file on disk, which the caller deletes.
+
+    Returns
+    -------
+    str
+        Path of the archive.
+    """
+    with tempfile.NamedTemporaryFile(prefix="wellnest-export-", suffix=".zip", delete=False) as fileobj:
+        try:
+            write_export(user_id, fileobj)
+        except BaseException:
+            fileobj.close()
+            os.remove(fileobj.name)
+            raise
+    return fileobj.name
@@ -0,0 +1,120 @@
+"""
+Script description: This module runs bcrypt password hashing and verification in a bounded
+process pool, so logins and registrations do not block the Streamlit server.
+
+Libraries imported:
+- bcrypt: Module implementing secure hashing for plain text.
+- concurrent.futures: Module implementing the process pool.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
+import bcrypt
+import streamlit as st
+
+DEFAULT_ROUNDS = 12
+DEFAULT_MAX_PENDING = 64
+
+
+class HasherBusyError(Exception):
+    """
+    Raised when more password operations are queued than the hasher accepts.
+    """
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _hash_many(passwords: List[str], rounds: int) -> List[str]:
+    return [_hash(password, rounds) for password in passwords]
+
+
+def _check(password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+
+def hash_rounds(hashed_password: str) -> int:
+    """
+    Reads the cost factor of a bcrypt hash, i.e. 12 for `$2b$12$...`.
+    """
+    return int(hashed_password.split("$")[2])
+
+
+class PasswordHasher:
+    """
+    This class hashes and verifies passwords in worker processes, rejecting work once
+    the number of queued operations reaches `max_pending`.
+    """
+
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, workers: Optional[int] = None,
+                 max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        Create a new instance of "PasswordHasher".
+
+        Parameters
+        ----------
+        rounds: int
+            bcrypt cost factor used for new hashes.
+        workers: int, optional
+            Number of worker processes, defaults to the number of CPUs.
+        max_pending: int
+            Maximum number of operations queued or running at once.
+        """
+        self.rounds = rounds
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError("Too many requests, please try again shortly")
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """
+        Hashes the plain text password with the configured cost.
+        """
+        return self._run(_hash, password, self.rounds)
+
+    def hash_many(self, passwords: Iterable[str], chunk_size: int = 16) -> List[str]:
+        """
+        Hashes many passwords across all workers, bypassing the queue limit.
+        Meant for offline jobs such as bulk provisioning.
+        """
+        passwords = list(passwords)
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        futures = [self._executor.submit(_hash_many, chunk, self.rounds) for chunk in chunks]
+        return [hashed for future in futures for hashed in future.result()]
+
+    def check(self, password: str, hashed_password: str) -> bool:
+        """
+        Checks the plain text password against the hashed password.
+        """
+        return self._run(_check, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        Checks if the hash was created with a different cost than the configured one.
+        """
+        try:
+            return hash_rounds(hashed_password) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_hasher(rounds: int = DEFAULT_ROUNDS, workers: Optional[int] = None,
+               max_pending: int = DEFAULT_MAX_PENDING) -> PasswordHasher:
+    return PasswordHasher(rounds, workers, max_pending)
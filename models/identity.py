@@ -0,0 +1,76 @@
+"""
+Script description: This module keeps an identity map of `User` rows for the current script run,
+so the models and views reading the same user share a single query.
+
+The map lives on the run's context rather than in the session state, so rows with password hashes
+are never kept between runs. Every run, full or fragment, starts with an empty map, and entries
+must be invalidated after writing to the user.
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from models.database import User, UserPrivateView
+
+CONTEXT_ATTRIBUTE = "wellnest_identity_map"
+
+
+@dataclass
+class IdentityMap:
+    run: Optional[set]
+    users: dict[str, Optional[User]] = field(default_factory=dict)
+    # Users read only for display, without their password hash and login state
+    private_views: dict[str, Optional[UserPrivateView]] = field(default_factory=dict)
+
+
+def _identity_map() -> IdentityMap:
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        # Outside a script run, such as in tests and background threads, nothing is shared
+        return IdentityMap(run=None)
+    identity_map = getattr(ctx, CONTEXT_ATTRIBUTE, None)
+    # The context is reused by the session's runs, and its `reset()` gives each run a new set of widget ids
+    if identity_map is None or identity_map.run is not ctx.widget_ids_this_run:
+        identity_map = IdentityMap(run=ctx.widget_ids_this_run)
+        setattr(ctx, CONTEXT_ATTRIBUTE, identity_map)
+    return identity_map
+
+
+def get_user(username: str) -> Optional[User]:
+    """
+    Gets the user by username, reading the database at most once per script run.
+    """
+    users = _identity_map().users
+    if username not in users:
+        users[username] = User.prisma().find_unique(where={"username": username})
+    return users[username]
+
+
+def get_private_view(username: str) -> Optional[UserPrivateView]:
+    """
+    Gets the displayable fields of the user, taken from the full row if this run already read it.
+    """
+    identity_map = _identity_map()
+    views = identity_map.private_views
+    if username not in views:
+        user = identity_map.users.get(username)
+        if user is not None:
+            views[username] = UserPrivateView(**user.model_dump(include=set(UserPrivateView.model_fields)))
+        else:
+            views[username] = UserPrivateView.prisma().find_unique(where={"username": username})
+    return views[username]
+
+
+def remember(user: User):
+    """
+    Stores a user row that was just read or written.
+    """
+    _identity_map().users[user.username] = user
+
+
+def invalidate(username: str):
+    identity_map = _identity_map()
+    identity_map.users.pop(username, None)
+    identity_map.private_views.pop(username, None)
@@ -1,7 +1,9 @@
-import openai
 import streamlit as st
 
 
 @st.cache_resource(show_spinner=False)
 def get_openai():
+    # Imported on first use, the SDK takes longer to import than the rest of the page
+    import openai
+
     return openai.OpenAI()
@@ -0,0 +1,1195 @@
+"""
+Script description: This module runs the Prisma client against an in-memory store instead of the
+query engine and Postgres, so tests and benchmarks measure the app's logic without a database.
+
+The store reads the models, keys, defaults and relations from `schema.prisma` and answers the
+client's actions the way the query engine does: filters, ordering, pagination, includes, nested
+writes, upserts, cascading deletes, `group_by`, and unique and foreign key errors. Writes are
+journaled, a failing action, a batch or a transaction is undone as a whole. Transactions hold the
+store's lock until they end, so they are serialized.
+
+Raw SQL is not interpreted: the statements the app issues while serving, such as logging in, the
+throttle flush, the session reaper, account deletions and bulk role updates, are looked up by
+their text and run by methods of the store. Other statements, i.e. partition maintenance or
+seeding, still need Postgres.
+
+What the store does not emulate raises `UnsupportedError` rather than answer differently from
+Postgres:
+
+- raw statements other than the app's, and engine queries outside of client actions
+- `having` in `group_by`
+- filters other than `equals`, `not`, `in`, `notIn`, `lt`, `lte`, `gt`, `gte`, `contains`,
+  `startsWith`, `endsWith`, `has`, `hasEvery`, `hasSome` and `isEmpty`
+- nested writes in `create_many`, nested writes other than `create`, `connect`,
+  `connectOrCreate`, `set`, `disconnect` and `delete`
+- update operators other than `set`, `push`, `increment`, `decrement`, `multiply` and `divide`
+
+Metrics are empty, there is no connection pool to report on.
+"""
+
+import re
+import secrets
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import prisma
+from prisma import errors
+from prisma._constants import QUERY_BUILDER_ALIASES
+from prisma.engine import SyncAbstractEngine
+
+from models.tracing import TracingMixin
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.prisma"
+
+SCALAR_TYPES = {"String", "Int", "BigInt", "Float", "Decimal", "Boolean", "DateTime", "Json", "Bytes"}
+RAW_METHODS = {"query_raw", "execute_raw"}
+AUTOINCREMENT = object()
+
+BLOCK = re.compile(r"^(model|enum)\s+(\w+)\s*\{(.*?)^\}", re.M | re.S)
+FIELD_LINE = re.compile(r"^(\w+)\s+(\w+)(\[\])?(\?)?(.*)$")
+FIRST_LIST = re.compile(r"\[[^\]]*\]")
+COMPOUND_NAME = re.compile(r'(?<!\w)name\s*:\s*"(\w+)"')
+NAMED_LIST = re.compile(r"(\w+)\s*:\s*\[([^\]]*)\]")
+RELATION_NAME = re.compile(r'^\s*(?:name\s*:\s*)?"([^"]*)"')
+ON_DELETE = re.compile(r"onDelete\s*:\s*(\w+)")
+AGGREGATE = re.compile(r"(_count|_sum|_avg|_min|_max) \{(.*)\}")
+DELETE_TABLE = re.compile(r'\s*DELETE FROM "(\w+)"')
+
+
+@dataclass
+class Field:
+    name: str
+    type: str
+    optional: bool
+    is_list: bool
+    default: Optional[Callable[[], Any]] = None
+    updated_at: bool = False
+    # Set on the side of a relation holding the foreign key
+    relation_name: Optional[str] = None
+    fields: tuple = ()
+    references: tuple = ()
+    on_delete: Optional[str] = None
+
+
+@dataclass
+class Link:
+    """
+    A relation seen from one model: the rows of `target` whose `remote` fields equal `local`.
+    """
+    target: str
+    local: tuple
+    remote: tuple
+    many: bool
+    # True when `local` is a foreign key of this model
+    owner: bool
+    on_delete: str
+
+
+@dataclass
+class Model:
+    name: str
+    fields: dict
+    id: tuple = ()
+    uniques: list = field(default_factory=list)
+    # Names of compound keys in unique where inputs, i.e. `user_id_date`
+    compounds: dict = field(default_factory=dict)
+    links: dict = field(default_factory=dict)
+
+
+def _arguments(text: str, name: str) -> Optional[str]:
+    """
+    Returns the arguments of the attribute `name(...)` in text, which may nest parentheses.
+    """
+    start = text.find(name + "(")
+    if start == -1:
+        return None
+    depth = 0
+    for i in range(start + len(name), len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return text[start + len(name) + 1:i]
+    raise ValueError(f"Unbalanced parentheses in `{text}`")
+
+
+def _names(text: str) -> tuple:
+    # Drops field arguments such as `created_at(sort: Desc)`
+    previous = None
+    while previous != text:
+        previous, text = text, re.sub(r"\([^()]*\)", "", text)
+    return tuple(name.strip() for name in text.strip("[] ").split(",") if name.strip())
+
+
+def _cuid() -> str:
+    return "c" + secrets.token_hex(12)
+
+
+def _now() -> datetime:
+    now = datetime.now(tz=timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _default(text: str) -> Callable[[], Any]:
+    match text.strip():
+        case "cuid()":
+            return _cuid
+        case "uuid()":
+            return lambda: str(uuid.uuid4())
+        case "now()":
+            return _now
+        case "autoincrement()":
+            return lambda: AUTOINCREMENT
+        case "true" | "false" as value:
+            return lambda: value == "true"
+        case "[]":
+            return list
+        case value if value.startswith('"'):
+            return lambda: value[1:-1]
+        case value if re.fullmatch(r"-?\d+", value):
+            return lambda: int(value)
+        case value if re.fullmatch(r"-?\d+\.\d*", value):
+            return lambda: float(value)
+        case value:
+            # Enum member
+            return lambda: value
+
+
+@lru_cache
+def load_schema(path: Path = SCHEMA_PATH) -> dict[str, Model]:
+    """
+    Reads the models of a Prisma schema, with their keys, defaults and relations.
+    """
+    text = re.sub(r"//.*", "", Path(path).read_text())
+    blocks = BLOCK.findall(text)
+    enums = {name for kind, name, _ in blocks if kind == "enum"}
+    models = {}
+
+    for kind, name, body in blocks:
+        if kind != "model":
+            continue
+        model = Model(name, {})
+        for line in (line.strip() for line in body.splitlines()):
+            if line.startswith(("@@id", "@@unique")):
+                arguments = _arguments(line, line.split("(")[0])
+                fields = _names(FIRST_LIST.search(arguments)[0])
+                compound = COMPOUND_NAME.search(arguments)
+                model.compounds[compound[1] if compound else "_".join(fields)] = fields
+                if line.startswith("@@id"):
+                    model.id = fields
+                else:
+                    model.uniques.append(fields)
+            elif (match := FIELD_LINE.match(line)) and not line.startswith("@@"):
+                field_name, field_type, is_list, optional, attributes = match.groups()
+                current = Field(field_name, field_type, bool(optional), bool(is_list))
+                if re.search(r"@id(?!\w)", attributes):
+                    model.id = (field_name,)
+                if re.search(r"@unique(?!\w)", attributes):
+                    model.uniques.append((field_name,))
+                if (default := _arguments(attributes, "@default")) is not None:
+                    current.default = _default(default)
+                current.updated_at = "@updatedAt" in attributes
+                if (relation := _arguments(attributes, "@relation")) is not None:
+                    if name_match := RELATION_NAME.match(relation):
+                        current.relation_name = name_match[1]
+                    lists = {key: _names(value) for key, value in NAMED_LIST.findall(relation)}
+                    current.fields = lists.get("fields", ())
+                    current.references = lists.get("references", ())
+                    if on_delete := ON_DELETE.search(relation):
+                        current.on_delete = on_delete[1]
+                model.fields[field_name] = current
+        if model.id not in model.uniques:
+            model.uniques.insert(0, model.id)
+        models[name] = model
+
+    for model in models.values():
+        for current in model.fields.values():
+            if current.type in SCALAR_TYPES or current.type in enums:
+                continue
+            if current.fields:
+                on_delete = current.on_delete or ("SetNull" if current.optional else "Restrict")
+                model.links[current.name] = Link(current.type, current.fields, current.references, False, True, on_delete)
+                continue
+            other = next(
+                other for other in models[current.type].fields.values()
+                if other.type == model.name and other.fields and other.relation_name == current.relation_name
+            )
+            model.links[current.name] = Link(
+                current.type, other.references, other.fields, current.is_list, False, other.on_delete or "Restrict",
+            )
+    return models
+
+
+def _aliased(value: Any) -> Any:
+    # Same renaming as the query builder, i.e. `order_by` to `orderBy` and `not_in` to `notIn`
+    if isinstance(value, dict):
+        return {QUERY_BUILDER_ALIASES.get(key, key): _aliased(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_aliased(item) for item in value]
+    return value
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+class UnsupportedError(NotImplementedError):
+    """
+    Raised for the parts of the client's API listed as not emulated in the module docstring.
+    """
+
+    def __init__(self, feature: str):
+        super().__init__(f"{feature} is not supported by the in-memory database")
+
+
+def _error(error_class: type, code: str, message: str, **meta) -> errors.DataError:
+    return error_class({"user_facing_error": {"error_code": code, "message": message, "meta": meta}})
+
+
+def _json_value(value: Any) -> Any:
+    # Results the client does not parse into models keep the query engine's JSON form
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    return value
+
+
+def _aggregate(function: str, name: str, rows: list[dict]) -> Any:
+    if function == "_count":
+        return len(rows) if name == "_all" else sum(row[name] is not None for row in rows)
+    # Like SQL aggregates, nulls are skipped and an aggregate of no values is null
+    values = [row[name] for row in rows if row[name] is not None]
+    if not values:
+        return None
+    if function == "_avg":
+        return sum(values) / len(values)
+    return {"_sum": sum, "_min": min, "_max": max}[function](values)
+
+
+def _statement(query: str) -> str:
+    return " ".join(query.split())
+
+
+@lru_cache
+def raw_statements() -> dict[str, Callable]:
+    """
+    Maps the text of the raw statements the app issues to the methods of `MemoryStore` running them.
+    """
+    # Imported on first use, the modules issuing the statements use the client themselves
+    from models.authentication_models import LOGIN_QUERY
+    from models.deletion import BATCH_QUERY, CLAIM_QUERY, DELETE_STEPS, DELETE_USER_QUERY
+    from models.rbac import ROLE_UPDATES, TARGET_FILTERS, bulk_roles_query
+    from models.sessions import LOGGED_IN_QUERY, RECONCILE_QUERY
+    from models.throttle import FLUSH_QUERY
+
+    statements = {
+        LOGIN_QUERY: MemoryStore._raw_login,
+        FLUSH_QUERY: MemoryStore._raw_add_failed_logins,
+        LOGGED_IN_QUERY: MemoryStore._raw_logged_in,
+        RECONCILE_QUERY: MemoryStore._raw_set_logged_in,
+        CLAIM_QUERY: MemoryStore._raw_claim_deletion,
+        DELETE_USER_QUERY: MemoryStore._raw_delete_user,
+    }
+    for step in DELETE_STEPS:
+        table = DELETE_TABLE.match(step)[1]
+        statements[BATCH_QUERY.format(step=step)] = partial(MemoryStore._raw_delete_batch, table=table)
+    for action in ROLE_UPDATES:
+        for target in TARGET_FILTERS:
+            statements[bulk_roles_query(action, target)] = partial(MemoryStore._raw_bulk_roles, action=action, target=target)
+    return {_statement(query): method for query, method in statements.items()}
+
+
+class MemoryStore:
+    """
+    Tables of rows keyed by primary key, with an index per unique constraint.
+    """
+
+    def __init__(self, schema: dict[str, Model]):
+        self.schema = schema
+        self.lock = threading.RLock()
+        self.tables = {name: {} for name in schema}
+        self.indexes = {
+            name: {fields: {} for fields in model.uniques if fields != model.id} for name, model in schema.items()
+        }
+        # Relations holding a foreign key to each model, checked on delete, and the keys of the rows
+        # per foreign key value, read by filters and includes instead of scanning the table
+        self.referrers = {name: [] for name in schema}
+        self.lookups = {name: {} for name in schema}
+        for model in schema.values():
+            for link in model.links.values():
+                if link.owner:
+                    self.referrers[link.target].append((model, link))
+                    self.lookups[model.name][link.local] = {}
+        self._journal = []
+        self._depth = 0
+
+    def reset(self):
+        with self.lock:
+            for name in self.schema:
+                self.tables[name].clear()
+                for index in (*self.indexes[name].values(), *self.lookups[name].values()):
+                    index.clear()
+
+    # Journal
+
+    def _put(self, model: Model, key: tuple, row: dict):
+        table = self.tables[model.name]
+        old = table.get(key)
+        if old is not None:
+            self._unindex(model, old)
+        table[key] = row
+        self._index(model, row, key)
+        self._journal.append((model, key, old))
+
+    def _remove(self, model: Model, key: tuple):
+        old = self.tables[model.name].pop(key)
+        self._unindex(model, old)
+        self._journal.append((model, key, old))
+
+    def _undo(self, mark: int):
+        while len(self._journal) > mark:
+            model, key, old = self._journal.pop()
+            current = self.tables[model.name].pop(key, None)
+            if current is not None:
+                self._unindex(model, current)
+            if old is not None:
+                self.tables[model.name][key] = old
+                self._index(model, old, key)
+
+    def _index(self, model: Model, row: dict, key: tuple):
+        for fields, index in self.indexes[model.name].items():
+            values = tuple(row[name] for name in fields)
+            # Like Postgres, nulls never conflict
+            if None not in values:
+                index[values] = key
+        for fields, lookup in self.lookups[model.name].items():
+            lookup.setdefault(tuple(row[name] for name in fields), {})[key] = None
+
+    def _unindex(self, model: Model, row: dict):
+        for fields, index in self.indexes[model.name].items():
+            index.pop(tuple(row[name] for name in fields), None)
+        key = self._key(model, row)
+        for fields, lookup in self.lookups[model.name].items():
+            values = tuple(row[name] for name in fields)
+            keys = lookup.get(values)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del lookup[values]
+
+    @contextmanager
+    def atomic(self):
+        """
+        Undoes the writes of the block if it raises.
+        """
+        with self.lock:
+            mark = self.begin()
+            try:
+                yield
+            except BaseException:
+                self.rollback(mark)
+                raise
+            self.commit(mark)
+
+    def begin(self) -> int:
+        self.lock.acquire()
+        self._depth += 1
+        return len(self._journal)
+
+    def commit(self, mark: int):
+        self._depth -= 1
+        if self._depth == 0:
+            self._journal.clear()
+        self.lock.release()
+
+    def rollback(self, mark: int):
+        self._undo(mark)
+        self.commit(mark)
+
+    # Actions
+
+    def execute(self, method: str, model: Optional[str], arguments: dict, root_selection: Optional[list] = None):
+        """
+        Runs a client action and returns the `result` the query engine would.
+        """
+        if method in RAW_METHODS:
+            return self._execute_raw(method, arguments["query"], arguments["parameters"])
+        arguments = {key: value for key, value in _aliased(arguments).items() if value is not None}
+        with self.atomic():
+            return getattr(self, f"_action_{method}")(self.schema[model], arguments, root_selection)
+
+    def _action_find_unique(self, model: Model, arguments: dict, root_selection) -> Optional[dict]:
+        key = self._find_unique(model, arguments["where"])
+        return None if key is None else self._record(model, self.tables[model.name][key], arguments.get("include"))
+
+    def _action_find_unique_or_raise(self, model: Model, arguments: dict, root_selection) -> dict:
+        return self._or_raise(model, self._action_find_unique(model, arguments, root_selection))
+
+    def _action_find_first(self, model: Model, arguments: dict, root_selection) -> Optional[dict]:
+        records = self._action_find_many(model, {**arguments, "take": 1}, root_selection)
+        return records[0] if records else None
+
+    def _action_find_first_or_raise(self, model: Model, arguments: dict, root_selection) -> dict:
+        return self._or_raise(model, self._action_find_first(model, arguments, root_selection))
+
+    def _action_find_many(self, model: Model, arguments: dict, root_selection) -> list[dict]:
+        rows = self._query(model, arguments)
+        return [self._record(model, row, arguments.get("include")) for row in rows]
+
+    def _action_count(self, model: Model, arguments: dict, root_selection) -> dict:
+        rows = self._query(model, arguments)
+        # `_count { _all }`, or `_count { field ... }` counting the non-null values of each field
+        selected = AGGREGATE.search((root_selection or ["_count { _all }"])[0])[2].split()
+        return {"_count": {name: _aggregate("_count", name, rows) for name in selected}}
+
+    def _action_group_by(self, model: Model, arguments: dict, root_selection) -> list[dict]:
+        if arguments.get("having"):
+            raise UnsupportedError("`having`")
+        by = arguments["by"]
+        groups = {}
+        for row in self._query(model, {"where": arguments.get("where")}):
+            groups.setdefault(tuple(row[name] for name in by), []).append(row)
+
+        keys = [dict(zip(by, values)) for values in groups]
+        keys = self._query(model, {key: arguments.get(key) for key in ("orderBy", "take", "skip")}, keys)
+        aggregates = [match.groups() for selection in root_selection if (match := AGGREGATE.fullmatch(selection))]
+        results = []
+        for key in keys:
+            rows = groups[tuple(key[name] for name in by)]
+            result = {name: _json_value(value) for name, value in key.items()}
+            for function, names in aggregates:
+                result[function] = {name: _json_value(_aggregate(function, name, rows)) for name in names.split()}
+            results.append(result)
+        return results
+
+    def _action_create(self, model: Model, arguments: dict, root_selection) -> dict:
+        key = self._create(model, arguments["data"])
+        return self._record(model, self.tables[model.name][key], arguments.get("include"))
+
+    def _action_create_many(self, model: Model, arguments: dict, root_selection) -> dict:
+        count = 0
+        for data in arguments["data"]:
+            row = self._build(model, data)
+            if arguments.get("skipDuplicates") and self._conflict(model, row) is not None:
+                continue
+            self._insert(model, row)
+            count += 1
+        return {"count": count}
+
+    def _action_update(self, model: Model, arguments: dict, root_selection) -> dict:
+        key = self._find_unique(model, arguments["where"])
+        if key is None:
+            raise self._not_found(model)
+        key = self._update(model, key, arguments["data"])
+        return self._record(model, self.tables[model.name][key], arguments.get("include"))
+
+    def _action_update_many(self, model: Model, arguments: dict, root_selection) -> dict:
+        keys = self._matching_keys(model, arguments.get("where", {}))
+        for key in keys:
+            self._update(model, key, arguments["data"])
+        return {"count": len(keys)}
+
+    def _action_upsert(self, model: Model, arguments: dict, root_selection) -> dict:
+        key = self._find_unique(model, arguments["where"])
+        if key is None:
+            key = self._create(model, arguments["create"])
+        else:
+            key = self._update(model, key, arguments.get("update", {}))
+        return self._record(model, self.tables[model.name][key], arguments.get("include"))
+
+    def _action_delete(self, model: Model, arguments: dict, root_selection) -> dict:
+        key = self._find_unique(model, arguments["where"])
+        if key is None:
+            raise self._not_found(model)
+        record = self._record(model, self.tables[model.name][key], arguments.get("include"))
+        self._delete(model, key)
+        return record
+
+    def _action_delete_many(self, model: Model, arguments: dict, root_selection) -> dict:
+        keys = self._matching_keys(model, arguments.get("where", {}))
+        for key in keys:
+            # Cascades of an earlier row may have removed it
+            if key in self.tables[model.name]:
+                self._delete(model, key)
+        return {"count": len(keys)}
+
+    # Raw statements
+
+    def _execute_raw(self, method: str, query: str, parameters: tuple) -> Any:
+        """
+        Runs a raw statement of the app, returning its rows like the query engine for `query_raw`
+        and the number of rows it wrote or returned for `execute_raw`.
+        """
+        run = raw_statements().get(_statement(query))
+        if run is None:
+            raise UnsupportedError(f"Raw statement `{_statement(query)[:80]}`")
+        with self.atomic():
+            rows = run(self, *parameters)
+        if method == "execute_raw":
+            return len(rows)
+        columns = list(rows[0]) if rows else []
+        # The client only converts bigint, decimal and json columns, other values are passed on as sent
+        return {
+            "columns": columns,
+            "types": ["unknown"] * len(columns),
+            "rows": [[_json_value(row[name]) for name in columns] for row in rows],
+        }
+
+    def _raw_login(self, user_id: str, max_attempts: Optional[int], password: Optional[str]) -> list[dict]:
+        model = self.schema["User"]
+        row = self.tables["User"].get((user_id,))
+        if row is None or (max_attempts is not None and row["failed_login_attempts"] >= max_attempts):
+            return []
+        data = {"failed_login_attempts": 0}
+        if password is not None:
+            data["password"] = password
+        key = self._update(model, (user_id,), data)
+        return [self._record(model, self.tables["User"][key], None)]
+
+    def _raw_add_failed_logins(self, usernames: list[str], attempts: list[int]) -> list[dict]:
+        model = self.schema["User"]
+        updated = []
+        for username, count in zip(usernames, attempts):
+            key = self.indexes["User"][("username",)].get((username,))
+            if key is not None:
+                key = self._update(model, key, {"failed_login_attempts": {"increment": count}}, touch=False)
+                updated.append(self.tables["User"][key])
+        return updated
+
+    def _raw_logged_in(self) -> list[dict]:
+        return [{"id": row["id"]} for row in self.tables["User"].values() if row["logged_in"]]
+
+    def _raw_set_logged_in(self, logged_in: bool, ids: list[str]) -> list[dict]:
+        model = self.schema["User"]
+        keys = [(user_id,) for user_id in dict.fromkeys(ids) if (user_id,) in self.tables["User"]]
+        return [self.tables["User"][self._update(model, key, {"logged_in": logged_in}, touch=False)] for key in keys]
+
+    def _raw_bulk_roles(self, role: str, value: Any, action: str, target: str) -> list[dict]:
+        model = self.schema["User"]
+        where = {"email": {"contains": value}} if target == "search" else {"email": {"in": value}}
+        where.update({"NOT": {"roles": {"has": role}}} if action == "Add" else {"roles": {"has": role}})
+        updated = []
+        for key in self._matching_keys(model, where):
+            roles = self.tables["User"][key]["roles"]
+            # `array_remove` drops every occurrence
+            roles = [*roles, role] if action == "Add" else [other for other in roles if other != role]
+            key = self._update(model, key, {"roles": roles, "session_epoch": {"increment": 1}}, touch=False)
+            row = self.tables["User"][key]
+            updated.append({"id": row["id"], "session_epoch": row["session_epoch"]})
+        return updated
+
+    def _raw_claim_deletion(self, user_id: str, lease_seconds: int) -> list[dict]:
+        row = self.tables["AccountDeletion"].get((user_id,))
+        expired = _now() - timedelta(seconds=lease_seconds)
+        if row is None or not (row["status"] == "pending" or (row["status"] == "running" and row["updated_at"] < expired)):
+            return []
+        self._update(self.schema["AccountDeletion"], (user_id,), {"status": "running"})
+        return [{"user_id": user_id}]
+
+    def _raw_delete_batch(self, user_id: str, limit: int, table: str) -> list[dict]:
+        model = self.schema[table]
+        if "user_id" in model.fields:
+            keys = self._matching_keys(model, {"user_id": user_id})[:limit]
+        else:
+            # Links between summaries and resources or events are reached through the user's summaries
+            summary = self.schema["Summary"]
+            link = next(link for link in summary.links.values() if link.target == table)
+            rows = (other for key in self._matching_keys(summary, {"user_id": user_id})
+                    for other in self._related(summary, link, self.tables["Summary"][key]))
+            keys = [self._key(model, row) for row in islice(rows, limit)]
+        for key in keys:
+            self._delete(model, key)
+        if (user_id,) in self.tables["AccountDeletion"]:
+            self._update(self.schema["AccountDeletion"], (user_id,), {"deleted_rows": {"increment": len(keys)}})
+        return [{"deleted": len(keys)}]
+
+    def _raw_delete_user(self, user_id: str) -> list[dict]:
+        row = self.tables["User"].get((user_id,))
+        if row is None or row["deleted_at"] is None:
+            return []
+        self._delete(self.schema["User"], (user_id,))
+        return [row]
+
+    # Reads
+
+    def _or_raise(self, model: Model, record: Optional[dict]) -> dict:
+        if record is None:
+            raise self._not_found(model)
+        return record
+
+    @staticmethod
+    def _not_found(model: Model) -> errors.DataError:
+        return _error(errors.RecordNotFoundError, "P2025", f"No {model.name} record was found for the query")
+
+    def _key(self, model: Model, row: dict) -> tuple:
+        return tuple(row[name] for name in model.id)
+
+    def _matching_keys(self, model: Model, where: dict) -> list[tuple]:
+        where = self._prepare(model, where)
+        return [self._key(model, row) for row in self._candidates(model, where) if self._matches(model, row, where)]
+
+    def _candidates(self, model: Model, where: dict) -> list[dict]:
+        """
+        Narrows the rows to scan with the lookup of a foreign key `where` compares to a value.
+        """
+        table = self.tables[model.name]
+        for fields, lookup in self.lookups[model.name].items():
+            if all(name in where and not isinstance(where[name], dict) for name in fields):
+                return [table[key] for key in lookup.get(tuple(where[name] for name in fields), ())]
+        return list(table.values())
+
+    def _find_unique(self, model: Model, where: dict) -> Optional[tuple]:
+        """
+        Looks the row up by its primary key or a unique index, other conditions of `where` must match too.
+        """
+        flat = {}
+        for name, value in where.items():
+            if name in model.compounds and name not in model.fields:
+                flat.update(value)
+            else:
+                flat[name] = value
+        prepared = self._prepare(model, flat)
+        for fields in model.uniques:
+            if all(name in prepared and not isinstance(prepared[name], dict) for name in fields):
+                values = tuple(prepared[name] for name in fields)
+                key = values if fields == model.id else self.indexes[model.name][fields].get(values)
+                row = self.tables[model.name].get(key) if key is not None else None
+                if row is not None and self._matches(model, row, prepared):
+                    return key
+                return None
+        matching = self._matching_keys(model, flat)
+        return matching[0] if matching else None
+
+    def _query(self, model: Model, arguments: dict, rows: Optional[list[dict]] = None) -> list[dict]:
+        """
+        Filters, orders and paginates the rows of the model, or the given related rows.
+        """
+        where = self._prepare(model, arguments.get("where") or {})
+        if rows is None:
+            rows = self._candidates(model, where)
+        if where:
+            rows = [row for row in rows if self._matches(model, row, where)]
+
+        for order in reversed(_as_list(arguments.get("orderBy"))):
+            for name, direction in reversed(list(order.items())):
+                descending = direction == "desc"
+                # Postgres puts nulls last in ascending order and first in descending order
+                rows.sort(key=lambda row: (row[name] is None, row[name]), reverse=descending)
+
+        if cursor := arguments.get("cursor"):
+            cursor = self._prepare(model, cursor)
+            position = next((i for i, row in enumerate(rows) if self._matches(model, row, cursor)), None)
+            if position is None:
+                return []
+            rows = rows[position:] if (arguments.get("take") or 0) >= 0 else rows[:position + 1]
+
+        take, skip = arguments.get("take"), arguments.get("skip") or 0
+        if take is not None and take < 0:
+            rows = rows[:len(rows) - skip][take:]
+        else:
+            rows = rows[skip:] if take is None else rows[skip:skip + take]
+
+        if distinct := arguments.get("distinct"):
+            seen = set()
+            unique_rows = []
+            for row in rows:
+                values = tuple(row[name] for name in distinct)
+                if values not in seen:
+                    seen.add(values)
+                    unique_rows.append(row)
+            rows = unique_rows
+        return rows
+
+    def _related(self, model: Model, link: Link, row: dict) -> list[dict]:
+        values = tuple(row[name] for name in link.local)
+        if None in values:
+            return []
+        target = self.schema[link.target]
+        table = self.tables[link.target]
+        if link.owner:
+            # A foreign key references the primary key or a unique constraint of the target
+            key = values if link.remote == target.id else self.indexes[link.target][link.remote].get(values)
+            return [table[key]] if key in table else []
+        return [table[key] for key in self.lookups[link.target][link.remote].get(values, ())]
+
+    def _record(self, model: Model, row: dict, include: Optional[dict]) -> dict:
+        record = {name: list(value) if isinstance(value, list) else value for name, value in row.items()}
+        for name, options in (include or {}).items():
+            if not options:
+                continue
+            if name not in model.links:
+                raise _error(errors.FieldNotFoundError, "P2009", f"Unknown relation `{name}` of {model.name}")
+            link = model.links[name]
+            target = self.schema[link.target]
+            options = options if isinstance(options, dict) else {}
+            related = self._related(model, link, row)
+            if link.many:
+                related = self._query(target, options, related)
+                record[name] = [self._record(target, other, options.get("include")) for other in related]
+            else:
+                record[name] = self._record(target, related[0], options.get("include")) if related else None
+        return record
+
+    @staticmethod
+    def _coerce(current: Field, value: Any) -> Any:
+        if isinstance(value, (list, tuple)):
+            return [MemoryStore._coerce(current, item) for item in value]
+        if current.type == "DateTime" and value is not None:
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            # Stored as the query engine returns them, in UTC with millisecond precision
+            value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+            return value.replace(microsecond=value.microsecond // 1000 * 1000)
+        return value
+
+    def _prepare(self, model: Model, where: dict) -> dict:
+        """
+        Coerces the values of `where` like stored values once, rather than for every row it is matched to.
+        """
+        prepared = {}
+        for name, condition in where.items():
+            if name in ("AND", "OR", "NOT"):
+                prepared[name] = [self._prepare(model, part) for part in _as_list(condition)]
+            elif name in model.links:
+                link = model.links[name]
+                target = self.schema[link.target]
+                # To-one relations take `is` and `is_not`, or the related row's conditions directly
+                if not link.many and (condition is None or not set(condition) <= {"is", "isNot"}):
+                    condition = {"is": condition}
+                prepared[name] = {
+                    operator: None if part is None else self._prepare(target, part) for operator, part in condition.items()
+                }
+            elif name in model.fields:
+                prepared[name] = self._prepare_field(model.fields[name], condition)
+            elif name in model.compounds:
+                prepared[name] = self._prepare(model, condition)
+            else:
+                raise _error(errors.FieldNotFoundError, "P2009", f"Unknown field `{name}` of {model.name}")
+        return prepared
+
+    def _prepare_field(self, current: Field, condition: Any) -> Any:
+        if not isinstance(condition, dict) or current.type == "Json":
+            return self._coerce(current, condition)
+        prepared = {}
+        for operator, operand in condition.items():
+            if operator == "mode":
+                prepared[operator] = operand
+            elif operator in ("in", "notIn"):
+                prepared[operator] = set(self._coerce(current, _as_list(operand)))
+            else:
+                prepared[operator] = self._prepare_field(current, operand)
+        return prepared
+
+    def _matches(self, model: Model, row: dict, where: dict) -> bool:
+        for name, condition in where.items():
+            if name == "AND":
+                if not all(self._matches(model, row, part) for part in _as_list(condition)):
+                    return False
+            elif name == "OR":
+                if not any(self._matches(model, row, part) for part in _as_list(condition)):
+                    return False
+            elif name == "NOT":
+                if any(self._matches(model, row, part) for part in _as_list(condition)):
+                    return False
+            elif name in model.links:
+                if not self._matches_relation(model, model.links[name], row, condition):
+                    return False
+            elif name in model.fields:
+                if not self._matches_field(model.fields[name], row[name], condition):
+                    return False
+            elif not self._matches(model, row, condition):
+                return False
+        return True
+
+    def _matches_relation(self, model: Model, link: Link, row: dict, condition: Optional[dict]) -> bool:
+        target = self.schema[link.target]
+        related = self._related(model, link, row)
+        if link.many:
+            for operator, where in condition.items():
+                matching = [self._matches(target, other, where) for other in related]
+                if operator == "some" and not any(matching):
+                    return False
+                if operator == "every" and not all(matching):
+                    return False
+                if operator == "none" and any(matching):
+                    return False
+            return True
+
+        for operator, where in condition.items():
+            if where is None:
+                found = not related
+            else:
+                found = bool(related) and self._matches(target, related[0], where)
+            if found != (operator == "is"):
+                return False
+        return True
+
+    def _matches_field(self, current: Field, value: Any, condition: Any) -> bool:
+        if not isinstance(condition, dict) or current.type == "Json":
+            return value == condition
+
+        insensitive = condition.get("mode") == "insensitive"
+        for operator, operand in condition.items():
+            if operator == "mode":
+                continue
+            if operator == "equals":
+                matched = value == operand
+            elif operator == "not":
+                if isinstance(operand, dict):
+                    matched = value is not None and not self._matches_field(current, value, operand)
+                else:
+                    # Comparing to null in SQL is unknown, `not` never matches nulls
+                    matched = value != operand if operand is None else value is not None and value != operand
+            elif operator == "isEmpty":
+                matched = value is not None and (len(value) == 0) == operand
+            elif value is None:
+                matched = False
+            elif operator == "in":
+                matched = value in operand
+            elif operator == "notIn":
+                matched = value not in operand
+            elif operator in ("lt", "lte", "gt", "gte"):
+                matched = {"lt": value < operand, "lte": value <= operand,
+                           "gt": value > operand, "gte": value >= operand}[operator]
+            elif operator in ("contains", "startsWith", "endsWith"):
+                text, part = (value.lower(), operand.lower()) if insensitive else (value, operand)
+                matched = {"contains": part in text, "startsWith": text.startswith(part),
+                           "endsWith": text.endswith(part)}[operator]
+            elif operator == "has":
+                matched = operand in value
+            elif operator == "hasEvery":
+                matched = all(item in value for item in operand)
+            elif operator == "hasSome":
+                matched = any(item in value for item in operand)
+            else:
+                raise UnsupportedError(f"Filter `{operator}`")
+            if not matched:
+                return False
+        return True
+
+    # Writes
+
+    def _target_key(self, link: Link, where: dict) -> tuple:
+        target = self.schema[link.target]
+        key = self._find_unique(target, where)
+        if key is None:
+            raise self._not_found(target)
+        return key
+
+    def _build(self, model: Model, data: dict, nested: Optional[list] = None) -> dict:
+        """
+        Builds a new row from create data, with the defaults applied. Writes to relations of other
+        rows are appended to `nested`, to run once the row exists.
+        """
+        row = {}
+        for name, value in data.items():
+            if name in model.links:
+                link = model.links[name]
+                if not link.owner:
+                    if nested is None:
+                        raise UnsupportedError(f"Nested write in create_many ({model.name}.{name})")
+                    nested.append((link, value))
+                    continue
+                target_key = self._connect_one(link, value)
+                target_row = self.tables[link.target][target_key]
+                for local, remote in zip(link.local, link.remote):
+                    row[local] = target_row[remote]
+            elif name in model.fields:
+                row[name] = self._coerce(model.fields[name], value)
+            else:
+                raise _error(errors.FieldNotFoundError, "P2009", f"Unknown field `{name}` of {model.name}")
+
+        for name, current in model.fields.items():
+            if name in model.links or name in row:
+                continue
+            if current.default is not None:
+                value = current.default()
+                if value is AUTOINCREMENT:
+                    value = max((other[name] for other in self.tables[model.name].values()), default=0) + 1
+                row[name] = self._coerce(current, value)
+            elif current.updated_at:
+                row[name] = _now()
+            elif current.is_list:
+                row[name] = []
+            elif current.optional:
+                row[name] = None
+            else:
+                raise _error(errors.MissingRequiredValueError, "P2012",
+                             f"Missing a required value at `{model.name}.{name}`", path=name)
+        return row
+
+    def _connect_one(self, link: Link, value: dict) -> tuple:
+        """
+        Finds or creates the row a foreign key points to, from a nested to-one write.
+        """
+        if "connect" in value:
+            return self._target_key(link, value["connect"])
+        if "connectOrCreate" in value:
+            key = self._find_unique(self.schema[link.target], value["connectOrCreate"]["where"])
+            return key if key is not None else self._create(self.schema[link.target], value["connectOrCreate"]["create"])
+        if "create" in value:
+            return self._create(self.schema[link.target], value["create"])
+        raise UnsupportedError(f"Nested write {list(value)}")
+
+    def _conflict(self, model: Model, row: dict, key: Optional[tuple] = None) -> Optional[tuple]:
+        """
+        Returns the unique constraint the row violates, ignoring the row stored at `key`.
+        """
+        for fields in model.uniques:
+            values = tuple(row[name] for name in fields)
+            if None in values:
+                continue
+            existing = values if fields == model.id else self.indexes[model.name][fields].get(values)
+            if existing is not None and existing != key and existing in self.tables[model.name]:
+                return fields
+        return None
+
+    def _check(self, model: Model, row: dict, key: Optional[tuple] = None):
+        if (fields := self._conflict(model, row, key)) is not None:
+            raise _error(errors.UniqueViolationError, "P2002",
+                         f"Unique constraint failed on the fields: ({', '.join(fields)})", target=list(fields))
+        for name, link in model.links.items():
+            if not link.owner:
+                continue
+            values = tuple(row[local] for local in link.local)
+            if None in values:
+                continue
+            target = self.schema[link.target]
+            if self._find_unique(target, dict(zip(link.remote, values))) is None:
+                raise _error(errors.ForeignKeyViolationError, "P2003",
+                             f"Foreign key constraint failed on the field: `{model.name}.{name}`", field_name=name)
+
+    def _insert(self, model: Model, row: dict) -> tuple:
+        self._check(model, row)
+        key = self._key(model, row)
+        self._put(model, key, row)
+        return key
+
+    def _create(self, model: Model, data: dict) -> tuple:
+        nested = []
+        key = self._insert(model, self._build(model, data, nested))
+        for link, value in nested:
+            self._write_many(model, key, link, value)
+        return key
+
+    def _write_many(self, model: Model, key: tuple, link: Link, value: dict):
+        """
+        Runs a nested write on a relation whose rows hold the foreign key to the row at `key`.
+        """
+        row = self.tables[model.name][key]
+        target = self.schema[link.target]
+        parent = {remote: row[local] for local, remote in zip(link.local, link.remote)}
+        detached = {remote: None for remote in link.remote}
+
+        for operation, items in value.items():
+            if operation == "set":
+                for child in list(self._related(model, link, row)):
+                    self._update(target, self._key(target, child), detached)
+                items, operation = items, "connect"
+            # `disconnect: True` and `delete: True` of a to-one relation name no row
+            for item in [{}] if isinstance(items, bool) else _as_list(items):
+                if operation == "create":
+                    self._create(target, {**item, **parent})
+                elif operation == "connect":
+                    self._update(target, self._target_key(link, item), parent)
+                elif operation == "connectOrCreate":
+                    child_key = self._find_unique(target, item["where"])
+                    if child_key is None:
+                        self._create(target, {**item["create"], **parent})
+                    else:
+                        self._update(target, child_key, parent)
+                elif operation == "disconnect":
+                    self._update(target, self._target_key(link, {**item, **parent}), detached)
+                elif operation == "delete":
+                    self._delete(target, self._target_key(link, {**item, **parent}))
+                else:
+                    raise UnsupportedError(f"Nested `{operation}`")
+
+    def _update(self, model: Model, key: tuple, data: dict, touch: bool = True) -> tuple:
+        """
+        Updates the row at `key`, and its `@updatedAt` fields unless `touch` is False, as in raw
+        statements not setting them.
+        """
+        row = dict(self.tables[model.name][key])
+        nested = []
+        for name, value in data.items():
+            if name in model.links:
+                link = model.links[name]
+                if not link.owner:
+                    nested.append((link, value))
+                elif value.get("disconnect"):
+                    row.update({local: None for local in link.local})
+                else:
+                    target_row = self.tables[link.target][self._connect_one(link, value)]
+                    row.update({local: target_row[remote] for local, remote in zip(link.local, link.remote)})
+            elif name in model.fields:
+                row[name] = self._updated_value(model.fields[name], row[name], value)
+            else:
+                raise _error(errors.FieldNotFoundError, "P2009", f"Unknown field `{name}` of {model.name}")
+
+        for name, current in model.fields.items():
+            if touch and current.updated_at and name not in data:
+                row[name] = _now()
+
+        self._check(model, row, key)
+        new_key = self._key(model, row)
+        if new_key != key:
+            self._remove(model, key)
+        self._put(model, new_key, row)
+        for link, value in nested:
+            self._write_many(model, new_key, link, value)
+        return new_key
+
+    def _updated_value(self, current: Field, value: Any, update: Any) -> Any:
+        if not isinstance(update, dict) or current.type == "Json":
+            return self._coerce(current, update)
+        for operator, operand in update.items():
+            operand = self._coerce(current, operand)
+            if operator == "set":
+                value = operand
+            elif operator == "push":
+                value = [*value, *_as_list(operand)]
+            elif value is None:
+                # Arithmetic on null stays null
+                continue
+            elif operator == "increment":
+                value = value + operand
+            elif operator == "decrement":
+                value = value - operand
+            elif operator == "multiply":
+                value = value * operand
+            elif operator == "divide":
+                value = value / operand if current.type != "Int" else int(value / operand)
+            else:
+                raise UnsupportedError(f"Update `{operator}`")
+        return value
+
+    def _delete(self, model: Model, key: tuple):
+        row = self.tables[model.name][key]
+        for referrer, link in self.referrers[model.name]:
+            values = dict(zip(link.local, (row[remote] for remote in link.remote)))
+            children = self._matching_keys(referrer, values)
+            if not children:
+                continue
+            if link.on_delete == "Cascade":
+                for child in children:
+                    if child in self.tables[referrer.name]:
+                        self._delete(referrer, child)
+            elif link.on_delete == "SetNull":
+                for child in children:
+                    self._update(referrer, child, {local: None for local in link.local})
+            else:
+                raise _error(errors.ForeignKeyViolationError, "P2003",
+                             f"Foreign key constraint failed on the field: `{referrer.name}.{link.local[0]}`",
+                             field_name=link.local[0])
+        if key in self.tables[model.name]:
+            self._remove(model, key)
+
+
+class MemoryEngine(SyncAbstractEngine):
+    """
+    Stands in for the query engine, holding the store and its transactions.
+    """
+    dml = ""
+
+    def __init__(self, store: MemoryStore):
+        self.store = store
+        self._transactions = {}
+
+    def connect(self, timeout=None, datasources=None) -> None:
+        pass
+
+    def close(self, *, timeout=None) -> None:
+        pass
+
+    async def aclose(self, *, timeout=None) -> None:
+        pass
+
+    def query(self, content: str, *, tx_id=None):
+        raise UnsupportedError("Engine query outside of a client action")
+
+    def start_transaction(self, *, content: str) -> str:
+        tx_id = uuid.uuid4().hex
+        self._transactions[tx_id] = self.store.begin()
+        return tx_id
+
+    def commit_transaction(self, tx_id: str) -> None:
+        self.store.commit(self._transactions.pop(tx_id))
+
+    def rollback_transaction(self, tx_id: str) -> None:
+        self.store.rollback(self._transactions.pop(tx_id))
+
+    def metrics(self, *, format, global_labels):
+        if format == "prometheus":
+            return ""
+        return {"counters": [], "gauges": [], "histograms": []}
+
+
+class MemoryBackendMixin:
+    """
+    Answers the client's actions from a `MemoryStore`. The store is created on `connect()` and kept
+    on `disconnect()`, so data lives as long as the client.
+    """
+    __slots__ = ()
+
+    def connect(self, timeout=None):
+        if self._internal_engine is None:
+            self._internal_engine = MemoryEngine(MemoryStore(load_schema()))
+
+    def disconnect(self, timeout=None):
+        pass
+
+    def reset(self):
+        """
+        Removes every row, i.e. between tests.
+        """
+        self._engine.store.reset()
+
+    def _execute(self, method, arguments, model=None, root_selection=None):
+        name = model.__prisma_model__ if model is not None else None
+        return {"data": {"result": self._engine.store.execute(method, name, arguments, root_selection)}}
+
+    def commit_batch(self, queries: list[dict]):
+        """
+        Runs the queries of a batch as one transaction.
+        """
+        store = self._engine.store
+        with store.atomic():
+            for query in queries:
+                MemoryBackendMixin._execute(self, **query)
+
+
+class MemoryBatch(prisma.Batch):
+    """
+    Batch of the in-memory client, its queries are run by the client instead of the query engine.
+    """
+
+    def __init__(self, client: "MemoryPrisma"):
+        super().__init__(client)
+        self._memory_client = client
+        self._pending = []
+
+    def _add(self, **kwargs):
+        self._pending.append(kwargs)
+
+    def commit(self):
+        pending, self._pending = self._pending, []
+        self._memory_client.commit_batch(pending)
+
+
+class MemoryPrisma(TracingMixin, MemoryBackendMixin, prisma.Prisma):
+    """
+    Client registered by the app when `DATABASE_BACKEND` is `memory`, data is kept in the process.
+    """
+
+    def batch_(self) -> MemoryBatch:
+        return MemoryBatch(self)
@@ -0,0 +1,50 @@
+"""
+Script description: This module turns a user's moods into the spans shown on the calendar.
+"""
+
+from datetime import timedelta
+
+
+def mood_spans(moods: list) -> list[dict]:
+    """
+    Merges runs of the same mood on consecutive days into one span.
+
+    Parameters
+    ----------
+    moods: list
+        Moods of the user sorted by date, anything with `name` and `date`.
+
+    Returns
+    -------
+    list
+        A `title` with either a `date`, or a `start` and an exclusive `end`, per span.
+    """
+    spans = []
+    mood_iter = iter(moods)
+    current_mood = next(mood_iter, None)
+    start_date = None
+
+    while current_mood is not None:
+        next_mood = next(mood_iter, None)
+
+        delta = 0
+        if next_mood is not None and current_mood.name == next_mood.name:
+            time_delta = current_mood.date - next_mood.date
+            delta = time_delta.days
+
+        if delta == -1:
+            if start_date is None:
+                start_date = current_mood.date.isoformat()
+        else:
+            span = {"title": current_mood.name}
+            if start_date is not None:
+                span["start"] = start_date
+                span["end"] = (current_mood.date + timedelta(days=1)).isoformat()
+                start_date = None
+            else:
+                span["date"] = current_mood.date.isoformat()
+            spans.append(span)
+
+        current_mood = next_mood
+
+    return spans
@@ -0,0 +1,58 @@
+"""
+Script description: This module runs independent database queries of a page concurrently.
+
+The sync Prisma client can serve several threads at once, so the queries are run on a shared
+thread pool sized to the connection pool. Each call runs in a copy of the caller's context, but
+without Streamlit's script context: the callables should only query, not render or read
+`st.session_state`.
+"""
+
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+import streamlit as st
+
+# Queries in flight for a single page
+MAX_IN_FLIGHT = 8
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_executor() -> ThreadPoolExecutor:
+    # More workers than pooled connections would only queue inside the query engine
+    workers = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+
+
+def gather(*calls: Callable[[], Any], limit: int = MAX_IN_FLIGHT) -> list:
+    """
+    Runs the calls concurrently, with at most `limit` of them in flight.
+
+    Parameters
+    ----------
+    calls: Callable[[], Any]
+        Independent calls, usually lambdas around a query.
+    limit: int
+        Maximum number of calls running at the same time.
+
+    Returns
+    -------
+    list
+        Results in the order of the calls. The first exception raised by a call is re-raised.
+    """
+    executor = get_query_executor()
+    results = [None] * len(calls)
+    queued = list(enumerate(calls))
+    queued.reverse()
+    running = {}
+
+    while queued or running:
+        while queued and len(running) < limit:
+            index, call = queued.pop()
+            running[executor.submit(contextvars.copy_context().run, call)] = index
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[running.pop(future)] = future.result()
+
+    return results
@@ -2,6 +2,29 @@ import streamlit as st
 
 ROLES = ['user', 'editor', 'admin']
 
+# Bulk role updates, $1 is the role and $2 the email search or the list of emails
+ROLE_UPDATES = {
+    "Add": ("array_append(roles, $1)", "NOT ($1 = ANY(roles))"),
+    "Remove": ("array_remove(roles, $1)", "$1 = ANY(roles)"),
+}
+
+TARGET_FILTERS = {
+    "search": "strpos(email, $2) > 0",
+    "emails": "email = ANY($2::text[])",
+}
+
+
+def bulk_roles_query(action: str, target: str) -> str:
+    """
+    Builds the statement adding or removing a role of the targeted users, returning their new session epochs.
+    """
+    assignment, condition = ROLE_UPDATES[action]
+    return (
+        f'UPDATE "User" SET roles = {assignment}, session_epoch = session_epoch + 1 '
+        f'WHERE {TARGET_FILTERS[target]} AND {condition} '
+        'RETURNING id, session_epoch'
+    )
+
 
 class Roles(list):
     def __init__(self, *args):
@@ -0,0 +1,128 @@
+"""
+Script description: This module routes read-only admin and reporting queries to a read replica.
+
+Queries are only sent to the replica inside `replica_reads()`, used as a context manager or a
+decorator, and never inside a transaction. The replica is skipped, falling back to the primary,
+when it is not configured, unreachable, lagging more than `DATABASE_REPLICA_MAX_LAG` seconds,
+or when this process wrote to the primary more recently than the replica's lag.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prisma.errors import DataError
+
+# Seconds between two checks of the replica's lag
+LAG_CHECK_INTERVAL = 5
+
+REPLICA_METHODS = {
+    "find_unique", "find_unique_or_raise", "find_first", "find_first_or_raise", "find_many", "count", "group_by",
+    "query_raw",
+}
+WRITE_METHODS = {
+    "create", "create_many", "update", "update_many", "upsert", "delete", "delete_many", "execute_raw",
+}
+
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END::float AS lag
+"""
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Sends the reads of the block, or of the decorated function, to the replica when it is fresh.
+    The block must not write, the replica rejects writes.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    def __init__(self, client, max_lag: float):
+        self.client = client
+        self.max_lag = max_lag
+        self.lag: Optional[float] = None
+        self.checked_at = float("-inf")
+        self.written_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _check(self):
+        try:
+            if not self.client.is_connected():
+                self.client.connect()
+            self.lag = self.client.query_first(LAG_QUERY)["lag"]
+        except Exception as e:
+            print(f"Replica unavailable: {e}")
+            self.lag = None
+        self.checked_at = time.monotonic()
+
+    def available(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at > LAG_CHECK_INTERVAL and self._lock.acquire(blocking=False):
+            # One thread refreshes the lag, the others use the previous result meanwhile
+            try:
+                self._check()
+            finally:
+                self._lock.release()
+        if self.lag is None or self.lag > self.max_lag:
+            return False
+        # The replica may not have replayed this process's own writes yet
+        return now - self.written_at > self.lag + LAG_CHECK_INTERVAL
+
+    def failed(self):
+        self.lag = None
+        self.checked_at = time.monotonic()
+
+
+_router: Optional[ReplicaRouter] = None
+
+
+def configure(client, max_lag: float = None):
+    global _router
+    if max_lag is None:
+        max_lag = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "30"))
+    _router = ReplicaRouter(client, max_lag)
+
+
+def replica_status() -> Optional[dict]:
+    if _router is None:
+        return None
+    return {"available": _router.lag is not None and _router.lag <= _router.max_lag, "lag": _router.lag}
+
+
+class ReplicaRoutingMixin:
+    """
+    Sends the reads of `replica_reads()` blocks to the configured replica, to be combined with
+    the primary client class.
+    """
+    __slots__ = ()
+
+    def _execute(self, method, arguments, model=None, root_selection=None):
+        router = _router
+        if router is None:
+            pass
+        elif method in WRITE_METHODS:
+            router.written_at = time.monotonic()
+        elif self._tx_id is None and _replica_reads.get() and method in REPLICA_METHODS and router.available():
+            try:
+                return router.client._execute(method, arguments, model, root_selection)
+            except Exception as e:
+                # Errors of the query itself would be the same on the primary
+                if isinstance(e, DataError) and not (e.code or "").startswith("P1"):
+                    raise
+                print(f"Replica query failed, using primary: {e}")
+                router.failed()
+        return super()._execute(method, arguments, model, root_selection)
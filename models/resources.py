@@ -0,0 +1,50 @@
+"""
+Script description: This module compares the resource table edited by an admin with the stored one.
+"""
+
+import polars as pl
+
+SCHEMA = ["id", "name", "description", "location", "link"]
+
+
+def diff_resources(resources_df: pl.DataFrame, edited_resources_df: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+    """
+    Finds the new, updated and deleted resources.
+
+    Parameters
+    ----------
+    resources_df: pl.DataFrame
+        Stored resources.
+    edited_resources_df: pl.DataFrame
+        Resources after editing, new rows have no `id`.
+
+    Returns
+    -------
+    tuple
+        New, updated and deleted resources.
+    """
+    new_resources = edited_resources_df.filter(pl.col("id").is_null())
+
+    deleted_resources = resources_df.filter(
+        ~pl.col("id").is_in(edited_resources_df["id"])
+    )
+
+    updated_resources = (
+        edited_resources_df
+        .filter(~pl.col("id").is_null())
+        .join(
+            resources_df,
+            on="id",
+            how="inner",
+            suffix="_original"
+        )
+        .filter(
+            (pl.col("name") != pl.col("name_original")) |
+            (pl.col("description") != pl.col("description_original")) |
+            (pl.col("location") != pl.col("location_original")) |
+            (pl.col("link") != pl.col("link_original"))
+        )
+        .select(SCHEMA)
+    )
+
+    return new_resources, updated_resources, deleted_resources
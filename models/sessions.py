@@ -0,0 +1,187 @@
+"""
+Script description: This module keeps track of live sessions through heartbeats, replacing the
+`User.logged_in` flag for concurrency checks.
+
+Sessions expire when no heartbeat is received within `SESSION_TTL`. The registry is kept in
+process memory, or in Redis when `SESSION_REGISTRY_URL` is set so several replicas share it.
+A background reaper copies the live users back to `User.logged_in` in batches.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from models.database import prisma
+
+HEARTBEAT_INTERVAL = 60
+SESSION_TTL = 3 * HEARTBEAT_INTERVAL
+REAP_INTERVAL = 5 * 60
+REAP_BATCH_SIZE = 500
+
+LOGGED_IN_QUERY = 'SELECT id FROM "User" WHERE logged_in'
+RECONCILE_QUERY = 'UPDATE "User" SET logged_in = $1 WHERE id = ANY($2::text[])'
+
+
+class InMemorySessionBackend:
+    """
+    Sessions ordered by their last heartbeat, so expiry only looks at the oldest entries.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._users: Counter[str] = Counter()
+
+    def _expire(self, now: float):
+        while self._sessions:
+            session_id, (user_id, last_seen) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._release(user_id)
+
+    def _release(self, user_id: str):
+        self._users[user_id] -= 1
+        if self._users[user_id] <= 0:
+            del self._users[user_id]
+
+    def heartbeat(self, session_id: str, user_id: str):
+        now = time.time()
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            if previous:
+                self._release(previous[0])
+            self._sessions[session_id] = (user_id, now)
+            self._users[user_id] += 1
+            self._expire(now)
+
+    def remove(self, session_id: str, user_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None):
+                self._release(user_id)
+
+    def live_users(self) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return len(self._users)
+
+    def user_sessions(self, user_id: str) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return self._users[user_id]
+
+    def live_user_ids(self) -> set[str]:
+        with self._lock:
+            self._expire(time.time())
+            return set(self._users)
+
+
+class RedisSessionBackend:
+    """
+    Sessions shared by all replicas, kept in Redis sorted sets scored by the last heartbeat.
+    """
+
+    PREFIX = "wellnest:sessions"
+
+    def __init__(self, url: str, ttl: float):
+        import redis
+
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def _user_key(self, user_id: str) -> str:
+        return f"{self.PREFIX}:user:{user_id}"
+
+    def heartbeat(self, session_id: str, user_id: str):
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zadd(self._user_key(user_id), {session_id: now})
+        pipe.expire(self._user_key(user_id), int(self.ttl) + 1)
+        pipe.zadd(f"{self.PREFIX}:users", {user_id: now})
+        pipe.execute()
+
+    def remove(self, session_id: str, user_id: str):
+        self._redis.zrem(self._user_key(user_id), session_id)
+        if self.user_sessions(user_id) == 0:
+            self._redis.zrem(f"{self.PREFIX}:users", user_id)
+
+    def live_users(self) -> int:
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(f"{self.PREFIX}:users", "-inf", time.time() - self.ttl)
+        pipe.zcard(f"{self.PREFIX}:users")
+        return pipe.execute()[1]
+
+    def user_sessions(self, user_id: str) -> int:
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(self._user_key(user_id), "-inf", time.time() - self.ttl)
+        pipe.zcard(self._user_key(user_id))
+        return pipe.execute()[1]
+
+    def live_user_ids(self) -> set[str]:
+        members = self._redis.zrangebyscore(f"{self.PREFIX}:users", time.time() - self.ttl, "+inf")
+        return {member.decode() for member in members}
+
+
+def current_session_id() -> Optional[str]:
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def _reconcile(ids: list[str], logged_in: bool):
+    for i in range(0, len(ids), REAP_BATCH_SIZE):
+        prisma.get_client().execute_raw(RECONCILE_QUERY, logged_in, ids[i:i + REAP_BATCH_SIZE])
+
+
+def reap(backend) -> tuple[int, int]:
+    """
+    Copies the live users of the registry to `User.logged_in` in batches.
+
+    Returns
+    -------
+    tuple[int, int]
+        Number of users flagged and unflagged.
+    """
+    live = backend.live_user_ids()
+    flagged = {row["id"] for row in prisma.get_client().query_raw(LOGGED_IN_QUERY)}
+
+    stale = list(flagged - live)
+    fresh = list(live - flagged)
+    _reconcile(stale, False)
+    _reconcile(fresh, True)
+    return len(fresh), len(stale)
+
+
+def _reaper(backend):
+    while True:
+        time.sleep(REAP_INTERVAL)
+        try:
+            reap(backend)
+        except Exception as e:
+            print(f"Failed to reconcile logged in users: {e}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_registry():
+    url = os.getenv("SESSION_REGISTRY_URL")
+    if url:
+        backend = RedisSessionBackend(url, SESSION_TTL)
+    else:
+        backend = InMemorySessionBackend(SESSION_TTL)
+
+    threading.Thread(target=_reaper, args=(backend,), name="session-reaper", daemon=True).start()
+    return backend
+
+
+def heartbeat():
+    """
+    Records a heartbeat for the current session of the logged in user.
+    """
+    session_id = current_session_id()
+    if session_id and st.session_state.get("user_id"):
+        get_session_registry().heartbeat(session_id, st.session_state["user_id"])
@@ -0,0 +1,90 @@
+"""
+Script description: This module prepares the input of summary generation and reads back the
+LLM's response, without touching the database.
+"""
+
+import json
+from datetime import datetime
+
+import polars as pl
+import yaml
+
+
+def shape_moods(moods: list) -> tuple[pl.DataFrame, datetime, datetime]:
+    """
+    Builds the mood table sent to the LLM.
+
+    Parameters
+    ----------
+    moods: list
+        Moods of the user, as returned by the client.
+
+    Returns
+    -------
+    tuple
+        The moods with dates as `YYYY-MM-DD` and single-line descriptions, the first and the
+        last mood date.
+    """
+    moods_df = pl.DataFrame(moods).drop("user_id").drop("user")
+    start = min(moods_df["date"])
+    end = max(moods_df["date"])
+
+    moods_df = moods_df.with_columns(
+        pl.col("date").dt.strftime("%Y-%m-%d"),
+        pl.col("description").str.replace_all("\n", " ").str.replace_all("\t", " ").str.replace_all("  ", " ").alias("description"),
+    )
+    return moods_df, start, end
+
+
+def encode_summary_input(moods_df: pl.DataFrame, resources_df: pl.DataFrame, events: list[dict]) -> str:
+    """
+    Encodes the user message of the summary prompt.
+    """
+    input_data = {
+        "moods": moods_df.to_dicts(),
+        "resources": resources_df.to_dicts(),
+        "events": events,
+    }
+    return json.dumps(input_data, ensure_ascii=False)
+
+
+def parse_summary_response(response: str, resources_df: pl.DataFrame, events: list[dict]) -> dict:
+    """
+    Reads the LLM's YAML response, keeping only suggestions of resources and events it was given.
+
+    Parameters
+    ----------
+    response: str
+        Message content of the completion, optionally fenced as a YAML code block.
+    resources_df: pl.DataFrame
+        Resources sent in the prompt.
+    events: list
+        Events sent in the prompt.
+
+    Returns
+    -------
+    dict
+        `content`, `keywords`, `resources` as rows to create and `event_ids`.
+    """
+    response = response.strip().removeprefix("```yaml").removesuffix("```")
+    result = yaml.load(response, Loader=yaml.SafeLoader)
+
+    raw_suggestion = result.get("suggestion", [])
+    if isinstance(raw_suggestion, str):
+        raw_suggestion = [raw_suggestion]
+
+    suggestion = [sid for sid in raw_suggestion if isinstance(sid, str)]
+
+    suggestion = pl.DataFrame({"id": suggestion}).join(resources_df, on="id", how="inner").select(["id"]).rename({"id": "resource_id"})
+
+    raw_event_suggestion = result.get("event_suggestion") or []
+    if isinstance(raw_event_suggestion, str):
+        raw_event_suggestion = [raw_event_suggestion]
+
+    event_ids = {event["id"] for event in events}
+    return {
+        "content": result.get("summary", "[An error occurred during generation]"),
+        "keywords": result.get("keyword", "[An error occurred during generation]"),
+        "resources": suggestion.to_dicts(),
+        "event_ids": list(dict.fromkeys(eid for eid in raw_event_suggestion if eid in event_ids)),
+    }
@@ -0,0 +1,181 @@
+"""
+Script description: This module throttles login attempts in memory, ahead of any password
+check or database access, and buffers failed attempts so they are written in batches.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import streamlit as st
+
+from models.database import prisma
+
+USERNAME_LIMIT = 5
+ADDRESS_LIMIT = 30
+WINDOW = 60
+FLUSH_INTERVAL = 10
+# Reverse proxies in front of the app, each appends the address it received the request from
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+
+FLUSH_QUERY = """
+UPDATE "User" AS u
+SET failed_login_attempts = u.failed_login_attempts + v.attempts
+FROM unnest($1::text[], $2::int[]) AS v(username, attempts)
+WHERE u.username = v.username
+"""
+
+
+class SlidingWindowLimiter:
+    """
+    Allows at most `limit` hits per key within any `window` seconds.
+    """
+
+    def __init__(self, limit: int, window: float, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hits: Dict[str, deque] = {}
+        self._next_sweep = clock() + window
+
+    def _sweep(self, now: float):
+        # Drop keys that went quiet so memory follows the active keys only
+        for key in [key for key, hits in self._hits.items() if now - hits[-1] > self.window]:
+            del self._hits[key]
+        self._next_sweep = now + self.window
+
+    def hit(self, key: str) -> bool:
+        """
+        Records a hit for the key.
+
+        Returns
+        -------
+        bool
+            True if the hit is allowed, False if the key is over its limit.
+        """
+        now = self._clock()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            hits = self._hits.setdefault(key, deque())
+            while hits and now - hits[0] > self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False
+            hits.append(now)
+            return True
+
+
+def _write_failed_attempts(usernames: List[str], attempts: List[int]):
+    prisma.get_client().execute_raw(FLUSH_QUERY, usernames, attempts)
+
+
+class FailedLoginBuffer:
+    """
+    Counts failed logins per username in memory and adds them to
+    `User.failed_login_attempts` with one statement per flush.
+    """
+
+    def __init__(self, write: Callable[[List[str], List[int]], None] = _write_failed_attempts):
+        self._write = write
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._pending: Counter[str] = Counter()
+        # Usernames of the flush being written
+        self._flushing: set[str] = set()
+
+    def record(self, username: str):
+        with self._lock:
+            self._pending[username] += 1
+
+    def pending(self, username: str) -> int:
+        with self._lock:
+            return self._pending[username]
+
+    @contextmanager
+    def resetting(self, username: str):
+        """
+        Drops the buffered attempts of the user, to be used around the statement resetting the
+        attempts in the database. A flush already writing attempts of the user finishes first, so
+        it cannot add attempts counted before the reset after it.
+        """
+        with self._lock:
+            while username in self._flushing:
+                self._flushed.wait()
+            self._pending.pop(username, None)
+        yield
+
+    def flush(self) -> int:
+        """
+        Writes the buffered attempts.
+
+        Returns
+        -------
+        int
+            Number of usernames written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushing = set(pending)
+        if not pending:
+            return 0
+        try:
+            self._write(list(pending), list(pending.values()))
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = set()
+                self._flushed.notify_all()
+        return len(pending)
+
+    def run(self, interval: float = FLUSH_INTERVAL):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to flush failed login attempts: {e}")
+
+
+class LoginThrottle:
+    def __init__(self):
+        self.usernames = SlidingWindowLimiter(USERNAME_LIMIT, WINDOW)
+        self.addresses = SlidingWindowLimiter(ADDRESS_LIMIT, WINDOW)
+        self.failures = FailedLoginBuffer()
+
+    def allow(self, username: str, address: Optional[str]) -> bool:
+        if address and not self.addresses.hit(address):
+            return False
+        return self.usernames.hit(username)
+
+
+@st.cache_resource(show_spinner=False)
+def get_login_throttle() -> LoginThrottle:
+    throttle = LoginThrottle()
+    threading.Thread(target=throttle.failures.run, name="failed-login-flush", daemon=True).start()
+    return throttle
+
+
+def client_address() -> Optional[str]:
+    """
+    Gets the client address recorded by the trusted reverse proxies, if any. Entries of
+    `X-Forwarded-For` before the last `TRUSTED_PROXY_HOPS` come from the client and are ignored,
+    and so is a header with fewer entries than hops, its first entry may come from the client.
+    """
+    if TRUSTED_PROXY_HOPS <= 0:
+        return None
+    try:
+        headers = st.context.headers
+    except Exception:
+        return None
+    forwarded = [entry.strip() for entry in (headers.get("X-Forwarded-For") or "").split(",") if entry.strip()]
+    if len(forwarded) >= TRUSTED_PROXY_HOPS:
+        return forwarded[-TRUSTED_PROXY_HOPS]
+    return headers.get("X-Real-Ip")
@@ -0,0 +1,232 @@
+"""
+Script description: This module traces the queries sent through the Prisma client, attributing
+each one to the model, the operation and the page or entry point that issued it.
+
+Latencies go into histograms sharded per thread, each shard only ever written by its own thread,
+so recording takes no lock. The shard of a finished thread is folded into a shared total, since
+Streamlit runs every rerun in a new thread. Readers merge a copy of every shard. Queries slower than
+`SLOW_QUERY_MS` are also kept in a bounded slow log, with the argument values redacted.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+# Upper bounds of the latency buckets, in milliseconds
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+SLOW_LOG_SIZE = 100
+
+APP_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+# Frames in these files belong to the client plumbing, not to the caller of the query
+PLUMBING = {"models/database.py", "models/tracing.py", "models/parallel.py"}
+# Helpers shared by pages, queries are attributed to the page calling them
+SHARED = "models/"
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "total", "max", "rows")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+
+    def add(self, duration: float, rows: int):
+        self.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.rows += rows
+
+    def merge(self, other: "Histogram"):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.rows += other.rows
+
+    def percentile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-th percentile, capped by the largest sample.
+        """
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class _ShardHolder:
+    """
+    Owns the shard of one thread, dropped with the thread's locals when the thread ends.
+    """
+    __slots__ = ("shard", "__weakref__")
+
+    def __init__(self):
+        self.shard = {}
+
+
+_local = threading.local()
+_lock = threading.Lock()
+# Shards of the running threads by id, and the merged shards of finished threads
+_shards: dict[int, dict] = {}
+_retired: dict[tuple[str, str, str], Histogram] = {}
+_slow_log: deque = deque(maxlen=SLOW_LOG_SIZE)
+
+
+def _retire(shard_id: int, shard: dict):
+    with _lock:
+        _shards.pop(shard_id, None)
+        for key, histogram in shard.items():
+            _retired.setdefault(key, Histogram()).merge(histogram)
+
+
+def _shard() -> dict:
+    holder = getattr(_local, "holder", None)
+    if holder is None:
+        holder = _local.holder = _ShardHolder()
+        with _lock:
+            _shards[id(holder.shard)] = holder.shard
+        weakref.finalize(holder, _retire, id(holder.shard), holder.shard)
+    return holder.shard
+
+
+def caller() -> str:
+    """
+    Returns `file:function` of the innermost app frame outside the client plumbing and the shared
+    models, i.e. the page, or of the innermost model frame for queries of background threads.
+    """
+    frame = sys._getframe(1)
+    fallback = None
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(APP_ROOT):
+            path = filename.removeprefix(APP_ROOT).replace(os.sep, "/")
+            if path not in PLUMBING:
+                source = f"{path}:{frame.f_code.co_qualname.replace('.<locals>', '')}"
+                if not path.startswith(SHARED):
+                    return source
+                fallback = fallback or source
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+def row_count(response: Any) -> int:
+    result = response.get("data", {}).get("result") if isinstance(response, dict) else None
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        # Raw queries return their rows under `rows`
+        return len(result["rows"]) if isinstance(result.get("rows"), list) else 1
+    if isinstance(result, int) and not isinstance(result, bool):
+        return result
+    return 0 if result is None else 1
+
+
+def redact(value: Any, key: str = None) -> Any:
+    """
+    Replaces the values of query arguments with placeholders, keeping their structure and the
+    SQL of raw queries.
+    """
+    if key == "query" and isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if value is None or isinstance(value, bool):
+        return value
+    return "?"
+
+
+def record(model: str, operation: str, source: str, duration: float, rows: int, arguments: dict):
+    key = model, operation, source
+    shard = _shard()
+    histogram = shard.get(key)
+    if histogram is None:
+        histogram = shard[key] = Histogram()
+    histogram.add(duration, rows)
+
+    if duration >= int(os.getenv("SLOW_QUERY_MS", "200")):
+        _slow_log.append({
+            "time": datetime.now(tz=timezone.utc),
+            "model": model,
+            "operation": operation,
+            "caller": source,
+            "duration": duration,
+            "rows": rows,
+            "arguments": redact(arguments),
+        })
+
+
+def snapshot() -> dict[tuple[str, str, str], Histogram]:
+    """
+    Merges the shards of all threads, keyed by (model, operation, caller).
+    """
+    merged = {}
+    with _lock:
+        shards = list(_shards.values())
+        for key, histogram in _retired.items():
+            merged.setdefault(key, Histogram()).merge(histogram)
+    for shard in shards:
+        # dict.copy does not release the GIL, the owner thread cannot resize it meanwhile
+        for key, histogram in shard.copy().items():
+            merged.setdefault(key, Histogram()).merge(histogram)
+    return merged
+
+
+def top_offenders(limit: int = 10) -> list[dict]:
+    """
+    Ranks the traced queries by the total time spent in them.
+    """
+    rows = [{
+        "Caller": source,
+        "Model": model,
+        "Operation": operation,
+        "Calls": histogram.count,
+        "Total (ms)": round(histogram.total, 1),
+        "p50 (ms)": histogram.percentile(0.5),
+        "p95 (ms)": histogram.percentile(0.95),
+        "Max (ms)": round(histogram.max, 1),
+        "Rows/call": round(histogram.rows / histogram.count, 1),
+    } for (model, operation, source), histogram in snapshot().items()]
+    rows.sort(key=lambda row: row["Total (ms)"], reverse=True)
+    return rows[:limit]
+
+
+def slow_queries() -> list[dict]:
+    return list(reversed(_slow_log))
+
+
+class TracingMixin:
+    """
+    Records every query of a Prisma client, to be combined with the client class.
+    """
+    __slots__ = ()
+
+    def _execute(self, method, arguments, model=None, root_selection=None):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = super()._execute(method, arguments, model, root_selection)
+            return response
+        finally:
+            record(
+                model.__name__ if model else "raw",
+                method,
+                caller(),
+                (time.perf_counter() - start) * 1000,
+                row_count(response),
+                arguments,
+            )
@@ -0,0 +1,72 @@
+-- Partitions "Mood" by month of `date`. Safe to run again, an already partitioned table is kept.
+--
+--     dotenv -f .env.local run -- prisma db execute --file prisma/mood_partitions.sql --schema schema.prisma
+--
+-- Months older than the retention window are moved to Parquet files by `archive.py`.
+
+CREATE OR REPLACE FUNCTION mood_ensure_partitions(first_month date, last_month date) RETURNS void AS $$
+DECLARE
+    month date := date_trunc('month', first_month);
+    partition text;
+    has_default boolean;
+    moved boolean;
+BEGIN
+    WHILE month <= last_month LOOP
+        partition := 'Mood_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(format('%I', partition)) IS NULL THEN
+            -- Postgres refuses a new partition while the default one holds rows of its month, so
+            -- those rows are moved out of the detached default partition into the new one
+            has_default := to_regclass('"Mood_default"') IS NOT NULL;
+            moved := false;
+            IF has_default THEN
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM "Mood_default" WHERE date >= %L AND date < %L)',
+                               month, month + interval '1 month') INTO moved;
+            END IF;
+            IF moved THEN
+                ALTER TABLE "Mood" DETACH PARTITION "Mood_default";
+            END IF;
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF "Mood" FOR VALUES FROM (%L) TO (%L)',
+                partition, month, month + interval '1 month'
+            );
+            IF moved THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM "Mood_default" WHERE date >= %L AND date < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    month, month + interval '1 month', partition
+                );
+                ALTER TABLE "Mood" ATTACH PARTITION "Mood_default" DEFAULT;
+            END IF;
+        END IF;
+        month := month + interval '1 month';
+    END LOOP;
+END
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    oldest date;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = '"Mood"'::regclass) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE "Mood" RENAME TO "Mood_unpartitioned";
+    ALTER TABLE "Mood_unpartitioned" RENAME CONSTRAINT "Mood_pkey" TO "Mood_unpartitioned_pkey";
+    ALTER TABLE "Mood_unpartitioned" RENAME CONSTRAINT "Mood_user_id_fkey" TO "Mood_unpartitioned_user_id_fkey";
+
+    CREATE TABLE "Mood" (
+        LIKE "Mood_unpartitioned" INCLUDING DEFAULTS,
+        CONSTRAINT "Mood_pkey" PRIMARY KEY (user_id, date),
+        CONSTRAINT "Mood_user_id_fkey" FOREIGN KEY (user_id) REFERENCES "User"(id) ON DELETE CASCADE ON UPDATE CASCADE
+    ) PARTITION BY RANGE (date);
+
+    SELECT coalesce(min(date), now())::date INTO oldest FROM "Mood_unpartitioned";
+    PERFORM mood_ensure_partitions(oldest, (now() + interval '3 months')::date);
+    -- Rows outside the created months, such as dates far in the future
+    CREATE TABLE "Mood_default" PARTITION OF "Mood" DEFAULT;
+
+    INSERT INTO "Mood" SELECT * FROM "Mood_unpartitioned";
+    DROP TABLE "Mood_unpartitioned";
+END
+$$;
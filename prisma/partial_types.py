@@ -15,3 +15,8 @@ User.create_partial(
     'UserPermissionsView',
     include={"email": True, "roles": True}
 )
+
+User.create_partial(
+    'UserEpochView',
+    include={"id": True, "session_epoch": True}
+)
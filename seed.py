@@ -1,43 +1,78 @@
+"""Seeds the admin user and the resources from prisma/resources.csv.
+
+Safe to run on every deploy: the admin is only created (and its password hashed) when missing,
+and resources are diffed against the database by content hash, so an up-to-date database costs
+two queries.
+"""
+
 import dotenv
 
 dotenv.load_dotenv(".env.local")
 
+import hashlib
 import os
 import bcrypt
 import polars as pl
 from prisma import Prisma
 from models.rbac import Roles
 
-db = Prisma()
-db.connect()
+RESOURCE_FIELDS = ["description", "location", "link"]
+# Separators that do not appear in the CSV, NULL is hashed differently from an empty string
+FIELD_SEPARATOR = "\x1f"
+NULL_MARKER = "\x1e"
+
+HASHES_QUERY = """
+SELECT name, md5(concat_ws(E'\\x1f',
+    coalesce(description, E'\\x1e'), coalesce(location, E'\\x1e'), coalesce(link, E'\\x1e'))) AS hash
+FROM "Resource"
+"""
+
+UPDATE_QUERY = """
+UPDATE "Resource" r
+SET description = u.description, location = u.location, link = u.link, updated_at = (now() AT TIME ZONE 'UTC')
+FROM unnest($1::text[], $2::text[], $3::text[], $4::text[]) AS u(name, description, location, link)
+WHERE r.name = u.name
+"""
+
+
+def content_hash(row: dict) -> str:
+    values = [NULL_MARKER if row[field] is None else row[field] for field in RESOURCE_FIELDS]
+    return hashlib.md5(FIELD_SEPARATOR.join(values).encode()).hexdigest()
 
-db.user.upsert(
-    where={
-        "username": os.getenv("ADMIN_USERNAME"),
-    },
-    data={
-        "create": {
-            "username": os.getenv("ADMIN_USERNAME"),
-            "email": os.getenv("ADMIN_EMAIL"),
-            "password": bcrypt.hashpw(os.getenv("ADMIN_PASSWORD").encode(), bcrypt.gensalt()).decode(),
-            "roles": Roles("admin", "user"),
-        },
-        "update": {},
-    }
-)
-
-with open("prisma/resources.csv", "r", encoding="utf-8") as f:
-    df = pl.read_csv(f)
-    with db.batch_() as batcher:
-        for row in df.iter_rows(named=True):
-            batcher.resource.upsert(
-                where={
-                    "name": row["name"],
-                },
-                data={
-                    "create": row,
-                    "update": row,
-                },
-            )
 
+def seed_admin(db):
+    username = os.getenv("ADMIN_USERNAME")
+    if db.user.find_unique(where={"username": username}):
+        return
+    db.user.create(data={
+        "username": username,
+        "email": os.getenv("ADMIN_EMAIL"),
+        "password": bcrypt.hashpw(os.getenv("ADMIN_PASSWORD").encode(), bcrypt.gensalt()).decode(),
+        "roles": Roles("admin", "user"),
+    })
+    print(f"Created admin {username}")
+
+
+def seed_resources(db):
+    with open("prisma/resources.csv", "r", encoding="utf-8") as f:
+        rows = pl.read_csv(f).to_dicts()
+
+    existing = {row["name"]: row["hash"] for row in db.query_raw(HASHES_QUERY)}
+    created = [row for row in rows if row["name"] not in existing]
+    updated = [row for row in rows if row["name"] in existing and existing[row["name"]] != content_hash(row)]
+    if not created and not updated:
+        return
+
+    with db.tx() as tx:
+        if created:
+            tx.resource.create_many(data=created, skip_duplicates=True)
+        if updated:
+            tx.execute_raw(UPDATE_QUERY, *([row[field] for row in updated] for field in ["name", *RESOURCE_FIELDS]))
+    print(f"Resources: {len(created)} created, {len(updated)} updated")
+
+
+db = Prisma()
+db.connect()
+seed_admin(db)
+seed_resources(db)
 db.disconnect()
@@ -0,0 +1,24 @@
+"""
+Fixtures of the tests. They run on the in-memory database, only `prisma generate` is needed:
+
+    python -m pytest tests
+"""
+import prisma
+import pytest
+
+from models.memory import MemoryPrisma
+
+
+@pytest.fixture(scope="session")
+def memory_client() -> MemoryPrisma:
+    client = MemoryPrisma()
+    client.connect()
+    # Registered like `init_database_connection` does, so `Model.prisma()` and the app's modules use it
+    prisma.register(client)
+    return client
+
+
+@pytest.fixture
+def db(memory_client: MemoryPrisma) -> MemoryPrisma:
+    memory_client.reset()
+    return memory_client
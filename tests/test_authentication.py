@@ -0,0 +1,56 @@
+import pytest
+from streamlit_authenticator.utilities import LoginError
+
+from models.authentication_models import AuthenticationModel
+from models.database import User
+from models.hashing import PasswordHasher
+
+PASSWORD = "Str0ng-Passw0rd!"
+
+
+@pytest.fixture(scope="module")
+def hasher() -> PasswordHasher:
+    # The lowest bcrypt cost, the hashes only have to be valid
+    hasher = PasswordHasher(rounds=4, workers=1)
+    yield hasher
+    hasher.shutdown()
+
+
+def create_user(db, hasher: PasswordHasher, username: str, **data) -> User:
+    return db.user.create(data={
+        "email": f"{username}@bentley.edu",
+        "username": username,
+        "password": hasher.hash(PASSWORD),
+        "first_name": "Jane",
+        "last_name": "Doe",
+        **data,
+    })
+
+
+def test_failed_logins_are_flushed_and_reset_on_login(db, hasher):
+    user = create_user(db, hasher, "login-reset", failed_login_attempts=1)
+    model = AuthenticationModel(hasher=hasher)
+
+    assert model.login("login-reset", "wrong") is False
+    model.throttle.failures.flush()
+    assert User.prisma().find_unique(where={"id": user.id}).failed_login_attempts == 2
+
+    assert model.login("login-reset", PASSWORD, max_login_attempts=3) is True
+    assert User.prisma().find_unique(where={"id": user.id}).failed_login_attempts == 0
+
+
+def test_login_is_refused_after_max_attempts(db, hasher):
+    create_user(db, hasher, "login-locked", failed_login_attempts=3)
+    model = AuthenticationModel(hasher=hasher)
+
+    with pytest.raises(LoginError):
+        model.login("login-locked", PASSWORD, max_login_attempts=3)
+
+
+def test_login_rehashes_an_outdated_password(db, hasher):
+    user = create_user(db, hasher, "login-rehash")
+    model = AuthenticationModel(hasher=PasswordHasher(rounds=5, workers=1))
+
+    assert model.login("login-rehash", PASSWORD) is True
+    assert User.prisma().find_unique(where={"id": user.id}).password.startswith("$2b$05$")
+    model.hasher.shutdown()
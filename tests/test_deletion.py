@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models.deletion import BATCH_QUERY, CLAIM_QUERY, DELETE_STEPS, delete_account_data, request_deletion
+
+YEARS = 3
+BATCH_SIZE = 100
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("MOOD_ARCHIVE_DIR", str(tmp_path))
+
+
+def seed(db, username: str) -> str:
+    """
+    Creates a user with years of daily moods and weekly summaries linked to resources.
+    """
+    user = db.user.create(data={"email": f"{username}@bentley.edu", "username": username})
+    resources = [db.resource.create(data={"name": f"{username} {i}"}) for i in range(3)]
+
+    end = datetime(2024, 12, 31)
+    days = [end - timedelta(days=day) for day in range(YEARS * 365)]
+    moods = ["Happy", "Calm", "Sad", "Stressed"]
+    db.mood.create_many(data=[
+        {"user_id": user.id, "date": day, "name": moods[i // 3 % len(moods)]} for i, day in enumerate(days)
+    ])
+    for day in days[::7]:
+        summary = db.summary.create(data={"user_id": user.id, "start": day - timedelta(days=6), "end": day,
+                                          "keywords": "check", "content": "A week"})
+        db.resourceonsummary.create_many(data=[
+            {"summary_id": summary.id, "resource_id": resource.id} for resource in resources
+        ])
+    return user.id
+
+
+def remaining(db, user_id: str) -> dict[str, int]:
+    return {
+        "User": db.user.count(where={"id": user_id}),
+        "Mood": db.mood.count(where={"user_id": user_id}),
+        "Summary": db.summary.count(where={"user_id": user_id}),
+        "ResourceOnSummary": db.resourceonsummary.count(where={"summary": {"is": {"user_id": user_id}}}),
+    }
+
+
+def test_deletion_of_years_of_data(db):
+    user_id = seed(db, "jane")
+    other_id = seed(db, "john")
+    rows = sum(remaining(db, user_id).values()) - 1
+
+    request_deletion(user_id)
+    assert db.user.find_unique(where={"id": user_id}).deleted_at is not None
+
+    assert delete_account_data(user_id, batch_size=BATCH_SIZE)
+    job = db.accountdeletion.find_unique(where={"user_id": user_id})
+    assert job.status == "done"
+    assert job.deleted_rows == rows
+    assert not any(remaining(db, user_id).values())
+    # Nothing of other users or shared tables is touched
+    assert remaining(db, other_id)["Mood"] == YEARS * 365
+    assert db.resource.count() == 6
+
+
+def test_interrupted_deletion_is_taken_over_after_its_lease(db):
+    user_id = seed(db, "jane")
+    request_deletion(user_id)
+
+    # A worker claims the job and stops after a few batches, as if its process was killed
+    assert db.query_first(CLAIM_QUERY, user_id, 60)
+    for _ in range(3):
+        db.query_first(BATCH_QUERY.format(step=DELETE_STEPS[-1]), user_id, BATCH_SIZE)
+    assert remaining(db, user_id)["Mood"] == YEARS * 365 - 3 * BATCH_SIZE
+
+    assert not delete_account_data(user_id, batch_size=BATCH_SIZE, lease_seconds=60)
+    assert db.accountdeletion.find_unique(where={"user_id": user_id}).status == "running"
+
+    db.accountdeletion.update(where={"user_id": user_id},
+                              data={"updated_at": datetime.now(tz=timezone.utc) - timedelta(seconds=61)})
+    assert delete_account_data(user_id, batch_size=BATCH_SIZE, lease_seconds=60)
+    assert db.accountdeletion.find_unique(where={"user_id": user_id}).status == "done"
+    assert not any(remaining(db, user_id).values())
+
+
+def test_finished_deletion_is_not_run_again(db):
+    user_id = seed(db, "jane")
+    request_deletion(user_id)
+
+    assert delete_account_data(user_id, batch_size=BATCH_SIZE)
+    assert not delete_account_data(user_id, batch_size=BATCH_SIZE, lease_seconds=0)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models.events
+from models.events import parse_ics, shortlist_events
+
+
+def calendar(*events: list[str]) -> str:
+    lines = ["BEGIN:VCALENDAR"]
+    for event in events:
+        lines += ["BEGIN:VEVENT", *event, "END:VEVENT"]
+    return "\r\n".join(lines + ["END:VCALENDAR"])
+
+
+def test_parse_ics_converts_local_times():
+    rows = parse_ics(calendar(
+        ["SUMMARY:Yoga", "DTSTART;TZID=America/New_York:20250110T090000",
+         'DTEND;TZID="America/New_York":20250110T100000'],
+        ["SUMMARY:Talk", "DTSTART:20250112T150000Z", "DTEND:20250112T160000Z"],
+    ))
+
+    assert [row["start"].astimezone(timezone.utc) for row in rows] == [
+        datetime(2025, 1, 10, 14, tzinfo=timezone.utc),
+        datetime(2025, 1, 12, 15, tzinfo=timezone.utc),
+    ]
+    assert rows[0]["end"].astimezone(timezone.utc) == datetime(2025, 1, 10, 15, tzinfo=timezone.utc)
+
+
+def test_parse_ics_all_day_events_last_a_day():
+    rows = parse_ics(calendar(["SUMMARY:Fair", "DTSTART;VALUE=DATE:20250111"]))
+
+    assert (rows[0]["start"], rows[0]["end"]) == (datetime(2025, 1, 11), datetime(2025, 1, 12))
+
+
+def test_parse_ics_rejects_unknown_time_zones():
+    with pytest.raises(ValueError, match="Eastern Standard Time"):
+        parse_ics(calendar(["SUMMARY:Yoga", "DTSTART;TZID=Eastern Standard Time:20250110T090000"]))
+
+
+def test_shortlist_events_falls_back_to_unmapped_types(monkeypatch):
+    now = datetime.now(tz=timezone.utc)
+    upcoming = [
+        {"id": name, "name": name, "start": now + timedelta(days=days), "description": None, "types": types}
+        for name, types, days in [("games", ["Gaming"], 1), ("fair", ["Career"], 2), ("yoga", ["Mindfulness"], 3),
+                                  ("open", [], 4)]
+    ]
+    monkeypatch.setattr(models.events, "get_upcoming_events", lambda: upcoming)
+
+    # Matches first, then events of types the table does not know, but not events it judged unsuited
+    assert [event["id"] for event in shortlist_events(["Stressed", "Stressed"])] == ["yoga", "games", "open"]
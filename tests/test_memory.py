@@ -0,0 +1,251 @@
+import hashlib
+import importlib
+import pkgutil
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from prisma import errors
+
+import models
+from models.authentication_models import LOGIN_QUERY
+from models.database import User
+from models.deletion import BATCH_QUERY, CLAIM_QUERY, DELETE_STEPS, DELETE_USER_QUERY
+from models.memory import UnsupportedError, _statement, raw_statements
+from models.rbac import ROLE_UPDATES, TARGET_FILTERS, bulk_roles_query
+from models.sessions import LOGGED_IN_QUERY, RECONCILE_QUERY
+from models.throttle import FLUSH_QUERY
+
+# Raw statements of the app that only run against Postgres, in maintenance scripts and checks
+POSTGRES_ONLY = {"models.archive.PARTITIONS_QUERY", "models.archive.PART_QUERY", "models.replica.LAG_QUERY"}
+
+# Digests of the statements emulated by `MemoryStore`, as they were when their `_raw_*` method was
+# written. A changed statement fails `test_emulated_statements_are_unchanged` until the method is
+# reviewed and its digest updated.
+EMULATED = {
+    "models.authentication_models.LOGIN_QUERY": "8e11865bbd716c72",
+    "models.deletion.CLAIM_QUERY": "c2f56ddb7d8ebc16",
+    "models.deletion.DELETE_USER_QUERY": "53b2198e52c18bbb",
+    "models.sessions.LOGGED_IN_QUERY": "d9fa7a3d628c390c",
+    "models.sessions.RECONCILE_QUERY": "09dc904ce91f7b2c",
+    "models.throttle.FLUSH_QUERY": "268ac7fa40aebe42",
+    "models.deletion.BATCH_QUERY[0]": "c03a14fdfe2d6c41",
+    "models.deletion.BATCH_QUERY[1]": "48902a3a5ae1fb4d",
+    "models.deletion.BATCH_QUERY[2]": "4790c827bf7cd34d",
+    "models.deletion.BATCH_QUERY[3]": "3c57b9d3a68226ff",
+    "models.rbac.bulk_roles_query('Add', 'search')": "7aaea1d5a315df94",
+    "models.rbac.bulk_roles_query('Add', 'emails')": "a90737877d3f9819",
+    "models.rbac.bulk_roles_query('Remove', 'search')": "f4c42ea45faf8003",
+    "models.rbac.bulk_roles_query('Remove', 'emails')": "f7037ff0552ada71",
+}
+
+
+def serving_statements() -> dict[str, str]:
+    """
+    Collects the raw statements the app runs while serving: the `*_QUERY` constants of `models`,
+    the deletion steps and the bulk role updates.
+    """
+    statements = {}
+    for module_info in pkgutil.iter_modules(models.__path__):
+        module = importlib.import_module(f"models.{module_info.name}")
+        for name, value in vars(module).items():
+            qualified = f"{module.__name__}.{name}"
+            if name.endswith("_QUERY") and isinstance(value, str) and qualified not in POSTGRES_ONLY:
+                statements[qualified] = value
+    template = statements.pop("models.deletion.BATCH_QUERY")
+    for i, step in enumerate(DELETE_STEPS):
+        statements[f"models.deletion.BATCH_QUERY[{i}]"] = template.format(step=step)
+    for action in ROLE_UPDATES:
+        for target in TARGET_FILTERS:
+            statements[f"models.rbac.bulk_roles_query({action!r}, {target!r})"] = bulk_roles_query(action, target)
+    return statements
+
+
+def create_user(db, name: str, **data) -> User:
+    return db.user.create(data={"email": f"{name}@bentley.edu", "username": name, **data})
+
+
+# Model actions
+
+def test_find_and_count(db):
+    jane = create_user(db, "jane", roles=["user"])
+    create_user(db, "john")
+    for day in range(5):
+        db.mood.create(data={"user_id": jane.id, "date": datetime(2024, 1, 1 + day), "name": ["Calm", "Sad"][day % 2]})
+
+    assert db.user.find_unique(where={"email": "jane@bentley.edu"}).id == jane.id
+    assert db.user.find_unique(where={"username": "nobody"}) is None
+    with pytest.raises(errors.RecordNotFoundError):
+        db.user.find_unique_or_raise(where={"username": "nobody"})
+    assert db.user.find_first(where={"roles": {"has": "user"}}).username == "jane"
+
+    moods = db.mood.find_many(where={"user_id": jane.id, "date": {"gte": datetime(2024, 1, 2)}},
+                              order={"date": "desc"}, take=2)
+    assert [mood.date for mood in moods] == [datetime(2024, 1, 5, tzinfo=timezone.utc),
+                                             datetime(2024, 1, 4, tzinfo=timezone.utc)]
+    assert db.mood.count(where={"name": "Calm"}) == 3
+    assert db.user.count(where={"username": {"startswith": "J", "mode": "insensitive"}}) == 2
+
+
+def test_create_update_upsert_delete(db):
+    jane = create_user(db, "jane")
+    assert (jane.session_epoch, jane.failed_login_attempts, jane.roles) == (0, 0, [])
+    with pytest.raises(errors.UniqueViolationError):
+        create_user(db, "jane")
+    with pytest.raises(errors.ForeignKeyViolationError):
+        db.mood.create(data={"user_id": "missing", "date": datetime(2024, 1, 1), "name": "Calm"})
+
+    updated = db.user.update(where={"id": jane.id}, data={"roles": ["editor"], "session_epoch": {"increment": 1}})
+    assert (updated.roles, updated.session_epoch) == (["editor"], 1)
+    assert updated.updated_at >= jane.updated_at
+
+    created = db.resource.upsert(where={"name": "Gym"}, data={"create": {"name": "Gym"}, "update": {"link": "x"}})
+    assert created.link is None
+    assert db.resource.upsert(where={"name": "Gym"}, data={"create": {"name": "Gym"}, "update": {"link": "x"}}).link == "x"
+
+    db.mood.create(data={"user_id": jane.id, "date": datetime(2024, 1, 1), "name": "Calm"})
+    db.user.delete(where={"id": jane.id})
+    # Moods cascade with their user
+    assert db.mood.count() == 0
+    assert db.resource.delete_many(where={"name": "Gym"}) == 1
+
+
+def test_nested_create_and_include(db):
+    jane = create_user(db, "jane")
+    resource = db.resource.create(data={"name": "Counseling"})
+    summary = db.summary.create(data={
+        "user": {"connect": {"id": jane.id}},
+        "start": datetime(2024, 1, 1),
+        "end": datetime(2024, 1, 7),
+        "keywords": "calm",
+        "content": "A calm week",
+        "resources": {"create": [{"resource": {"connect": {"id": resource.id}}}]},
+    })
+
+    found = db.summary.find_unique(where={"id": summary.id}, include={"user": True, "resources": {"include": {"resource": True}}})
+    assert found.user.username == "jane"
+    assert [link.resource.name for link in found.resources] == ["Counseling"]
+    users = db.user.find_many(include={"summaries": {"where": {"keywords": "calm"}}})
+    assert [len(user.summaries) for user in users] == [1]
+
+
+def test_batch_is_undone_as_a_whole(db):
+    create_user(db, "jane")
+    with pytest.raises(errors.UniqueViolationError):
+        with db.batch_() as batcher:
+            batcher.user.create(data={"email": "john@bentley.edu", "username": "john"})
+            batcher.user.create(data={"email": "jane@bentley.edu", "username": "jane"})
+    assert db.user.count() == 1
+
+    with db.batch_() as batcher:
+        batcher.user.create(data={"email": "john@bentley.edu", "username": "john"})
+        batcher.user.update_many(where={}, data={"logged_in": True})
+    assert db.user.count(where={"logged_in": True}) == 2
+
+
+def test_transaction_rolls_back(db):
+    with pytest.raises(RuntimeError):
+        with db.tx() as tx:
+            tx.user.create(data={"email": "jane@bentley.edu", "username": "jane"})
+            raise RuntimeError("Abort")
+    assert db.user.count() == 0
+
+
+def test_group_by(db):
+    jane = create_user(db, "jane")
+    for day, name in enumerate(["Calm", "Sad", "Calm", "Calm"]):
+        db.mood.create(data={"user_id": jane.id, "date": datetime(2024, 1, 1 + day), "name": name})
+
+    groups = db.mood.group_by(by=["name"], count=True, order={"name": "asc"})
+    assert groups == [{"name": "Calm", "_count": {"_all": 3}}, {"name": "Sad", "_count": {"_all": 1}}]
+    latest = db.mood.group_by(by=["user_id"], max={"date": True}, where={"name": "Calm"})
+    # Dates are returned as the query engine's JSON, the client does not parse them
+    assert latest == [{"user_id": jane.id, "_max": {"date": "2024-01-04T00:00:00.000Z"}}]
+    with pytest.raises(UnsupportedError):
+        db.mood.group_by(by=["name"], count=True, having={"name": "Calm"})
+
+
+def test_metrics_are_empty(db):
+    metrics = db.get_metrics()
+    assert (metrics.counters, metrics.gauges, metrics.histograms) == ([], [], [])
+
+
+# Raw statements
+
+def test_every_statement_is_emulated():
+    emulated = raw_statements()
+    missing = [name for name, query in serving_statements().items() if _statement(query) not in emulated]
+    assert not missing, f"No emulation in MemoryStore for {missing}, add one or list them in POSTGRES_ONLY"
+
+
+def test_emulated_statements_are_unchanged():
+    digests = {name: hashlib.sha256(_statement(query).encode()).hexdigest()[:16]
+               for name, query in serving_statements().items()}
+    changed = sorted(name for name in digests.keys() | EMULATED.keys() if digests.get(name) != EMULATED.get(name))
+    assert not changed, (f"Changed since their emulation was written: {changed}. Update the `_raw_*` "
+                         "methods of MemoryStore running them, then their digests in EMULATED")
+
+
+def test_unknown_statement_is_rejected(db):
+    with pytest.raises(UnsupportedError):
+        db.query_raw('SELECT count(*) FROM "User"')
+
+
+def test_login_query(db):
+    jane = create_user(db, "jane", password="old", failed_login_attempts=2)
+    create_user(db, "john", failed_login_attempts=3)
+
+    assert db.execute_raw(FLUSH_QUERY, ["jane", "nobody"], [1, 4]) == 1
+    assert User.prisma().find_unique(where={"id": jane.id}).failed_login_attempts == 3
+    john = User.prisma().find_unique(where={"username": "john"})
+    assert User.prisma().query_first(LOGIN_QUERY, john.id, 3, None) is None
+
+    logged_in = User.prisma().query_first(LOGIN_QUERY, jane.id, 5, "new")
+    assert (logged_in.failed_login_attempts, logged_in.password) == (0, "new")
+    assert User.prisma().query_first(LOGIN_QUERY, jane.id, None, None).password == "new"
+
+
+def test_session_reaper_statements(db):
+    jane, john = create_user(db, "jane"), create_user(db, "john")
+    assert db.execute_raw(RECONCILE_QUERY, True, [jane.id, john.id, "missing"]) == 2
+    assert db.execute_raw(RECONCILE_QUERY, False, [john.id]) == 1
+    assert db.query_raw(LOGGED_IN_QUERY) == [{"id": jane.id}]
+    # Raw statements leave `@updatedAt` alone unless they set it
+    assert User.prisma().find_unique(where={"id": jane.id}).updated_at == jane.updated_at
+
+
+def test_bulk_roles_statements(db):
+    jane = create_user(db, "jane", roles=["user"])
+    john = create_user(db, "john", roles=["user", "editor"])
+
+    added = db.query_raw(bulk_roles_query("Add", "search"), "editor", "bentley")
+    assert added == [{"id": jane.id, "session_epoch": 1}]
+    removed = db.query_raw(bulk_roles_query("Remove", "emails"), "editor", ["jane@bentley.edu", "john@bentley.edu"])
+    assert sorted(row["id"] for row in removed) == sorted([jane.id, john.id])
+    assert [user.roles for user in db.user.find_many(order={"username": "asc"})] == [["user"], ["user"]]
+    assert db.query_raw(bulk_roles_query("Remove", "search"), "editor", "bentley") == []
+    assert db.query_raw(bulk_roles_query("Add", "emails"), "admin", ["john@bentley.edu"])[0]["session_epoch"] == 2
+
+
+def test_deletion_statements(db):
+    jane = create_user(db, "jane", deleted_at=datetime.now(tz=timezone.utc))
+    resource = db.resource.create(data={"name": "Counseling"})
+    for day in range(5):
+        db.mood.create(data={"user_id": jane.id, "date": datetime(2024, 1, 1) + timedelta(days=day), "name": "Calm"})
+    summary = db.summary.create(data={"user_id": jane.id, "start": datetime(2024, 1, 1), "end": datetime(2024, 1, 7),
+                                      "keywords": "calm", "content": "A calm week"})
+    db.resourceonsummary.create(data={"summary_id": summary.id, "resource_id": resource.id})
+    db.accountdeletion.create(data={"user_id": jane.id})
+
+    assert db.query_first(CLAIM_QUERY, jane.id, 60) == {"user_id": jane.id}
+    # Running, and its lease has not expired
+    assert db.query_first(CLAIM_QUERY, jane.id, 60) is None
+
+    deleted = [[db.query_first(BATCH_QUERY.format(step=step), jane.id, 2)["deleted"] for _ in range(3)]
+               for step in DELETE_STEPS]
+    assert deleted == [[1, 0, 0], [0, 0, 0], [1, 0, 0], [2, 2, 1]]
+    assert db.accountdeletion.find_unique(where={"user_id": jane.id}).deleted_rows == 7
+    assert db.resource.count() == 1
+
+    assert db.execute_raw(DELETE_USER_QUERY, jane.id) == 1
+    john = create_user(db, "john")
+    assert db.execute_raw(DELETE_USER_QUERY, john.id) == 0
@@ -1,9 +1,117 @@
+from datetime import datetime, time, timedelta
+
+import polars as pl
 import streamlit as st
 
+from models.database import Event, Type
+from models.events import event_filter, find_events, get_upcoming_events, import_events, parse_csv, parse_ics
 from models.rbac import require_admin
 
+PAGE_SIZE = 25
+SCHEMA = ["id", "name", "start", "end", "types", "description"]
+
 require_admin()
 
 st.header("Events")
 
-st.warning("This page is under construction", icon="🚧")
+
+@st.cache_data(ttl=60)
+def get_types():
+    return {t.name: t.id for t in Type.prisma().find_many(order={"name": "asc"})}
+
+
+@st.fragment
+def show_events():
+    # Set before a rerun of the fragment, which would clear anything shown in the run setting it
+    if notice := st.session_state.pop("events_notice", None):
+        st.toast(notice, icon=":material/delete:")
+    types = get_types()
+    left, right = st.columns(2)
+    selected_types = left.multiselect("Types", options=list(types))
+    today = datetime.now().date()
+    date_range = right.date_input("Date range", value=(today, today + timedelta(days=30)))
+    if len(date_range) != 2:
+        st.caption("Select an end date")
+        return
+
+    where = event_filter(
+        datetime.combine(date_range[0], time.min),
+        datetime.combine(date_range[1], time.max),
+        [types[name] for name in selected_types],
+    )
+
+    page = st.session_state.get("events_page", 0)
+    with st.spinner("Loading events..."):
+        total, events = find_events(where, page, PAGE_SIZE)
+    pages = max((total - 1) // PAGE_SIZE + 1, 1)
+    if page >= pages:
+        st.session_state["events_page"] = page = 0
+        total, events = find_events(where, page, PAGE_SIZE)
+
+    events_df = pl.DataFrame(
+        [
+            {
+                "id": event.id,
+                "name": event.name,
+                "start": event.start,
+                "end": event.end,
+                "types": ", ".join(link.type.name for link in event.types or [] if link.type),
+                "description": event.description,
+            }
+            for event in events
+        ],
+        schema=SCHEMA,
+    )
+    selection = st.dataframe(
+        events_df,
+        use_container_width=True,
+        hide_index=True,
+        on_select="rerun",
+        selection_mode="multi-row",
+        column_config={"id": None},
+    )
+
+    caption, prev_col, next_col = st.columns([4, 1, 1], vertical_alignment="center")
+    caption.caption(f"{total} events, page {page + 1} of {pages}")
+    if prev_col.button("Prev", icon=":material/chevron_left:", disabled=page == 0, use_container_width=True):
+        st.session_state["events_page"] = page - 1
+        st.rerun(scope="fragment")
+    if next_col.button("Next", icon=":material/chevron_right:", disabled=page + 1 >= pages, use_container_width=True):
+        st.session_state["events_page"] = page + 1
+        st.rerun(scope="fragment")
+
+    selected = [events_df["id"][i] for i in selection.selection.rows]
+    if selected and st.button(f"Delete {len(selected)} events", type="primary"):
+        deleted = Event.prisma().delete_many(where={"id": {"in": selected}})
+        get_upcoming_events.clear()
+        st.session_state["events_notice"] = f"{deleted} events deleted"
+        st.rerun(scope="fragment")
+
+
+@st.fragment
+def import_events_form():
+    st.subheader("Import events")
+    with st.container(border=True):
+        st.caption("Upload an iCalendar file, or a CSV file with the following schema:")
+        st.caption("`name`, `start`, `end`, `description`, `types` (separated by `;`)")
+        uploaded_file = st.file_uploader("Upload file", type=["csv", "ics"], accept_multiple_files=False)
+        if uploaded_file and st.button("Import"):
+            try:
+                text = uploaded_file.getvalue().decode("utf-8")
+                rows = parse_ics(text) if uploaded_file.name.lower().endswith(".ics") else parse_csv(text)
+                with st.spinner("Importing events..."):
+                    created, skipped = import_events(rows)
+                get_types.clear()
+                get_upcoming_events.clear()
+                st.info(f"Imported {created} events, skipped {skipped} duplicates")
+            except ValueError as e:
+                st.error(f"Invalid file: {e}")
+            except Exception:
+                st.error("Error occurred during import.")
+
+
+st.subheader("Manage events")
+with st.container(border=True):
+    show_events()
+
+import_events_form()
@@ -1,30 +1,37 @@
+import json
 from datetime import datetime, timedelta
 
 import altair as alt
 import polars as pl
 import streamlit as st
 
+from models.archive import monthly_mood_counts
 from models.database import User, Event, Summary, Resource, prisma
+from models.parallel import gather
 from models.rbac import require_admin
+from models.replica import replica_reads, replica_status
+from models.tracing import slow_queries, top_offenders
 
 
 @st.cache_data(ttl=60)
+@replica_reads()
 def get_overview_data():
-    users = User.prisma().count()
-    events = Event.prisma().count()
-    summaries = Summary.prisma().count()
-    resources = Resource.prisma().count()
-
     recent_week_filter = {
         "created_at": {
             "gt": datetime.now() - timedelta(days=7)
         }
     }
 
-    users_delta = User.prisma().count(where=recent_week_filter)
-    events_delta = Event.prisma().count(where=recent_week_filter)
-    summaries_delta = Summary.prisma().count(where=recent_week_filter)
-    resources_delta = Resource.prisma().count(where=recent_week_filter)
+    users, users_delta, events, events_delta, summaries, summaries_delta, resources, resources_delta = gather(
+        lambda: User.prisma().count(),
+        lambda: User.prisma().count(where=recent_week_filter),
+        lambda: Event.prisma().count(),
+        lambda: Event.prisma().count(where=recent_week_filter),
+        lambda: Summary.prisma().count(),
+        lambda: Summary.prisma().count(where=recent_week_filter),
+        lambda: Resource.prisma().count(),
+        lambda: Resource.prisma().count(where=recent_week_filter),
+    )
 
     return users, users_delta, events, events_delta, summaries, summaries_delta, resources, resources_delta
 
@@ -49,9 +56,39 @@ def overview():
     st.caption("Changes in the last 7 days, statistics updated every minute")
 
 
+@st.cache_data(ttl=60 * 60)
+@replica_reads()
+def get_mood_trends():
+    return monthly_mood_counts(prisma.get_client())
+
+
+@st.fragment
+def mood_trends():
+    with st.spinner("Loading mood trends..."):
+        trends = get_mood_trends()
+    if trends.is_empty():
+        st.info("No moods recorded yet")
+        return
+    chart = alt.Chart(trends).mark_bar(
+        opacity=0.7,
+    ).encode(
+        x=alt.X("month:O", title=None),
+        y=alt.Y("count:Q", title=None),
+        color=alt.Color(field="name", type="nominal", scale=alt.Scale(scheme='tableau20'), title="Mood"),
+        tooltip=["month", "name", "count"],
+    ).configure(
+        background="transparent",
+    )
+    st.altair_chart(chart, use_container_width=True)
+    st.caption("Moods recorded each month, archived months included, updated every hour")
+
+
 @st.cache_data(ttl=60)
 def get_database_stats():
     metrics = prisma.get_client().get_metrics()
+    # The in-memory backend has no connection pool to report on
+    if not metrics.gauges:
+        return None, None
     connection_data = pl.DataFrame(metrics.gauges).with_columns(
         pl.col("key").str.replace_all("[a-z]+_", "").alias("State"),
         pl.col(["description"]).alias("Description"),
@@ -66,9 +103,7 @@ def get_database_stats():
     return connection_data, elapsed_data
 
 
-@st.fragment(run_every=60)
-def monitoring():
-    connection_data, elapsed_data = get_database_stats()
+def database_charts(connection_data: pl.DataFrame, elapsed_data: pl.DataFrame):
     left, right = st.columns(2)
     connections = alt.Chart(connection_data).mark_arc(
         opacity=0.7,
@@ -99,10 +134,36 @@ def monitoring():
         st.markdown("**Query execution time**")
         st.altair_chart(elapsed, use_container_width=True)
 
+
+@st.fragment(run_every=60)
+def monitoring():
+    connection_data, elapsed_data = get_database_stats()
+    if connection_data is None:
+        st.caption("The database backend reports no connection metrics")
+    else:
+        database_charts(connection_data, elapsed_data)
+
+    if status := replica_status():
+        if status["available"]:
+            st.caption(f"Read replica in use, {status['lag']:.1f}s behind the primary")
+        else:
+            st.caption("Read replica unavailable or too far behind, reports read from the primary")
+
+    st.markdown("**Top queries**")
+    st.caption("Ranked by total time since this server started")
+    st.dataframe(top_offenders(), hide_index=True, use_container_width=True)
+
+    with st.expander("Slow queries", icon=":material/hourglass_bottom:"):
+        slow = [{**query, "arguments": json.dumps(query["arguments"])} for query in slow_queries()]
+        st.dataframe(slow, hide_index=True, use_container_width=True)
+
 require_admin()
 
 st.header("Overview")
 overview()
 
+st.subheader("Moods")
+mood_trends()
+
 st.subheader("Monitoring")
 monitoring()
@@ -3,13 +3,12 @@ import streamlit as st
 
 from models.database import prisma, Resource
 from models.rbac import require_admin
+from models.resources import SCHEMA, diff_resources
 
 require_admin()
 
 st.header("Resources")
 
-SCHEMA = ["id", "name", "description", "location", "link"]
-
 
 @st.fragment
 def get_resources():
@@ -50,29 +49,7 @@ def show_resources():
 
 
 def apply_changes():
-    new_resources = edited_resources_df.filter(pl.col("id").is_null())
-
-    deleted_resources = resources_df.filter(
-        ~pl.col("id").is_in(edited_resources_df["id"])
-    )
-
-    updated_resources = (
-        edited_resources_df
-        .filter(~pl.col("id").is_null())
-        .join(
-            resources_df,
-            on="id",
-            how="inner",
-            suffix="_original"
-        )
-        .filter(
-            (pl.col("name") != pl.col("name_original")) |
-            (pl.col("description") != pl.col("description_original")) |
-            (pl.col("location") != pl.col("location_original")) |
-            (pl.col("link") != pl.col("link_original"))
-        )
-        .select(SCHEMA)
-    )
+    new_resources, updated_resources, deleted_resources = diff_resources(resources_df, edited_resources_df)
 
     if len(new_resources) + len(updated_resources) + len(deleted_resources) == 0:
         st.warning("No changes to apply")
@@ -1,7 +1,12 @@
+import json
+
+import polars as pl
 import streamlit as st
 
-from models.database import UserPermissionsView
-from models.rbac import require_admin, ROLES
+from models.claims import remember_session_epoch
+from models.database import UserEpochView, UserPermissionsView, User, prisma
+from models.rbac import bulk_roles_query, require_admin, ROLES, ROLE_UPDATES
+from models.replica import replica_reads
 
 
 @st.fragment()
@@ -12,11 +17,80 @@ def render_user(user: UserPermissionsView):
         if new_roles != user.roles:
             button = st.button("Update")
             if button:
-                UserPermissionsView.prisma().update(where={"email": user.email}, data={"roles": new_roles})
+                updated = UserEpochView.prisma().update(
+                    where={"email": user.email},
+                    data={"roles": new_roles, "session_epoch": {"increment": 1}},
+                )
+                if updated:
+                    remember_session_epoch(updated.id, updated.session_epoch)
                 user.roles = new_roles
                 st.rerun()
 
 
+def bulk_where(action: str, role: str, target: str, value) -> dict:
+    where = {"email": {"contains": value}} if target == "search" else {"email": {"in": value}}
+    if action == "Add":
+        where["NOT"] = {"roles": {"has": role}}
+    else:
+        where["roles"] = {"has": role}
+    return where
+
+
+def apply_bulk_roles(action: str, role: str, target: str, value) -> int:
+    with prisma.get_client().tx() as tx:
+        updated = tx.query_raw(bulk_roles_query(action, target), role, value)
+        affected = len(updated)
+        tx.auditlog.create(data={
+            "actor": st.session_state["username"],
+            "action": f"bulk_{action.lower()}_role",
+            "detail": json.dumps({
+                "role": role,
+                "target": target,
+                "value": value,
+                "affected": affected,
+            }),
+        })
+    for row in updated:
+        remember_session_epoch(row["id"], row["session_epoch"])
+    return affected
+
+
+@st.fragment()
+def bulk_roles():
+    st.subheader("Bulk roles")
+    with st.container(border=True):
+        source = st.radio("Apply to", ["Current search", "Uploaded email list"], horizontal=True)
+        if source == "Current search":
+            if "users_search" not in st.session_state:
+                st.caption("Search users above to select them")
+                return
+            target, value = "search", st.session_state["users_search"]
+            st.caption(f"All users with email containing `{value}`" if value else "All users")
+        else:
+            st.caption("Upload a CSV file with an `email` column")
+            uploaded_file = st.file_uploader("Upload CSV file", type="csv", accept_multiple_files=False)
+            if not uploaded_file:
+                return
+            try:
+                emails = pl.read_csv(uploaded_file).get_column("email").drop_nulls().str.strip_chars().unique()
+            except Exception:
+                st.error("Error occurred while reading the email list.")
+                return
+            target, value = "emails", emails.to_list()
+
+        left, right = st.columns(2)
+        action = left.selectbox("Action", list(ROLE_UPDATES))
+        role = right.selectbox("Role", ROLES)
+
+        affected = User.prisma().count(where=bulk_where(action, role, target, value))
+        preposition = "to" if action == "Add" else "from"
+        st.info(f"{action} `{role}` {preposition} {affected} users")
+        if st.button("Apply", disabled=affected == 0):
+            with st.spinner("Updating roles..."):
+                affected = apply_bulk_roles(action, role, target, value)
+            st.success(f"Updated {affected} users")
+
+
 require_admin()
 st.header("Users")
 with st.form("Permissions"):
@@ -25,9 +99,11 @@ with st.form("Permissions"):
     email = st.text_input("Email", key="email", max_chars=255, placeholder="Leave blank to search all users")
     search_button = st.form_submit_button("Search")
 if search_button:
-    with st.spinner("Searching for users..."):
+    st.session_state["users_search"] = email
+if "users_search" in st.session_state:
+    with st.spinner("Searching for users..."), replica_reads():
         users = UserPermissionsView.prisma().find_many(
-            where={"email": {"contains": email}},
+            where={"email": {"contains": st.session_state["users_search"]}},
             order={"email": "asc"},
             take=20
         )
@@ -36,3 +112,4 @@ if search_button:
         for user in users:
             render_user(user)
 
+bulk_roles()
@@ -4,6 +4,7 @@ import streamlit as st
 from streamlit_calendar import calendar
 
 from models.database import Mood
+from models.moods import mood_spans
 from models.rbac import require_logged_in
 
 
@@ -125,40 +126,14 @@ def load_calendar_events():
         order={"date": "asc"},
     )
 
-    mood_iter = iter(moods)
-    current_mood = next(mood_iter, None)
-    start_date = None
-
-    while current_mood is not None:
-        next_mood = next(mood_iter, None)
-
-        delta = 0
-        if next_mood is not None and current_mood.name == next_mood.name:
-            time_delta = current_mood.date - next_mood.date
-            delta = time_delta.days
-
-        if delta == -1:
-            if start_date is None:
-                start_date = current_mood.date.isoformat()
-        else:
-            span = {}
-            if start_date is not None:
-                span["start"] = start_date
-                span["end"] = (current_mood.date + timedelta(days=1)).isoformat()
-                start_date = None
-            else:
-                span["date"] = current_mood.date.isoformat()
-
-            calendar_events.append({
-                "title": current_mood.name,
-                **span,
-                **map_mood(current_mood.name),
-                "allDay": True,
-                "borderColor": "transparent",
-                "type": "mood",
-            })
-
-        current_mood = next_mood
+    for span in mood_spans(moods):
+        calendar_events.append({
+            **span,
+            **map_mood(span["title"]),
+            "allDay": True,
+            "borderColor": "transparent",
+            "type": "mood",
+        })
 
     return calendar_events
 
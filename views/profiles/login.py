@@ -8,6 +8,8 @@ authenticator = load_authenticator()
 
 try:
     show_logo()
+    if st.session_state.pop("account_deleted", False):
+        st.success("Account deleted successfully")
     authenticator.login()
     st.page_link("views/profiles/register.py", label="Don't have an account? Register here.")
 except LoginError as e:
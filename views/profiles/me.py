@@ -1,16 +1,19 @@
+import contextlib
+import os
+
 import streamlit as st
 
 from models.auth import load_authenticator, wipe_cookie
 from models.authentication_models import UpdateError
-from models.database import UserPrivateView, prisma
+from models.deletion import deletion_progress, request_deletion
+from models.export import build_export
+from models.identity import get_private_view
 from models.rbac import require_logged_in, _is_admin
 
 
 @st.fragment()
 def user_details():
-    user = UserPrivateView.prisma().find_first(
-        where={"username": st.session_state["username"]},
-    )
+    user = get_private_view(st.session_state["username"])
 
     with st.expander("Details", icon=":material/badge:"):
         col1, col2 = st.columns(2)
@@ -53,6 +56,43 @@ def reset_password():
     except Exception as e:
         st.error(e)
 
+
+def discard_export():
+    if path := st.session_state.pop("export_path", None):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+@st.fragment()
+def download_data():
+    with st.expander("My Data", icon=":material/download:"):
+        st.caption("Download your profile, moods and summaries as a ZIP archive")
+        if st.button("Prepare Download"):
+            with st.spinner("Exporting data..."):
+                discard_export()
+                st.session_state["export_path"] = build_export(st.session_state["user_id"])
+        if export_path := st.session_state.get("export_path"):
+            # Only the path is kept in the session, Streamlit reads the archive for the runs showing the button
+            with open(export_path, "rb") as f:
+                downloaded = st.download_button("Download my data", f, file_name="wellnest-data.zip",
+                                                mime="application/zip", type="primary")
+            if downloaded:
+                discard_export()
+
+
+@st.fragment(run_every=1)
+def deletion_status(user_id: str):
+    # Reruns on its own every second, without holding the script thread in between. The user is
+    # logged out already, so it only relies on the id it was given.
+    job = deletion_progress(user_id)
+    if job and job.status == "done":
+        # A full rerun closes the dialog, which stops this fragment, and the login page says it is done
+        st.session_state["account_deleted"] = True
+        st.rerun()
+    st.write(f"Deleted {job.deleted_rows if job else 0} activities...")
+    st.caption("Deletion continues in the background if you leave this page")
+
+
 @st.dialog("Delete Account")
 def delete_account_dialog():
     if _is_admin():
@@ -62,16 +102,13 @@ def delete_account_dialog():
 
     st.error("This action is irreversible and will delete your account and all your data")
     if st.button("Delete Anyways", type="primary"):
-        with st.status("Deleting account..."):
-            st.write("Scanning for activities...")
-            with prisma.get_client().batch_() as batcher:
-                batcher.user.delete(where={"id": st.session_state["user_id"]})
-                st.write("Deleting all activities...")
-            st.snow()
-
-        wipe_cookie(authenticator)
-        authenticator.logout(location="unrendered")
-        st.success("Account deleted successfully, please refresh the page")
+        user_id = st.session_state["user_id"]
+        with st.spinner("Scheduling deletion..."):
+            request_deletion(user_id)
+            wipe_cookie(authenticator)
+            authenticator.logout(location="unrendered")
+        st.snow()
+        deletion_status(user_id)
 
 
 @st.fragment()
@@ -90,4 +127,5 @@ with st.spinner("Loading profile..."):
     user_details()
     update_details()
     reset_password()
+    download_data()
     delete_account()
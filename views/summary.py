@@ -6,12 +6,12 @@ import uuid
 
 import polars as pl
 import streamlit as st
-import streamlit_lottie
-import yaml
 
 from models.database import Summary, Mood, Resource
+from models.events import shortlist_events
 from models.llm import get_openai
 from models.rbac import require_logged_in
+from models.summary import encode_summary_input, parse_summary_response, shape_moods
 
 
 @st.cache_resource
@@ -20,8 +20,16 @@ def load_lottie():
         return json.load(f)
 
 
+def show_lottie(**kwargs):
+    # Only the empty state and a summary being generated animate, showing a fresh summary never
+    # loads the component
+    from streamlit_lottie import st_lottie
+
+    st_lottie(load_lottie(), **kwargs)
+
+
 def empty_summary():
-    streamlit_lottie.st_lottie(load_lottie())
+    show_lottie()
 
     st.markdown(
         "<h3 style='text-align: center;'>Stay tuned</h3>", unsafe_allow_html=True
@@ -38,7 +46,7 @@ def in_progress_summary():
     key = str(uuid.uuid4().hex)
     try:
         with lottie_container:
-            streamlit_lottie.st_lottie(load_lottie(), key=key)
+            show_lottie(key=key)
         with info_container:
             st.markdown(
                 "<h3 style='text-align: center;'>Generating summary...</h3><p style='text-align: center;'>This won't take long</p>",
@@ -73,6 +81,13 @@ resources:
   - id: !str  # unique identifier
     name: !str  # max 100 chars
     description: !str  # optional, max 500 chars
+
+events:  # upcoming campus events, may be empty
+  - id: !str  # unique identifier
+    name: !str  # max 32 chars
+    date: !date  # format: YYYY-MM-DD
+    types: !list[str]  # event categories
+    description: !str  # optional, max 100 chars
 ```
 
 Output Schema (YAML):
@@ -92,6 +107,12 @@ suggestion: !list[str]  # ordered by relevance
   # - At most 5 suggestions, but can be less if possible
   # - Resources matching user's needs
 
+event_suggestion: !list[str]  # ordered by relevance
+  # Only include:
+  # - The event id that exists
+  # - At most 2 suggestions, can be empty
+  # - Events that could help with the user's recent moods
+
 crisis_intervention: !bool  # default: false
   # Set true ONLY if detecting:
   # - Explicit self-harm indicators
@@ -116,27 +137,37 @@ Response Guidelines:
 """
 
 
+SUMMARY_INCLUDE = {
+    "resources": True,
+    "recommended_events": {"include": {"event": True}},
+}
+
+
 def get_summary():
+    user_id = st.session_state["user_id"]
     latest_summary = Summary.prisma().find_first(
-        where={"user_id": st.session_state["user_id"]},
-        include={"resources": True},
+        where={"user_id": user_id},
+        include=SUMMARY_INCLUDE,
         order={"created_at": "desc"},
     )
 
-    if latest_summary and latest_summary.created_at > datetime.now(tz=timezone.utc) - timedelta(days=7):
+    now = datetime.now(tz=timezone.utc)
+    if latest_summary and latest_summary.created_at > now - timedelta(days=7):
         return latest_summary
 
+    # Most visits stop at a fresh summary, the moods are only read to generate a new one
     if latest_summary:
         range_start = latest_summary.created_at
     else:
-        range_start = datetime.now() - timedelta(days=14)
+        range_start = now - timedelta(days=14)
 
     moods = Mood.prisma().find_many(
         where={
-            "user_id": st.session_state["user_id"],
+            "user_id": user_id,
+            # Bounded to the calendar's window, so only the recent partitions are read
             "date": {
-                "gte": range_start,
-                "lte": datetime.now() + timedelta(days=7),
+                "gte": max(range_start, now - timedelta(days=90)),
+                "lte": now + timedelta(days=7),
             },
         },
         order={"date": "desc"},
@@ -145,34 +176,24 @@ def get_summary():
 
     if len(moods) < 4:
         return None
-    else:
+
+    with in_progress_summary():
         resources_df = get_resources().select(["id", "name", "description"])
 
-        moods_df = pl.DataFrame(moods).drop("user_id").drop("user")
-        start = min(moods_df["date"])
-        end = max(moods_df["date"])
+        moods_df, start, end = shape_moods(moods)
 
-        moods_df = moods_df.with_columns(
-            pl.col("date").dt.strftime("%Y-%m-%d"),
-            pl.col("description").str.replace_all("\n", " ").str.replace_all("\t", " ").str.replace_all("  ", " ").alias("description"),
-        )
-
-        input_data = {
-            "moods": moods_df.to_dicts(),
-            "resources": resources_df.to_dicts(),
-        }
+        events = shortlist_events(moods_df["name"].to_list())
 
         client = get_openai()
         completion = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": json.dumps(input_data, ensure_ascii=False)},
+                {"role": "user", "content": encode_summary_input(moods_df, resources_df, events)},
             ],
         )
 
         response = completion.choices[0].message.content
-        response = response.strip().removeprefix("```yaml").removesuffix("```")
 
         summary = Summary.prisma().create(
             data={
@@ -184,33 +205,27 @@ def get_summary():
             }
         )
 
-        result = yaml.load(response, Loader=yaml.SafeLoader)
-
-        raw_suggestion = result.get("suggestion", [])
-        if isinstance(raw_suggestion, str):
-            raw_suggestion = [raw_suggestion]
-
-        suggestion = [sid for sid in raw_suggestion if isinstance(sid, str)]
-
-        suggestion = pl.DataFrame({"id": suggestion}).join(resources_df, on="id", how="inner").select(["id"]).rename({"id": "resource_id"})
+        result = parse_summary_response(response, resources_df, events)
         return Summary.prisma().update(
             where={"id": summary.id},
             data={
-                "content": result.get("summary", "[An error occurred during generation]"),
-                "keywords": result.get("keyword", "[An error occurred during generation]"),
+                "content": result["content"],
+                "keywords": result["keywords"],
                 "resources": {
-                    "create": suggestion.to_dicts(),
+                    "create": result["resources"],
+                },
+                "recommended_events": {
+                    "create": [{"event_id": eid} for eid in result["event_ids"]],
                 },
             },
-            include={"resources": True},
+            include=SUMMARY_INCLUDE,
         )
 
 
 st.header("Summary")
 
 require_logged_in()
-with in_progress_summary():
-    summary = get_summary()
+summary = get_summary()
 
 if summary is None:
     empty_summary()
@@ -255,3 +270,15 @@ else:
                 > {resource["description"]}
                 """
                 )
+
+    if summary.recommended_events:
+        st.subheader("Upcoming events")
+        for recommendation in summary.recommended_events:
+            event = recommendation.event
+            if event is None:
+                continue
+            with st.container(border=True):
+                st.markdown(f"#### {event.name}")
+                st.caption(f"{event.start.strftime('%a, %b %d %H:%M')} - {event.end.strftime('%H:%M')}")
+                if event.description:
+                    st.markdown(f"> {event.description}")